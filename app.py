@@ -0,0 +1,114 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from src.pipline.prediction_pipeline import (PredictionPipeline, MicroBatcher, MicroBatcherStopped, ModelWatcher,
+                                             LocalModelSource, BlobModelSource)
+from src.data_access.feedback_writer import FeedbackWriter
+from src.instrumentation import REGISTRY
+from src.constants import (APP_HOST, APP_PORT, MODEL_SOURCE, METRICS_ENDPOINT_ENABLED, FEEDBACK_ENABLED,
+                           FEEDBACK_LOG_PREDICTIONS, PREDICTION_MAX_REQUEST_TEXTS)
+
+
+class PredictRequest(BaseModel):
+    text: str
+
+
+class BatchPredictRequest(BaseModel):
+    texts: list[str]
+
+
+class FeedbackRequest(BaseModel):
+    tokens: list[str]
+    tags: list[str]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The model and vocabularies are loaded once per worker, not per request, then hot swapped
+    # by the watcher whenever a new version is published.
+    model_source = BlobModelSource() if MODEL_SOURCE == 'blob' else LocalModelSource()
+    model_version = model_source.get_version()
+    app.state.pipeline = PredictionPipeline(model_source.fetch(model_version), model_version=model_version)
+    app.state.batcher = MicroBatcher(app.state.pipeline)
+    app.state.watcher = ModelWatcher(app.state.pipeline, model_source)
+    app.state.feedback_writer = FeedbackWriter() if FEEDBACK_ENABLED else None
+    await app.state.batcher.start()
+    app.state.watcher.start()
+    if app.state.feedback_writer is not None:
+        app.state.feedback_writer.start()
+    yield
+    app.state.watcher.stop()
+    await app.state.batcher.stop()
+    if app.state.feedback_writer is not None:
+        # Writes out the buffered feedback; off the event loop, as it waits for MongoDB.
+        await asyncio.to_thread(app.state.feedback_writer.stop)
+
+
+app = FastAPI(title='Named Entity Recognition', lifespan=lifespan)
+
+
+@app.get('/health')
+async def health():
+    return {'status': 'ok', 'model_version': app.state.pipeline.model_version}
+
+
+def log_predictions(results: list) -> None:
+    # Never blocks the request: predictions that do not fit in the buffer are dropped.
+    if FEEDBACK_LOG_PREDICTIONS and app.state.feedback_writer is not None:
+        for entities in results:
+            app.state.feedback_writer.add([entity['token'] for entity in entities],
+                                          [entity['tag'] for entity in entities])
+
+
+async def submit(texts: list) -> list:
+    try:
+        return await app.state.batcher.submit(texts)
+    except MicroBatcherStopped:
+        raise HTTPException(status_code=503, detail='The prediction service is shutting down, retry later.')
+
+
+@app.post('/predict')
+async def predict(request: PredictRequest):
+    results = await submit([request.text])
+    log_predictions(results)
+    return {'entities': results[0]}
+
+
+@app.post('/predict/batch')
+async def predict_batch(request: BatchPredictRequest):
+    if len(request.texts) > PREDICTION_MAX_REQUEST_TEXTS:
+        raise HTTPException(status_code=413,
+                            detail=f'Expected at most {PREDICTION_MAX_REQUEST_TEXTS} texts per request.')
+    results = await submit(request.texts)
+    log_predictions(results)
+    return {'entities': results}
+
+
+@app.post('/feedback')
+async def feedback(request: FeedbackRequest):
+    """Stores a corrected sentence, one tag per token, for retraining."""
+    if app.state.feedback_writer is None:
+        raise HTTPException(status_code=404, detail='Feedback is not enabled.')
+    if len(request.tokens) != len(request.tags):
+        raise HTTPException(status_code=422, detail='Expected one tag per token.')
+    if not app.state.feedback_writer.add(request.tokens, request.tags):
+        raise HTTPException(status_code=503, detail='Feedback buffer is full, retry later.')
+    return {'status': 'accepted'}
+
+
+if METRICS_ENDPOINT_ENABLED:
+    @app.get('/metrics', response_class=PlainTextResponse)
+    async def metrics():
+        # Prometheus text format; each uvicorn worker reports its own process.
+        return PlainTextResponse(REGISTRY.render(), media_type='text/plain; version=0.0.4')
+
+
+if __name__ == '__main__':
+    # Only needed to run the server from this file; workers started by uvicorn already have it.
+    import uvicorn
+
+    uvicorn.run(app, host=APP_HOST, port=APP_PORT)
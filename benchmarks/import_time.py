@@ -0,0 +1,83 @@
+"""Import-time budget for the modules a prediction worker loads on cold start.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, a few times, and
+its median cumulative import time is compared with its budget. Serving modules must also not
+pull in the training or data access dependencies. Exits with status 1 if any check fails.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 7 --output import_time.json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+# Budgets in milliseconds; tighten them as cold start improves.
+IMPORT_BUDGETS_MS = {
+    'src.constants': 20,
+    'src.logger': 60,
+    'src.entity.config_entity': 60,
+    'src.utils.main_utils': 150,
+    'src.entity.estimator': 150,
+    'src.pipline.prediction_pipeline': 200,
+    'app': 600,
+}
+
+# Modules a prediction worker never needs.
+SERVING_MODULES = ('src.entity.estimator', 'src.pipline.prediction_pipeline', 'app')
+FORBIDDEN_IN_SERVING = ('tensorflow', 'pandas', 'pyarrow', 'yaml', 'pymongo', 'azure', 'dotenv', 'sklearn')
+
+
+def measure_import(module: str) -> tuple:
+    """Imports `module` in a fresh interpreter.
+
+    Returns: (cumulative import time in ms, names of every top level package imported)
+    """
+    code = f'import sys, {module}; print(",".join(sorted({{name.split(".")[0] for name in sys.modules}})))'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT_DIR,
+                            capture_output=True, text=True, check=True, env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'})
+
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if line.startswith('import time:') and line.rsplit('|', 1)[-1].strip() == module:
+            cumulative_us = int(line.split('|')[1])
+    if cumulative_us is None:
+        raise RuntimeError(f'No import time reported for {module}:\n{result.stderr[-2000:]}')
+    return cumulative_us / 1000, set(result.stdout.strip().split(','))
+
+
+def run(repeat: int) -> dict:
+    report = {'python': sys.version.split()[0], 'repeat': repeat, 'modules': {}, 'passed': True}
+    for module, budget_ms in IMPORT_BUDGETS_MS.items():
+        timings, imported = [], set()
+        for _ in range(repeat):
+            import_ms, imported = measure_import(module)
+            timings.append(import_ms)
+
+        median_ms = statistics.median(timings)
+        forbidden = sorted(set(FORBIDDEN_IN_SERVING) & imported) if module in SERVING_MODULES else []
+        passed = median_ms <= budget_ms and not forbidden
+        report['modules'][module] = {'median_ms': round(median_ms, 1), 'min_ms': round(min(timings), 1),
+                                     'budget_ms': budget_ms, 'forbidden_imports': forbidden, 'passed': passed}
+        report['passed'] &= passed
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per module; the median is reported.')
+    parser.add_argument('--output', help='Write the report as JSON to this file.')
+    args = parser.parse_args()
+
+    report = run(args.repeat)
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+    sys.exit(0 if report['passed'] else 1)
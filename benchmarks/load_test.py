@@ -0,0 +1,85 @@
+"""Load generator for the prediction service.
+
+Sends concurrent single-text requests and reports p50/p99 latency and requests/sec.
+
+    python benchmarks/load_test.py --url http://localhost:8000 --requests 2000 --concurrency 64
+    python benchmarks/load_test.py --requests 2000 --concurrency 64     # app.py served in-process
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import random
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+SAMPLE_TEXTS = [
+    'Thousands of demonstrators have marched through London to protest the war in Iraq .',
+    'The European Commission said on Thursday it disagreed with German advice .',
+    'Peter Blackburn reports from Brussels .',
+    'Iranian officials say they expect to get access to sealed sensitive parts of the plant Wednesday .',
+    'Helicopter gunships Saturday pounded militant hideouts in the Orakzai tribal region .',
+]
+
+
+async def run_load(client: httpx.AsyncClient, n_requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_request():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post('/predict', json={'text': random.choice(SAMPLE_TEXTS)})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(n_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'requests': n_requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'elapsed_s': elapsed,
+        'requests_per_s': n_requests / elapsed,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+    }
+
+
+async def main(args) -> dict:
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            return await run_load(client, args.requests, args.concurrency)
+
+    from app import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://load-test', timeout=60) as client:
+            await run_load(client, min(args.concurrency, args.requests), args.concurrency)  # warm up
+            return await run_load(client, args.requests, args.concurrency)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Base URL of a running service. Serves app.py in-process if omitted.')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--output', help='Write the report as JSON to this file.')
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
@@ -0,0 +1,267 @@
+"""Benchmarks every training pipeline stage and the inference path on synthetic corpora.
+
+For each corpus size (in tokens) it times, and records the CPU time and peak RSS of:
+NerData export from an in-memory MongoDB, feature store write and read, data transformation,
+a few training steps, model loading, and single and batched prediction. Results are written as
+JSON; with --baseline they are compared with a previous run, and the script exits with status 1
+if any stage got slower than the tolerance allows.
+
+    python benchmarks/pipeline.py --sizes 10000 100000 --output bench.json
+    python benchmarks/pipeline.py --sizes 1000000 5000000 --stages feature_store_write feature_store_read data_transformation
+    python benchmarks/pipeline.py --output new.json --baseline bench.json --tolerance 0.2
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from dataclasses import fields, replace
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+# params.yaml and config/schema.yaml are read relative to the repository root.
+os.chdir(ROOT_DIR)
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+from synthetic import make_corpus, make_documents, make_sentences
+from src.logger import logging
+from src.instrumentation import measure
+
+STAGES = ('ner_data_export', 'feature_store_write', 'feature_store_read', 'data_transformation',
+          'training_step', 'model_load', 'predict_single', 'predict_batch')
+
+
+def relocate(config, run_dir: str):
+    """Points every path of a pipeline config that lies in the run's artifact directory into run_dir."""
+    from src.constants import ARTIFACT_DIR
+    from src.entity.config_entity import get_timestamp
+
+    run_root = os.path.join(ARTIFACT_DIR, get_timestamp())
+    changes = {}
+    for config_field in fields(config):
+        value = getattr(config, config_field.name)
+        if isinstance(value, str) and value.startswith(run_root):
+            changes[config_field.name] = os.path.join(run_dir, os.path.relpath(value, run_root))
+    return replace(config, **changes)
+
+
+def record(results: dict, stage: str, measurement, rows: int, **extra) -> None:
+    metrics = measurement.metrics
+    results[stage] = {'wall_seconds': metrics['wall_seconds'], 'cpu_seconds': metrics['cpu_seconds'],
+                      'peak_rss_mb': metrics['peak_rss_bytes'] / 2**20, 'rss_increase_mb': metrics['rss_increase_bytes'] / 2**20,
+                      'rows': rows, 'rows_per_second': rows / metrics['wall_seconds'] if metrics['wall_seconds'] else None,
+                      **extra}
+    print(f"  {stage:<20} {metrics['wall_seconds']:8.3f}s wall {metrics['cpu_seconds']:8.3f}s cpu "
+          f"{results[stage]['peak_rss_mb']:8.1f}MB peak rss  {rows} rows", flush=True)
+
+
+def run_size(n_tokens: int, stages: set, work_dir: str, args) -> dict:
+    from src.constants import DATABASE_NAME, COLLECTION_NAME, MONGODB_EXPORT_BATCH_SIZE, MONGODB_EXPORT_WORKERS
+    from src.utils.main_utils import write_feature_store, read_feature_store, get_schema_dtypes, read_yaml_file
+    from src.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
+
+    results = {}
+    corpus = make_corpus(n_tokens, seed=args.seed)
+    feature_store_dir = os.path.join(work_dir, 'feature_store')
+    partition_file_path = os.path.join(feature_store_dir, f'part-0.{args.format}')
+
+    if 'ner_data_export' in stages:
+        from tests.in_memory_mongo import InMemoryMongoClient
+        from src.configuration.mongo_db_connection import MongoDBClient
+        from src.data_access.ner_data import NerData
+
+        MongoDBClient.client = InMemoryMongoClient()
+        MongoDBClient.client[DATABASE_NAME][COLLECTION_NAME].insert_many(make_documents(corpus))
+        with measure('benchmark.ner_data_export', log_level=logging.DEBUG) as measurement:
+            exported = NerData().export_collection_as_DataFrame(COLLECTION_NAME, batch_size=MONGODB_EXPORT_BATCH_SIZE,
+                                                                num_workers=MONGODB_EXPORT_WORKERS)
+        record(results, 'ner_data_export', measurement, len(exported))
+        MongoDBClient.client = None
+        del exported
+
+    with measure('benchmark.feature_store_write', log_level=logging.DEBUG) as measurement:
+        write_feature_store(corpus, partition_file_path, file_format=args.format)
+    if 'feature_store_write' in stages:
+        record(results, 'feature_store_write', measurement, len(corpus),
+               file_size_mb=os.path.getsize(partition_file_path) / 2**20)
+
+    if 'feature_store_read' in stages:
+        dtype = get_schema_dtypes(read_yaml_file('config/schema.yaml'))
+        with measure('benchmark.feature_store_read', log_level=logging.DEBUG) as measurement:
+            dataframe = read_feature_store(feature_store_dir, dtype=dtype)
+        record(results, 'feature_store_read', measurement, len(dataframe))
+        del dataframe
+    del corpus
+
+    inference_stages = {'model_load', 'predict_single', 'predict_batch'} & stages
+    if not ({'data_transformation', 'training_step'} & stages or (inference_stages and args.model_dir is None)):
+        return results
+
+    from src.components.data_transformation import DataTransformation
+    from src.entity.config_entity import DataTransformationConfig
+
+    data_ingestion_artifact = DataIngestionArtifact(raw_data_file_path=feature_store_dir, feature_store_format=args.format,
+                                                    ingestion_mode='full', watermark=None, new_rows=n_tokens)
+    data_validation_artifact = DataValidationArtifact(validation_status=True, message='', validation_report_file_path='',
+                                                      profile_file_path='', drift_detected=False)
+    data_transformation_config = relocate(DataTransformationConfig(), work_dir)
+    with measure('benchmark.data_transformation', log_level=logging.DEBUG) as measurement:
+        data_transformation_artifact = DataTransformation(data_ingestion_artifact, data_validation_artifact,
+                                                          data_transformation_config).initiate_data_transformation()
+    if 'data_transformation' in stages:
+        record(results, 'data_transformation', measurement, n_tokens)
+
+    model_dir = args.model_dir
+    if 'training_step' in stages or (inference_stages and model_dir is None):
+        model_dir = run_training_steps(data_transformation_artifact, work_dir, results, args)
+
+    if inference_stages:
+        run_prediction(model_dir, results, args)
+    return results
+
+
+def run_training_steps(data_transformation_artifact, work_dir: str, results: dict, args) -> str:
+    """Trains for a few bucketed batches of the tf.data pipeline after one warm-up step, and saves a model bundle to predict with."""
+    from src.components.model_trainer import ModelTrainer
+    from src.utils.main_utils import load_numpy_array_data
+    from src.entity.config_entity import ModelTrainerConfig
+    from src.entity.vocabulary import Vocabulary
+    from src.constants import UNK_TOKEN_ID, PAD_TOKEN_ID, TOKEN_VOCAB_FILE_NAME, TAG_VOCAB_FILE_NAME
+
+    artifact = data_transformation_artifact
+    model_trainer = ModelTrainer(artifact, relocate(ModelTrainerConfig(), work_dir))
+    model_trainer.configure_parallelism()
+    dataset = model_trainer.make_dataset(load_numpy_array_data(artifact.token_ids_file_path, mmap_mode='r'),
+                                         load_numpy_array_data(artifact.tag_ids_file_path, mmap_mode='r'),
+                                         load_numpy_array_data(artifact.sentence_offsets_file_path, mmap_mode='r'),
+                                         load_numpy_array_data(artifact.train_indices_file_path, mmap_mode='r'),
+                                         shuffle=True)
+    token_vocab = Vocabulary.load(artifact.token_vocab_file_path, offset=UNK_TOKEN_ID + 1, unknown_id=UNK_TOKEN_ID)
+    tag_vocab = Vocabulary.load(artifact.tag_vocab_file_path)
+    model = model_trainer.get_bilstm_lstm_model(vocab_size=len(token_vocab), n_tags=len(tag_vocab))
+
+    model.fit(dataset.take(1), epochs=1, verbose=0)
+    # Cached while they are trained on, so the batches that were timed can be counted afterwards.
+    batches = dataset.take(args.train_steps).cache()
+    with measure('benchmark.training_step', log_level=logging.DEBUG) as measurement:
+        model.fit(batches, epochs=1, verbose=0)
+    steps = n_sentences = n_tokens = 0
+    for tokens, _, _ in batches:
+        steps += 1
+        n_sentences += int(tokens.shape[0])
+        n_tokens += int(np.count_nonzero(tokens.numpy() != PAD_TOKEN_ID))
+    record(results, 'training_step', measurement, n_sentences, steps=steps, tokens=n_tokens)
+
+    trained_model_file_path = model_trainer.model_trainer_config.trained_model_file_path
+    model_dir = os.path.dirname(trained_model_file_path)
+    os.makedirs(model_dir, exist_ok=True)
+    model.save(trained_model_file_path)
+    shutil.copyfile(artifact.token_vocab_file_path, os.path.join(model_dir, TOKEN_VOCAB_FILE_NAME))
+    shutil.copyfile(artifact.tag_vocab_file_path, os.path.join(model_dir, TAG_VOCAB_FILE_NAME))
+    return model_dir
+
+
+def run_prediction(model_dir: str, results: dict, args) -> None:
+    """Times model loading and PredictionPipeline.predict on one text and on batches of texts."""
+    from src.pipline.prediction_pipeline import PredictionPipeline
+
+    with measure('benchmark.model_load', log_level=logging.DEBUG) as measurement:
+        prediction_pipeline = PredictionPipeline(model_dir=model_dir, backend=args.backend)
+    record(results, 'model_load', measurement, 1, backend=args.backend)
+
+    texts = make_sentences(max(args.batch_size, 1), seed=args.seed + 1)
+    prediction_pipeline.predict(texts)
+    for stage, batch_size in (('predict_single', 1), ('predict_batch', args.batch_size)):
+        latencies = []
+        with measure(f'benchmark.{stage}', log_level=logging.DEBUG) as measurement:
+            for repeat in range(args.predict_repeats):
+                start = time.perf_counter()
+                prediction_pipeline.predict(texts[:batch_size])
+                latencies.append(time.perf_counter() - start)
+        latencies_ms = np.array(latencies) * 1000
+        record(results, stage, measurement, batch_size * args.predict_repeats, batch_size=batch_size,
+               p50_ms=float(np.percentile(latencies_ms, 50)), p99_ms=float(np.percentile(latencies_ms, 99)))
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Stages slower than (1 + tolerance) times their wall time in the baseline."""
+    regressions = []
+    for size, stages in report['results'].items():
+        for stage, result in stages.items():
+            previous = baseline.get('results', {}).get(size, {}).get(stage)
+            if previous is None or not previous['wall_seconds']:
+                continue
+            ratio = result['wall_seconds'] / previous['wall_seconds']
+            result['baseline_ratio'] = ratio
+            if ratio > 1 + tolerance:
+                regressions.append({'size': size, 'stage': stage, 'ratio': ratio,
+                                    'wall_seconds': result['wall_seconds'], 'baseline_wall_seconds': previous['wall_seconds']})
+    return regressions
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000],
+                        help='Corpus sizes in tokens, e.g. 10000 to 5000000.')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet', help='Feature store format.')
+    parser.add_argument('--train-steps', type=int, default=10, help='Training batches timed, after one warm-up batch.')
+    parser.add_argument('--model-dir', help='Predict with this model bundle instead of the one trained here.')
+    parser.add_argument('--backend', default='keras', help="Prediction backend: 'keras', 'onnx', 'onnx-int8' or 'auto'.")
+    parser.add_argument('--batch-size', type=int, default=64, help='Texts per batched prediction.')
+    parser.add_argument('--predict-repeats', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--work-dir', help='Keep the artifacts here instead of in a temporary directory.')
+    parser.add_argument('--output', help='Write the report as JSON to this file.')
+    parser.add_argument('--baseline', help='Report of a previous run to compare wall times with.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown against the baseline.')
+    args = parser.parse_args()
+
+    report = {
+        'commit': get_commit(),
+        'created_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'args': vars(args),
+        'results': {},
+    }
+    for n_tokens in args.sizes:
+        print(f'{n_tokens} tokens', flush=True)
+        work_dir = os.path.join(args.work_dir, str(n_tokens)) if args.work_dir else tempfile.mkdtemp(prefix='ner-bench-')
+        try:
+            report['results'][str(n_tokens)] = run_size(n_tokens, set(args.stages), work_dir, args)
+        finally:
+            if not args.work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        report['regressions'] = regressions
+        for regression in regressions:
+            print(f"Regression: {regression['stage']} at {regression['size']} tokens is {regression['ratio']:.2f}x slower")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+    sys.exit(1 if regressions else 0)
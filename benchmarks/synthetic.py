@@ -0,0 +1,82 @@
+"""Synthetic NER corpora shaped like the training data, for benchmarks.
+
+The corpus has the columns of the feature store (Sentence, Word, POS, Tag): the 'Sentence: n' key
+is only set on the first word of a sentence, words follow a Zipf distribution, sentence lengths a
+gamma distribution, and tags are well-formed BIO spans over the entity types of schema.yaml.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+
+def load_schema() -> dict:
+    with open(ROOT_DIR / 'config' / 'schema.yaml', 'rb') as file:
+        return yaml.safe_load(file)
+
+
+def make_sentence_lengths(n_tokens: int, rng: np.random.Generator, max_length: int=104) -> np.ndarray:
+    """Sentence lengths (mean ~22 words) adding up to exactly n_tokens."""
+    lengths = np.clip(rng.gamma(4.0, 5.5, size=n_tokens // 10 + 2).astype(np.int64), 1, max_length)
+    while lengths.sum() < n_tokens:
+        lengths = np.r_[lengths, lengths]
+    lengths = lengths[:np.searchsorted(np.cumsum(lengths), n_tokens) + 1]
+    lengths[-1] -= lengths.sum() - n_tokens
+    return lengths[lengths > 0]
+
+
+def make_tags(sentence_offsets: np.ndarray, entity_types: list, rng: np.random.Generator,
+              entity_rate: float=0.08) -> pd.Categorical:
+    """BIO tags: spans of geometric length start at ~entity_rate of the tokens and end with their sentence."""
+    n_tokens = int(sentence_offsets[-1])
+    tag_vocab = ['O'] + [f'{prefix}-{entity_type}' for entity_type in entity_types for prefix in ('B', 'I')]
+    codes = np.zeros(n_tokens, dtype=np.int16)
+
+    starts = np.flatnonzero(rng.random(n_tokens) < entity_rate)
+    sentence_ends = sentence_offsets[np.searchsorted(sentence_offsets, starts, side='right')]
+    span_lengths = np.minimum(rng.geometric(0.55, size=len(starts)), sentence_ends - starts)
+    types = rng.integers(0, len(entity_types), size=len(starts))
+
+    # Later spans overwrite earlier ones where they overlap, which keeps every span well formed.
+    positions = np.repeat(starts, span_lengths)
+    within_span = np.arange(len(positions)) - np.repeat(np.cumsum(span_lengths) - span_lengths, span_lengths)
+    codes[positions] = 1 + 2 * np.repeat(types, span_lengths) + (within_span > 0)
+    return pd.Categorical.from_codes(codes, categories=tag_vocab)
+
+
+def make_corpus(n_tokens: int, vocab_size: int=35_000, seed: int=0) -> pd.DataFrame:
+    """Returns a feature store DataFrame of n_tokens rows with categorical columns."""
+    rng = np.random.default_rng(seed)
+    schema = load_schema()
+
+    lengths = make_sentence_lengths(n_tokens, rng)
+    sentence_offsets = np.r_[0, np.cumsum(lengths)]
+    sentence_codes = np.full(n_tokens, -1, dtype=np.int64)
+    sentence_codes[sentence_offsets[:-1]] = np.arange(len(lengths))
+    sentence = pd.Categorical.from_codes(sentence_codes, categories=[f'Sentence: {i + 1}' for i in range(len(lengths))])
+
+    word_probabilities = 1.0 / np.arange(1, vocab_size + 1) ** 1.1
+    word_codes = rng.choice(vocab_size, size=n_tokens, p=word_probabilities / word_probabilities.sum())
+    word = pd.Categorical.from_codes(word_codes, categories=[f'word{i}' for i in range(vocab_size)])
+
+    pos_values = [str(value) for value in schema['pos_values']]
+    pos = pd.Categorical.from_codes(rng.integers(0, len(pos_values), size=n_tokens), categories=pos_values)
+
+    tag = make_tags(sentence_offsets, schema['entity_types'], rng)
+    return pd.DataFrame({'Sentence': sentence, 'Word': word, 'POS': pos, 'Tag': tag})
+
+
+def make_documents(corpus: pd.DataFrame) -> list:
+    """The corpus as MongoDB documents, as the upload notebook inserts them ('Sentence #' key, NaN if missing)."""
+    return corpus.astype(object).rename(columns={'Sentence': 'Sentence #'}).to_dict(orient='records')
+
+
+def make_sentences(n_sentences: int, vocab_size: int=35_000, seed: int=0) -> list:
+    """Texts for prediction requests, drawn from the same distribution as the corpus."""
+    corpus = make_corpus(n_sentences * 30, vocab_size=vocab_size, seed=seed)
+    starts = np.flatnonzero(corpus['Sentence'].notna().to_numpy())
+    words = corpus['Word'].astype(str).to_numpy()
+    return [' '.join(sentence) for sentence in np.split(words, starts[1:])[:n_sentences]]
@@ -0,0 +1,128 @@
+"""Benchmarks the token vocabulary lookup of the prediction path against a per-token dict.
+
+For each vocabulary size it measures, each in a fresh interpreter, the time and RSS it takes
+to get a usable vocabulary from the saved string table: memory mapping it as a Vocabulary, or
+building a {token: id} dict from it as NERModel did before. It then times the lookup of batches
+of tokens drawn from a Zipf distribution with some out-of-vocabulary tokens, and checks that
+both give the same ids.
+
+    python benchmarks/vocabulary.py
+    python benchmarks/vocabulary.py --vocab-sizes 35000 1000000 --batch-sizes 25 1600 20000 --output vocab.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+
+from src.entity.vocabulary import Vocabulary
+from src.constants import UNK_TOKEN_ID
+
+LOAD_SCRIPT = """
+import sys, time
+sys.path.insert(0, {root!r})
+from src.instrumentation import get_rss_bytes
+from src.entity.vocabulary import Vocabulary
+from src.utils.main_utils import load_string_table
+
+rss, start = get_rss_bytes(), time.perf_counter()
+if {approach!r} == 'dict':
+    token2index = {{token.decode('utf-8'): index + 2 for index, token in enumerate(load_string_table({path!r}))}}
+else:
+    vocabulary = Vocabulary.load({path!r}, offset=2, unknown_id=1)
+print(time.perf_counter() - start, get_rss_bytes() - rss)
+"""
+
+
+def make_vocabulary(vocab_size: int) -> list:
+    """Distinct tokens of varied length, a few of them non-ASCII."""
+    tokens = {f'w{i}' * (1 + i % 3) for i in range(vocab_size - 3)} | {'café', 'Zürich', '東京'}
+    return sorted(tokens)
+
+
+def make_queries(vocab: list, n_tokens: int, rng: np.random.Generator, oov_rate: float=0.05) -> list:
+    probabilities = 1.0 / np.arange(1, len(vocab) + 1) ** 1.1
+    indices = rng.choice(len(vocab), size=n_tokens, p=probabilities / probabilities.sum())
+    oov = rng.random(n_tokens) < oov_rate
+    return [f'oov{i}' if is_oov else vocab[i] for i, is_oov in zip(indices, oov)]
+
+
+def measure_load(file_path: str, approach: str, repeat: int) -> dict:
+    """Median seconds and RSS increase of loading the vocabulary in a fresh interpreter."""
+    runs = []
+    for _ in range(repeat):
+        script = LOAD_SCRIPT.format(root=str(ROOT_DIR), approach=approach, path=file_path)
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+        runs.append([float(value) for value in output.split()])
+    return {'seconds': statistics.median(run[0] for run in runs),
+            'rss_increase_bytes': int(statistics.median(run[1] for run in runs))}
+
+
+def time_lookup(lookup, queries: list, min_seconds: float=0.2) -> float:
+    """Median seconds of one lookup, over repeats adding up to about min_seconds."""
+    times = []
+    while sum(times) < min_seconds or len(times) < 5:
+        start = time.perf_counter()
+        lookup(queries)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run_vocab_size(vocab_size: int, batch_sizes: list, work_dir: str, args) -> dict:
+    vocab = make_vocabulary(vocab_size)
+    file_path = os.path.join(work_dir, f'token_vocab.{vocab_size}.npy')
+    Vocabulary.from_values(vocab).save(file_path)
+
+    vocabulary = Vocabulary.load(file_path, offset=UNK_TOKEN_ID + 1, unknown_id=UNK_TOKEN_ID)
+    token2index = {token: index + UNK_TOKEN_ID + 1 for index, token in enumerate(vocab)}
+
+    def dict_lookup(tokens: list) -> np.ndarray:
+        return np.array([token2index.get(token, UNK_TOKEN_ID) for token in tokens], dtype=np.int32)
+
+    results = {'load': {approach: measure_load(file_path, approach, args.repeat) for approach in ('dict', 'vocabulary')},
+               'lookup': {}}
+    rng = np.random.default_rng(args.seed)
+    for batch_size in batch_sizes:
+        queries = make_queries(vocab, batch_size, rng)
+        if not np.array_equal(vocabulary.lookup(queries), dict_lookup(queries)):
+            raise AssertionError(f'Vocabulary and dict lookups differ for vocab size {vocab_size}')
+        dict_seconds = time_lookup(dict_lookup, queries)
+        vocabulary_seconds = time_lookup(vocabulary.lookup, queries)
+        results['lookup'][str(batch_size)] = {'dict_ns_per_token': dict_seconds / batch_size * 1e9,
+                                              'vocabulary_ns_per_token': vocabulary_seconds / batch_size * 1e9}
+
+    load = results['load']
+    print(f"{vocab_size} tokens: load {load['dict']['seconds'] * 1e3:.1f} ms / "
+          f"{load['dict']['rss_increase_bytes'] / 1e6:.1f} MB as a dict, {load['vocabulary']['seconds'] * 1e3:.1f} ms / "
+          f"{load['vocabulary']['rss_increase_bytes'] / 1e6:.1f} MB as a Vocabulary")
+    for batch_size, lookup in results['lookup'].items():
+        print(f"  lookup of {batch_size:>6} tokens: {lookup['dict_ns_per_token']:.0f} ns/token with the dict, "
+              f"{lookup['vocabulary_ns_per_token']:.0f} ns/token with the Vocabulary")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vocab-sizes', type=int, nargs='+', default=[35_000, 1_000_000])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[25, 1_600, 20_000],
+                        help='Tokens per lookup: one sentence, a micro-batch of 64 sentences, a large batch.')
+    parser.add_argument('--repeat', type=int, default=3, help='Fresh interpreters per load measurement.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the report as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='ner-vocab-bench-') as work_dir:
+        report = {'args': vars(args),
+                  'results': {str(size): run_vocab_size(size, args.batch_sizes, work_dir, args) for size in args.vocab_sizes}}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
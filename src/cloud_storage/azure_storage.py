@@ -1,19 +1,96 @@
 import os
+import time
+import uuid
+import base64
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
 from src.logger import logging
 from src.exception import handle_exception, CustomException
 from src.configuration.azure_connection import CreateBlobServiceClient
+from src.constants import (AZURE_BLOB_BLOCK_SIZE, AZURE_BLOB_MAX_CONCURRENCY, AZURE_BLOB_MAX_RETRIES,
+                           AZURE_BLOB_RETRY_BACKOFF_SECONDS)
 
-from azure.core.exceptions import ResourceNotFoundError, ResourceExistsError, ServiceRequestError, AzureError
-
-import pickle
+from azure.core import MatchConditions
+from azure.core.exceptions import (ResourceNotFoundError, ResourceExistsError, ResourceModifiedError, ServiceRequestError,
+                                   ServiceResponseError, IncompleteReadError, HttpResponseError, AzureError)
 
 logger = logging.getLogger('Azure Storage Service')
 
+# Errors after which the same request can simply be sent again.
+RETRYABLE_ERRORS = (ServiceRequestError, ServiceResponseError, IncompleteReadError, ConnectionError, TimeoutError)
+
+
+def get_blob_size(properties) -> int:
+    """Size of the whole blob, from the properties returned by a ranged download.
+
+    For a ranged download the SDK sets `properties.size` to the size of the range; the size of
+    the blob is the total of the Content-Range, e.g. 'bytes 0-4194303/10485760'.
+    """
+    content_range = getattr(properties, 'content_range', None)
+    if not content_range or '/' not in content_range:
+        raise ValueError(f'Download has no Content-Range to read the blob size from: {content_range!r}')
+    return int(content_range.rsplit('/', 1)[1])
+
+
 class AzureBlobStorage:
-    """A Class to interact with Azure Blob Storage Account, for data upload and retrieval."""
+    """A Class to interact with Azure Blob Storage Account, for data upload and retrieval.
+
+    Files are transferred in blocks of `block_size` bytes, `max_concurrency` blocks at a time,
+    so memory use is bounded by the block size whatever the file size. A failed block is retried
+    on its own; blocks already transferred are not sent again.
+    """
+
+    def __init__(self, blob_service_client=None, block_size: int=AZURE_BLOB_BLOCK_SIZE,
+                 max_concurrency: int=AZURE_BLOB_MAX_CONCURRENCY, max_retries: int=AZURE_BLOB_MAX_RETRIES,
+                 retry_backoff_seconds: float=AZURE_BLOB_RETRY_BACKOFF_SECONDS):
+        self.blob_service_client = blob_service_client or CreateBlobServiceClient().blob_service_client
+        self.block_size = block_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+    def _with_retries(self, request, description: str):
+        """Calls `request`, retrying transient failures with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return request()
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff_seconds * 2 ** attempt
+                logger.warning(f'{description} failed ({e}), retrying in {delay:.1f}s '
+                               f'[{attempt + 1}/{self.max_retries}]')
+                time.sleep(delay)
+
+    def _map_blocks(self, transfer, block_indices, on_result=None) -> None:
+        """Runs `transfer(index)` for every block on `max_concurrency` threads.
 
-    def __init__(self):
-        self.blob_service_client = CreateBlobServiceClient().blob_service_client
+        At most 2 * max_concurrency blocks are in flight or waiting for `on_result` at any time.
+        """
+        def handle(done):
+            for future in done:
+                result = future.result()
+                if on_result is not None:
+                    on_result(*result)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='blob-transfer') as executor:
+            pending = set()
+            for index in block_indices:
+                if len(pending) >= 2 * self.max_concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    handle(done)
+                pending.add(executor.submit(lambda index=index: (index, transfer(index))))
+            handle(wait(pending).done)
+     
+    def get_blob_properties(self, file_blob_path: str, container_name: str):
+        """Returns the blob's properties (size, etag, content_settings.content_md5, ...) in one request.
+        
+        Unlike the other methods, Azure errors are raised as they are, so callers can tell a
+        missing blob (ResourceNotFoundError) from an unreachable service.
+        """
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=file_blob_path)
+        return self._with_retries(blob_client.get_blob_properties, f'Properties of {file_blob_path}')
      
     @handle_exception   
     def is_file_available(self, container_name: str, file_path: str) -> bool:
@@ -45,25 +122,68 @@ class AzureBlobStorage:
         
     @handle_exception
     def upload_file(self, file_path: str, file_blob_path: str,  container_name: str, remove: bool=True) -> None:
-        """This method uploads file to Azure Storage Service.
+        """This method uploads file to Azure Storage Service, see upload_file_to_blob.
+        
+        Failures are logged, not raised; callers that need to know should use upload_file_to_blob.
+        
+        Arguments:
+            file_path(str): Path of the local file.
+            file_blob_path(str): file path in the container to upload.
+            container_name(str): Name of the Container.
+            remove(bool): If True, deletes the local file after upload.
+        """
+        self.upload_file_to_blob(file_path, file_blob_path, container_name, remove=remove)
+        
+    def upload_file_to_blob(self, file_path: str, file_blob_path: str, container_name: str, remove: bool=True) -> str:
+        """Uploads a file to Azure Storage Service and raises CustomException if it fails.
+        
+        Files up to one block are sent in a single request. Larger files are staged block by block
+        in parallel and committed at the end, so the blob only changes once every block is uploaded.
         
         Arguments:
             file_path(str): Path of the local file.
             file_blob_path(str): file path in the container to upload.
             container_name(str): Name of the Container.
             remove(bool): If True, deletes the local file after upload.
+        
+        Returns: the ETag of the uploaded blob.
         """
         try:
             logger.info(f'Uploading file from {file_path} to {file_blob_path} in {container_name} blob storage container on Azure...')
             
             blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=file_blob_path)
+            file_size = os.path.getsize(file_path)
             
-            blob_client.upload_blob(data=open(file_path, 'rb'), overwrite=True)
+            if file_size <= self.block_size:
+                def upload():
+                    with open(file_path, 'rb') as file:
+                        return blob_client.upload_blob(data=file, overwrite=True)
+                response = self._with_retries(upload, f'Upload of {file_blob_path}')
+            else:
+                from azure.storage.blob import BlobBlock
+                
+                # Block ids must have the same length within a blob.
+                upload_id = uuid.uuid4().hex
+                n_blocks = -(-file_size // self.block_size)
+                block_ids = [base64.b64encode(f'{upload_id}-{index:08d}'.encode()).decode() for index in range(n_blocks)]
+                
+                def stage(index: int) -> None:
+                    with open(file_path, 'rb') as file:
+                        file.seek(index * self.block_size)
+                        data = file.read(self.block_size)
+                    self._with_retries(lambda: blob_client.stage_block(block_id=block_ids[index], data=data),
+                                       f'Upload of block {index} of {file_blob_path}')
+                
+                self._map_blocks(stage, range(n_blocks))
+                response = self._with_retries(
+                    lambda: blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in block_ids]),
+                    f'Commit of {file_blob_path}')
             logger.info('file uploaded Successfully!')
             
             if remove:
                 os.remove(file_path)
                 logging.info(f'Local file {file_path} deleted after upload!')
+            return response['etag']
             
         except ServiceRequestError as e:
             logging.error('There is a network error os DNS faliure, client cannot reach the Azure service.')
@@ -77,30 +197,92 @@ class AzureBlobStorage:
         
         
     @handle_exception
-    def download_file(self, file_blob_path: str, container_name: str, file_save_path: str) -> object:
-        """Downloads the specified model stored on Azure Blob Storage.
+    def download_file(self, file_blob_path: str, container_name: str, file_save_path: str, etag: str=None) -> None:
+        """Downloads a blob straight to disk, block by block, see download_blob_to_file.
+        
+        Failures are logged, not raised; callers that need to know should use download_blob_to_file.
         
         Arguments:
             file_blob_path(str): Path of the file in the container.
             container_name(str): Name of the Container in which model is stored.
             file_save_path(str): Path where file is to be saved.
-            
-        Returns:
-            just downloads the file in specified path.
+            etag(str): If given, only this version of the blob is downloaded.
+        """
+        self.download_blob_to_file(file_blob_path, container_name, file_save_path, etag=etag)
+        
+    def download_blob_to_file(self, file_blob_path: str, container_name: str, file_save_path: str, etag: str=None) -> int:
+        """Downloads a blob straight to disk, block by block, and raises CustomException if it fails.
+        
+        Blocks are written into a temporary file next to `file_save_path`, which is renamed into
+        place only once the download is complete, so readers never see a partial file. Blocks are
+        requested with the ETag of the first one: if the blob is replaced mid-download, the
+        download fails instead of mixing two versions.
+        
+        Arguments:
+            file_blob_path(str): Path of the file in the container.
+            container_name(str): Name of the Container in which model is stored.
+            file_save_path(str): Path where file is to be saved.
+            etag(str): If given, only this version of the blob is downloaded.
+        
+        Returns: the size of the blob, which is the size of the file written.
         """
         try:
-            logger.info('Downloading Model...')
+            logger.info(f'Downloading {file_blob_path} from {container_name} to {file_save_path}...')
             
-            file_status = self.is_file_available(container_name=container_name, file_path=file_blob_path)
-            if not file_status:
-                raise ResourceNotFoundError
-                
             blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=file_blob_path)
+            save_dir = os.path.dirname(os.path.abspath(file_save_path))
+            os.makedirs(save_dir, exist_ok=True)
+            
+            def download_block(offset: int, etag: str=None) -> tuple:
+                conditions = {'etag': etag, 'match_condition': MatchConditions.IfNotModified} if etag else {}
+                downloader = blob_client.download_blob(offset=offset, length=self.block_size, **conditions)
+                return downloader.readall(), downloader.properties
             
-            blob_data = blob_client.download_blob().readall()
+            def download_first_block() -> tuple:
+                try:
+                    data, properties = download_block(0, etag)
+                    return data, properties, get_blob_size(properties)
+                except HttpResponseError as e:
+                    # The service answers 416 to a range request on an empty blob.
+                    if e.status_code != 416:
+                        raise
+                properties = blob_client.get_blob_properties()
+                if properties.size != 0:
+                    raise CustomException(f'Range request on {file_blob_path} of {properties.size} bytes was rejected')
+                if etag and properties.etag != etag:
+                    raise ResourceModifiedError(f'{file_blob_path} was modified, its ETag is no longer {etag}')
+                return b'', properties, 0
             
-            with open(file_save_path, 'wb') as model_file:
-                pickle.dump(blob_data, model_file)
+            fd, temp_file_path = tempfile.mkstemp(dir=save_dir, prefix=f'.{os.path.basename(file_save_path)}.', suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    # The first block also returns the blob size and ETag, so no separate properties request is needed.
+                    data, properties, blob_size = self._with_retries(download_first_block,
+                                                                     f'Download of block 0 of {file_blob_path}')
+                    file.write(data)
+                    
+                    def download(index: int) -> bytes:
+                        offset = index * self.block_size
+                        return self._with_retries(
+                            lambda: download_block(offset, properties.etag)[0],
+                            f'Download of block {index} of {file_blob_path}')
+                    
+                    def write(index: int, data: bytes) -> None:
+                        file.seek(index * self.block_size)
+                        file.write(data)
+                    
+                    self._map_blocks(download, range(1, -(-blob_size // self.block_size)), write)
+                    file.flush()
+                    file_size = os.fstat(file.fileno()).st_size
+                if file_size != blob_size:
+                    raise CustomException(f'Downloaded {file_size} of the {blob_size} bytes of {file_blob_path}')
+                os.replace(temp_file_path, file_save_path)
+            except BaseException:
+                if os.path.exists(temp_file_path):
+                    os.remove(temp_file_path)
+                raise
+            logger.info(f'Downloaded {blob_size} bytes to {file_save_path}')
+            return blob_size
                 
         except ResourceNotFoundError as e:
             logging.error('ResourceError! Blob not found in container.')
@@ -0,0 +1,236 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+from azure.core.exceptions import ResourceNotFoundError, AzureError
+
+from src.exception import CustomException
+from src.logger import logging
+from src.cloud_storage.azure_storage import AzureBlobStorage, RETRYABLE_ERRORS
+from src.constants import (MODEL_CACHE_DIR, MODEL_CACHE_INDEX_FILE_NAME, MODEL_CACHE_LOCK_FILE_NAME,
+                           MODEL_CACHE_MAX_ENTRIES, MODEL_CACHE_MAX_SIZE_BYTES)
+
+logger = logging.getLogger('Model Cache')
+
+
+class FileLock:
+    """Exclusive lock on a file, held across every process and thread of the node that uses the same path.
+
+    With `shared`, any number of holders can have the lock at once, but not together with an exclusive
+    holder; Windows has no shared locks, so there it is exclusive too. Without `blocking`, acquiring a
+    lock that is held raises BlockingIOError instead of waiting. The lock is released when its process
+    dies, so it also tells whether any live process is holding it.
+    """
+
+    def __init__(self, lock_file_path: str, shared: bool=False, blocking: bool=True):
+        self.lock_file_path = lock_file_path
+        self.shared = shared
+        self.blocking = blocking
+        self._file = None
+
+    def acquire(self) -> 'FileLock':
+        os.makedirs(os.path.dirname(self.lock_file_path) or '.', exist_ok=True)
+        self._file = open(self.lock_file_path, 'a+b')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK if self.blocking else msvcrt.LK_NBLCK, 1)
+                except OSError as e:
+                    if self.blocking:
+                        raise
+                    raise BlockingIOError(f'{self.lock_file_path} is locked') from e
+            else:
+                import fcntl
+                flags = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+                fcntl.flock(self._file.fileno(), flags if self.blocking else flags | fcntl.LOCK_NB)
+        except BaseException:
+            self._file.close()
+            self._file = None
+            raise
+        return self
+
+    def is_on_path(self) -> bool:
+        """Whether the locked file is still the one at `lock_file_path`, i.e. it was not removed meanwhile."""
+        return os.path.exists(self.lock_file_path) and os.path.samestat(os.fstat(self._file.fileno()),
+                                                                         os.stat(self.lock_file_path))
+
+    def release(self) -> None:
+        if os.name == 'nt':
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self) -> 'FileLock':
+        return self.acquire()
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class ModelCache:
+    """Local on-disk cache of blobs in front of AzureBlobStorage.
+
+    Every `get` makes a single properties request. The blob is downloaded only if no local file
+    has the same content MD5 (or, for blobs without one, the same ETag). Files are stored under
+    `objects/` named by that content key, and a JSON index maps container/blob to its object.
+    Entries are evicted least recently used first, beyond `max_entries` or `max_size_bytes`.
+
+    The check and download happen under a file lock, so concurrent worker processes on one node
+    download a new model only once; the others wait and then reuse it.
+    """
+
+    def __init__(self, storage: AzureBlobStorage=None, cache_dir: str=MODEL_CACHE_DIR,
+                 max_entries: int=MODEL_CACHE_MAX_ENTRIES, max_size_bytes: int=MODEL_CACHE_MAX_SIZE_BYTES):
+        self.storage = storage or AzureBlobStorage()
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.index_file_path = os.path.join(cache_dir, MODEL_CACHE_INDEX_FILE_NAME)
+        self.lock_file_path = os.path.join(cache_dir, MODEL_CACHE_LOCK_FILE_NAME)
+        self.max_entries = max_entries
+        self.max_size_bytes = max_size_bytes
+
+    def _load_index(self) -> dict:
+        if not os.path.exists(self.index_file_path):
+            return {'entries': {}}
+        with open(self.index_file_path, 'r') as file:
+            return json.load(file)
+
+    def _save_index(self, index: dict) -> None:
+        tmp_file_path = f'{self.index_file_path}.tmp'
+        with open(tmp_file_path, 'w') as file:
+            json.dump(index, file, indent=4)
+        os.replace(tmp_file_path, self.index_file_path)
+
+    @staticmethod
+    def get_content_md5(properties) -> str:
+        content_md5 = getattr(properties.content_settings, 'content_md5', None)
+        return bytes(content_md5).hex() if content_md5 else None
+
+    @staticmethod
+    def same_etag(etag: str, other_etag: str) -> bool:
+        """Compares ETags with or without their surrounding quotes."""
+        return etag.strip('"') == other_etag.strip('"')
+
+    @staticmethod
+    def get_object_name(file_blob_path: str, properties) -> str:
+        """Name of the cached file: its content MD5 if the blob has one, else a hash of its ETag.
+
+        The blob's extension is kept, since loaders such as keras pick the format from it.
+        """
+        content_md5 = ModelCache.get_content_md5(properties)
+        if content_md5:
+            content_key = f'md5-{content_md5}'
+        else:
+            content_key = 'etag-' + hashlib.sha256(properties.etag.encode('utf-8')).hexdigest()[:32]
+        return content_key + os.path.splitext(file_blob_path)[1]
+
+    def get(self, file_blob_path: str, container_name: str, etag: str=None) -> str:
+        """Returns the path of an up to date local copy of the blob, downloading it only if it changed.
+
+        If the storage account cannot be reached, the last cached copy of the blob is returned.
+        With `etag`, only that version of the blob is returned: if the blob has been replaced since,
+        CustomException is raised.
+        """
+        key = f'{container_name}/{file_blob_path}'
+        try:
+            properties = self.storage.get_blob_properties(file_blob_path, container_name)
+        except ResourceNotFoundError as e:
+            raise CustomException(e)
+        except (AzureError, *RETRYABLE_ERRORS) as e:
+            with FileLock(self.lock_file_path):
+                entry = self._load_index()['entries'].get(key)
+            object_path = os.path.join(self.objects_dir, entry['object']) if entry else None
+            if etag is not None and entry and not self.same_etag(entry['etag'], etag):
+                object_path = None
+            if object_path and os.path.exists(object_path):
+                logger.warning(f'Cannot reach blob storage ({e}), using the cached copy of {key}')
+                return object_path
+            raise CustomException(e)
+
+        if etag is not None and not self.same_etag(properties.etag, etag):
+            raise CustomException(f'{key} was replaced, its ETag is no longer {etag}')
+        try:
+            object_name = self.get_object_name(file_blob_path, properties)
+            object_path = os.path.join(self.objects_dir, object_name)
+
+            with FileLock(self.lock_file_path):
+                index = self._load_index()
+                if os.path.exists(object_path) and os.path.getsize(object_path) == properties.size:
+                    logger.info(f'{key} is unchanged, using the cached copy {object_path}')
+                else:
+                    self._download(file_blob_path, container_name, object_path, properties)
+
+                index['entries'][key] = {'object': object_name, 'etag': properties.etag, 'size': properties.size,
+                                         'last_used': datetime.now().isoformat()}
+                self._evict(index, keep_key=key)
+                self._save_index(index)
+            return object_path
+        except Exception as e:
+            raise CustomException(e)
+
+    def _download(self, file_blob_path: str, container_name: str, object_path: str, properties) -> None:
+        """Downloads the blob into a dot file, checks it and only then moves it to `object_path`.
+
+        Nothing is published unless the file has the size of the blob and, for blobs with a
+        content MD5, the same MD5: a cached object is trusted from then on.
+        """
+        logger.info(f'Downloading {container_name}/{file_blob_path} ({properties.size} bytes) into the model cache')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        # Dot files are skipped by _evict and never looked up, so a failed download is never used.
+        download_path = os.path.join(self.objects_dir, f'.{os.path.basename(object_path)}.download')
+        try:
+            self.storage.download_blob_to_file(file_blob_path, container_name, download_path, etag=properties.etag)
+
+            file_size = os.path.getsize(download_path)
+            if file_size != properties.size:
+                raise CustomException(f'Downloaded {file_size} of the {properties.size} bytes of '
+                                      f'{container_name}/{file_blob_path}, download discarded')
+            content_md5 = self.get_content_md5(properties)
+            if content_md5:
+                md5 = hashlib.md5()
+                with open(download_path, 'rb') as file:
+                    for block in iter(lambda: file.read(1 << 20), b''):
+                        md5.update(block)
+                if md5.hexdigest() != content_md5:
+                    raise CustomException(f'Content MD5 of {container_name}/{file_blob_path} does not match, download discarded')
+            os.replace(download_path, object_path)
+        finally:
+            if os.path.exists(download_path):
+                os.remove(download_path)
+
+    def _evict(self, index: dict, keep_key: str) -> list:
+        """Drops least recently used entries beyond the count and size limits, and the files no entry uses.
+
+        Files of previous versions of a blob are removed here too, once no entry points to them.
+        """
+        entries = index['entries']
+        kept_objects, evicted, total_size = set(), [], 0
+        # Most recently used first.
+        for rank, (key, entry) in enumerate(sorted(entries.items(), key=lambda item: item[1]['last_used'], reverse=True)):
+            size = 0 if entry['object'] in kept_objects else entry['size']
+            if key != keep_key and (rank >= self.max_entries or total_size + size > self.max_size_bytes):
+                evicted.append(key)
+            else:
+                kept_objects.add(entry['object'])
+                total_size += size
+
+        for key in evicted:
+            del entries[key]
+        for object_name in os.listdir(self.objects_dir) if os.path.isdir(self.objects_dir) else []:
+            # Dot files are downloads in progress.
+            if object_name not in kept_objects and not object_name.startswith('.'):
+                try:
+                    os.remove(os.path.join(self.objects_dir, object_name))
+                except OSError as e:
+                    logger.warning(f'Could not remove {object_name} from the model cache: {e}')
+        if evicted:
+            logger.info(f'Evicted {len(evicted)} entries from the model cache: {evicted}')
+        return evicted
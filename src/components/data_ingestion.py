@@ -1,5 +1,9 @@
 import os
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
+from bson import ObjectId
 from pandas import DataFrame, read_csv
 from sklearn.model_selection import train_test_split
 
@@ -7,36 +11,197 @@ from src.entity.config_entity import DataIngestionConfig
 from src.entity.artifact_entity import DataIngestionArtifact
 from src.exception import CustomException
 from src.logger import logging
+from src.instrumentation import instrument, record_rows
 from src.data_access.ner_data import NerData
+from src.utils.main_utils import write_feature_store, list_feature_store_partitions
 
 logger = logging.getLogger('Data Ingestion')
 
 
 class DataIngestion:
-    def __init__(self, data_ingestion_config: DataIngestionConfig=DataIngestionConfig()):
+    def __init__(self, data_ingestion_config: DataIngestionConfig=None):
+        if data_ingestion_config is None:
+            data_ingestion_config = DataIngestionConfig()
         self.data_ingestion_config = data_ingestion_config
         
         
+    def load_watermark(self) -> Optional[dict]:
+        """Loads the high-water mark persisted by the previous ingestion run.
+        
+        Returns
+        -------
+            The watermark record, or None if there is no usable one (first run, or the
+            feature store was written with a different format or watermark field).
+        """
+        watermark_file_path = self.data_ingestion_config.watermark_file_path
+        if not os.path.exists(watermark_file_path):
+            return None
+        
+        if len(list_feature_store_partitions(self.data_ingestion_config.feature_store_dir)) == 0:
+            return None
+        
+        with open(watermark_file_path, 'r') as file:
+            watermark = json.load(file)
+            
+        if watermark.get('field') != self.data_ingestion_config.watermark_field or \
+                watermark.get('feature_store_format') != self.data_ingestion_config.feature_store_format:
+            logger.info('Stored watermark does not match the ingestion config, falling back to full refresh.')
+            return None
+        return watermark
+    
+    
+    def save_watermark(self, value: object, partition_file_path: str) -> None:
+        """Persists the high-water mark of the data now in the feature store, and the partition that holds it.
+
+        The watermark file is replaced atomically: it is the commit point of an ingestion run.
+        """
+        if isinstance(value, ObjectId):
+            value_type, value = 'objectid', str(value)
+        elif isinstance(value, datetime):
+            value_type, value = 'datetime', value.isoformat()
+        else:
+            value_type = 'raw'
+            
+        watermark = {
+            'field': self.data_ingestion_config.watermark_field,
+            'type': value_type,
+            'value': value,
+            'feature_store_format': self.data_ingestion_config.feature_store_format,
+            'partition': os.path.basename(partition_file_path),
+            'updated_at': datetime.now().isoformat(),
+        }
+        watermark_file_path = self.data_ingestion_config.watermark_file_path
+        os.makedirs(os.path.dirname(watermark_file_path), exist_ok=True)
+        with open(f'{watermark_file_path}.tmp', 'w') as file:
+            json.dump(watermark, file, indent=4)
+        os.replace(f'{watermark_file_path}.tmp', watermark_file_path)
+            
+            
+    @staticmethod
+    def decode_watermark(watermark: dict) -> object:
+        """Converts a stored watermark back to the value type used in the MongoDB query."""
+        if watermark['type'] == 'objectid':
+            return ObjectId(watermark['value'])
+        if watermark['type'] == 'datetime':
+            return datetime.fromisoformat(watermark['value'])
+        return watermark['value']
+        
+        
+    def get_watermark_cutoff(self) -> object:
+        """Upper limit, exclusive, of the watermark field for this run: now minus `watermark_lag_seconds`.
+
+        Documents at or above it are left for a later run, so documents that are still being
+        written with lower ids than ones already committed are not skipped by the watermark.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.data_ingestion_config.watermark_lag_seconds)
+        if self.data_ingestion_config.watermark_field == '_id':
+            return ObjectId.from_datetime(cutoff)
+        return cutoff
+        
+        
+    def get_partition_file_path(self) -> str:
+        """Returns the path of a new feature store partition."""
+        timestamp = datetime.now().strftime('%Y-%m-%d--%H-%M-%S-%f')
+        return os.path.join(self.data_ingestion_config.feature_store_dir,
+                            f'part-{timestamp}.{self.data_ingestion_config.feature_store_format}')
+        
+        
+    @staticmethod
+    def get_temp_partition_file_path(partition_file_path: str) -> str:
+        """Returns the name a partition is written under until it is committed, which readers ignore."""
+        return os.path.join(os.path.dirname(partition_file_path), f'.{os.path.basename(partition_file_path)}.tmp')
+        
+        
+    def recover_feature_store(self) -> None:
+        """Finishes or discards the partition of a previous run that stopped before renaming it into place.
+
+        A partition is written under a temporary name, then the watermark naming it is saved, then
+        it is renamed. A temporary partition named by the watermark was committed and is renamed into
+        place; any other was written by a run that stopped before saving its watermark and is deleted,
+        so a rerun imports its rows again without duplicating them.
+        """
+        feature_store_dir = self.data_ingestion_config.feature_store_dir
+        if not os.path.isdir(feature_store_dir):
+            return
+        
+        committed_partition = None
+        if os.path.exists(self.data_ingestion_config.watermark_file_path):
+            with open(self.data_ingestion_config.watermark_file_path, 'r') as file:
+                committed_partition = json.load(file).get('partition')
+                
+        for file_name in os.listdir(feature_store_dir):
+            if not (file_name.startswith('.part-') and file_name.endswith('.tmp')):
+                continue
+            partition_file_path = os.path.join(feature_store_dir, file_name[1:-len('.tmp')])
+            if os.path.basename(partition_file_path) == committed_partition:
+                logger.info(f'Renaming committed partition {partition_file_path} into place.')
+                os.replace(os.path.join(feature_store_dir, file_name), partition_file_path)
+            else:
+                logger.info(f'Removing uncommitted partition {file_name}.')
+                os.remove(os.path.join(feature_store_dir, file_name))
+        
+        
     def export_data_into_feature_store(self) -> DataFrame:
-        """This Method Imports data from mongodb to a csv file, and saves it to feature store.
+        """This Method Imports data from mongodb, and saves it to feature store as parquet or csv.
+        
+        In incremental mode only the documents above the stored watermark are imported,
+        and they are appended to the feature store as a new partition. Full refresh
+        (or a first incremental run) re-imports the collection and replaces all partitions.
 
             Returns
             -------
-                Data is returned as pandas DataFrame.
+                Newly imported data is returned as pandas DataFrame.
         """
         try:
             logger.info('Import data from MonngoDB...')
             my_data = NerData()
+            collection_name = self.data_ingestion_config.collection_name
+            watermark_field = self.data_ingestion_config.watermark_field
             
-            dataframe = my_data.export_collection_as_DataFrame(collection_name=self.data_ingestion_config.collection_name)
-            logger.info(f'Data Imported of shape: {dataframe.shape}')
+            self.recover_feature_store()
+            watermark = None
+            if self.data_ingestion_config.ingestion_mode == 'incremental':
+                watermark = self.load_watermark()
+            self.ingestion_mode = 'incremental' if watermark is not None else 'full'
+            
+            # Fix the upper bound first, below the lagging cutoff, so documents inserted during the
+            # export or still in flight are left for the next run.
+            cutoff = self.get_watermark_cutoff()
+            upper_bound = my_data.get_max_value(collection_name=collection_name, field=watermark_field,
+                                                query={watermark_field: {'$lt': cutoff}})
+            self.watermark = watermark['value'] if watermark is not None else None
+            if upper_bound is None:
+                logger.info(f'No documents with {watermark_field} below {cutoff}, nothing to import.')
+                return DataFrame()
             
-            raw_data_file_path = self.data_ingestion_config.raw_data_file_path
-            dir_name = os.path.join(raw_data_file_path)
-            os.makedirs(dir_name, exist_ok=True)
+            query = {watermark_field: {'$lte': upper_bound}}
+            if watermark is not None:
+                query[watermark_field]['$gt'] = self.decode_watermark(watermark)
+                logger.info(f'Incremental import of documents with {watermark_field} > {watermark["value"]}')
+            
+            dataframe = my_data.export_collection_as_DataFrame(collection_name=collection_name,
+                                                               batch_size=self.data_ingestion_config.export_batch_size,
+                                                               query=query,
+                                                               num_workers=self.data_ingestion_config.export_workers)
+            logger.info(f'Data Imported of shape: {dataframe.shape}')
             
-            logger.info('Saving Imported Data into feature store')
-            dataframe.to_csv(raw_data_file_path, index=False, header=True)
+            if len(dataframe) > 0:
+                partition_file_path = self.get_partition_file_path()
+                temp_partition_file_path = self.get_temp_partition_file_path(partition_file_path)
+                logger.info(f'Saving Imported Data into feature store as {self.data_ingestion_config.feature_store_format}')
+                write_feature_store(dataframe, temp_partition_file_path,
+                                    file_format=self.data_ingestion_config.feature_store_format)
+                
+                if self.ingestion_mode == 'full':
+                    for old_partition in list_feature_store_partitions(self.data_ingestion_config.feature_store_dir):
+                        os.remove(old_partition)
+                            
+                # Commits the partition; if the run stops before the rename, the next run finishes it.
+                self.save_watermark(upper_bound, partition_file_path)
+                os.replace(temp_partition_file_path, partition_file_path)
+                self.watermark = self.load_watermark()['value']
+            else:
+                logger.info('Feature store is already up to date.')
             
             return dataframe
         except Exception as e:
@@ -71,6 +236,7 @@ class DataIngestion:
             logger.error('Error occured while Spliting dataframe into train test.')
             raise CustomException(e)
         
+    @instrument('data_ingestion')
     def initiate_data_ingestion(self) -> DataIngestionArtifact:
         """This method initiates the data ingestion components of training pipeline.
         
@@ -81,9 +247,17 @@ class DataIngestion:
         try:
             logger.info('Initiating Data Ingestion....')
             dataframe = self.export_data_into_feature_store()
+            record_rows(rows_out=len(dataframe))
             # self.split_data_as_train_test(dataframe)
             
-            data_ingestion_artifact = DataIngestionArtifact(raw_data_file_path=self.data_ingestion_config.raw_data_file_path)
+            feature_store_dir = self.data_ingestion_config.feature_store_dir
+            data_ingestion_artifact = DataIngestionArtifact(raw_data_file_path=feature_store_dir,
+                                                            feature_store_format=self.data_ingestion_config.feature_store_format,
+                                                            ingestion_mode=self.ingestion_mode,
+                                                            watermark=self.watermark,
+                                                            new_rows=len(dataframe),
+                                                            has_data=os.path.isdir(feature_store_dir) and
+                                                                     len(list_feature_store_partitions(feature_store_dir)) > 0)
             
             logging.info(f'Data Ingestion Artifact: {data_ingestion_artifact}')
             return data_ingestion_artifact
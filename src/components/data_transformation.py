@@ -0,0 +1,189 @@
+import os
+import hashlib
+
+import numpy as np
+from pandas import Series
+from sklearn.model_selection import train_test_split
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import instrument, record_rows
+from src.utils.main_utils import read_yaml_file, read_feature_store, get_schema_dtypes, save_numpy_array_data
+from src.utils.sequence_utils import get_sentence_lengths
+from src.entity.config_entity import DataTransformationConfig
+from src.entity.vocabulary import Vocabulary
+from src.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact, DataTransformationArtifact
+from src.constants import SCHEMA_FILE_PATH, TOKEN_VOCAB_FILE_NAME, TAG_VOCAB_FILE_NAME, UNK_TOKEN_ID, MAX_TOKEN_BYTES
+
+logger = logging.getLogger('Data Transformation')
+
+
+class DataTransformation:
+    def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_artifact: DataValidationArtifact,
+                 data_transformation_config: DataTransformationConfig=None):
+        try:
+            self.data_ingestion_artifact = data_ingestion_artifact
+            self.data_validation_artifact = data_validation_artifact
+            if data_transformation_config is None:
+                data_transformation_config = DataTransformationConfig()
+            self.data_transformation_config = data_transformation_config
+            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self._params = read_yaml_file(file_path=data_transformation_config.params_file_path)['data_transformation']
+        except Exception as e:
+            raise CustomException(e)
+
+    @staticmethod
+    def get_sentence_offsets(sentence: Series) -> np.ndarray:
+        """Finds sentence boundaries from the forward-filled sentence key.
+
+        Only the first word of a sentence carries its 'Sentence: n' key, so the key is
+        forward filled on its categorical codes, and a new sentence starts wherever it changes.
+
+        Returns:
+            int64 array of length n_sentences + 1; sentence i is rows offsets[i]:offsets[i+1].
+        """
+        try:
+            codes = sentence.cat.codes.to_numpy()
+            rows = np.arange(len(codes))
+            last_labelled_row = np.maximum.accumulate(np.where(codes >= 0, rows, 0))
+            key = codes[last_labelled_row]
+
+            starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]]) if len(key) > 0 else np.empty(0, dtype=np.int64)
+            return np.r_[starts, len(key)].astype(np.int64)
+        except Exception as e:
+            raise CustomException(e)
+
+    @staticmethod
+    def encode_column(column: Series, offset: int=0, unknown_id: int=-1, max_bytes: int=None) -> tuple:
+        """Encodes a categorical column as int32 ids over a sorted vocabulary.
+
+        Sorting the categories makes the ids independent of the order the data was ingested in.
+        Missing values, and values longer than `max_bytes` in UTF-8, get `unknown_id`; the latter are
+        left out of the vocabulary, whose fixed-width table would otherwise be as wide as the longest one.
+
+        Returns:
+            (ids, vocabulary) where vocabulary.lookup maps the values to the same ids.
+        """
+        try:
+            column = column.cat.remove_unused_categories()
+            if max_bytes is not None:
+                too_long = np.array([len(str(category).encode('utf-8')) > max_bytes
+                                     for category in column.cat.categories], dtype=bool)
+                if too_long.any():
+                    logger.info(f'{too_long.sum()} values of {column.name} are longer than {max_bytes} bytes, '
+                                f'encoding them as unknown')
+                    column = column.cat.remove_categories(column.cat.categories[too_long])
+            categories = column.cat.categories.astype(str).to_numpy()
+            order = np.argsort(categories)
+
+            # remap[old_code] = position of the category in sorted order
+            remap = np.empty(len(order), dtype=np.int32)
+            remap[order] = np.arange(len(order), dtype=np.int32)
+            codes = column.cat.codes.to_numpy()
+            ids = np.where(codes >= 0, remap[codes] + offset, unknown_id).astype(np.int32)
+
+            vocabulary = Vocabulary.from_values(categories[order].tolist(), offset=offset, unknown_id=unknown_id)
+            return ids, vocabulary
+        except Exception as e:
+            raise CustomException(e)
+
+    def split_sentences(self, n_sentences: int) -> tuple:
+        """Splits sentence indices into train, validation and test sets.
+
+        Returns: (train_indices, val_indices, test_indices)
+        """
+        try:
+            sentence_indices = np.arange(n_sentences)
+            indices_, test_indices = train_test_split(sentence_indices, test_size=self._params['test_size'],
+                                                      random_state=self._params['random_state'])
+            train_indices, val_indices = train_test_split(indices_, test_size=self._params['validation_size'],
+                                                          random_state=self._params['random_state'])
+            return train_indices, val_indices, test_indices
+        except Exception as e:
+            raise CustomException(e)
+
+    def save_vocabulary(self, token_vocab: Vocabulary, tag_vocab: Vocabulary) -> tuple:
+        """Saves the vocabularies under a version derived from their content.
+
+        Returns:
+            (token_vocab_file_path, tag_vocab_file_path, vocab_version)
+        """
+        try:
+            vocab_hash = hashlib.sha256()
+            for value in token_vocab.to_list() + ['\x00'] + tag_vocab.to_list():
+                vocab_hash.update(value.encode('utf-8'))
+                vocab_hash.update(b'\x00')
+            vocab_version = vocab_hash.hexdigest()[:12]
+
+            vocab_dir = os.path.join(self.data_transformation_config.vocab_dir, vocab_version)
+            token_vocab_file_path = os.path.join(vocab_dir, TOKEN_VOCAB_FILE_NAME)
+            tag_vocab_file_path = os.path.join(vocab_dir, TAG_VOCAB_FILE_NAME)
+            token_vocab.save(token_vocab_file_path)
+            tag_vocab.save(tag_vocab_file_path)
+
+            logger.info(f'Vocabulary version {vocab_version} saved: {len(token_vocab.table)} tokens, '
+                        f'{len(tag_vocab.table)} tags')
+            return token_vocab_file_path, tag_vocab_file_path, vocab_version
+        except Exception as e:
+            raise CustomException(e)
+
+    @instrument('data_transformation')
+    def initiate_data_transformation(self) -> DataTransformationArtifact:
+        """Turns the feature store into flat token/tag id arrays plus sentence offsets (CSR layout).
+
+        No per-sentence Python lists are created; sentence i of the corpus is
+        token_ids[offsets[i]:offsets[i+1]]. The arrays and the train/val/test split are
+        written once as .npy files, which the trainer and evaluator memory map.
+
+        Returns: DataTransformationArtifact
+        """
+        try:
+            logger.info('Initiating Data Transformation....')
+            if not self.data_validation_artifact.validation_status:
+                raise Exception(f'Data validation failed: {self.data_validation_artifact.message}')
+
+            dataframe = read_feature_store(self.data_ingestion_artifact.raw_data_file_path,
+                                           columns=['Sentence', 'Word', 'Tag'],
+                                           dtype=get_schema_dtypes(self._schema_config))
+
+            sentence_offsets = self.get_sentence_offsets(dataframe['Sentence'])
+            # Reserved ids come first: PAD_TOKEN_ID=0, UNK_TOKEN_ID=1. Missing and overlong words map to UNK.
+            token_ids, token_vocab = self.encode_column(dataframe['Word'], offset=UNK_TOKEN_ID + 1,
+                                                        unknown_id=UNK_TOKEN_ID, max_bytes=MAX_TOKEN_BYTES)
+            tag_ids, tag_vocab = self.encode_column(dataframe['Tag'])
+            outside_id = tag_vocab.lookup(['O'])[0]
+            if outside_id >= 0:
+                tag_ids[tag_ids < 0] = outside_id
+            del dataframe
+
+            sentence_lengths = get_sentence_lengths(sentence_offsets)
+            train_indices, val_indices, test_indices = self.split_sentences(len(sentence_lengths))
+            logger.info(f'Transformed {len(token_ids)} tokens in {len(sentence_lengths)} sentences')
+            record_rows(rows_in=len(token_ids), rows_out=len(sentence_lengths))
+
+            config = self.data_transformation_config
+            save_numpy_array_data(config.token_ids_file_path, token_ids)
+            save_numpy_array_data(config.tag_ids_file_path, tag_ids)
+            save_numpy_array_data(config.sentence_offsets_file_path, sentence_offsets)
+            save_numpy_array_data(config.sentence_lengths_file_path, sentence_lengths)
+            save_numpy_array_data(config.train_indices_file_path, train_indices)
+            save_numpy_array_data(config.val_indices_file_path, val_indices)
+            save_numpy_array_data(config.test_indices_file_path, test_indices)
+            token_vocab_file_path, tag_vocab_file_path, vocab_version = self.save_vocabulary(token_vocab, tag_vocab)
+
+            data_transformation_artifact = DataTransformationArtifact(
+                token_ids_file_path=config.token_ids_file_path,
+                tag_ids_file_path=config.tag_ids_file_path,
+                sentence_offsets_file_path=config.sentence_offsets_file_path,
+                sentence_lengths_file_path=config.sentence_lengths_file_path,
+                train_indices_file_path=config.train_indices_file_path,
+                val_indices_file_path=config.val_indices_file_path,
+                test_indices_file_path=config.test_indices_file_path,
+                token_vocab_file_path=token_vocab_file_path,
+                tag_vocab_file_path=tag_vocab_file_path,
+                vocab_version=vocab_version)
+
+            logger.info(f'Data Transformation Artifact: {data_transformation_artifact}')
+            return data_transformation_artifact
+        except Exception as e:
+            raise CustomException(e)
@@ -1,26 +1,41 @@
 import os
 import json
 
-from pandas import DataFrame, read_csv
+import numpy as np
+from pandas import DataFrame, CategoricalDtype
+from pandas.api.types import is_object_dtype, is_string_dtype, pandas_dtype
 
 from src.exception import CustomException
 from src.logger import logging
-from src.utils.main_utils import read_yaml_file
+from src.instrumentation import instrument, record_rows
+from src.utils.main_utils import read_yaml_file, write_yaml_file, iter_feature_store, get_schema_dtypes
 from src.entity.config_entity import DataValidationConfig
 from src.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
-from src.constants import SCHEMA_FILE_PATH
- 
+from src.constants import SCHEMA_FILE_PATH, FEEDBACK_SENTENCE_PREFIX
+
 logger = logging.getLogger('Data Validation')
- 
+
+# Columns whose value distribution is profiled; Word is left out, its vocabulary is unbounded.
+PROFILED_COLUMNS = ('Tag', 'POS')
+
 class DataValidation:
+    """Validates the feature store in a single streaming pass.
+
+    Chunks of `chunk_size` rows are read one at a time and reduced to a profile of counts (nulls,
+    tag and POS values, a sentence length histogram), so memory is bounded by the chunk size.
+    The profile is checked against schema.yaml and compared with the profile of the last data
+    that passed validation to report drift.
+    """
+
     def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_config: DataValidationConfig):
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_validation_config = data_validation_config
             self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self._params = read_yaml_file(file_path=data_validation_config.params_file_path)['data_validation']
         except Exception as e:
             raise CustomException(e)
-    
+
     def validate_number_of_columns(self, dataframe: DataFrame) -> bool:
         """Validates the number of columns.
         Returns: bool
@@ -30,10 +45,10 @@ class DataValidation:
             return status
         except Exception as e:
             raise CustomException(e)
-    
+
     def is_column_present(self, dataframe: DataFrame) -> bool:
         """Checks if all different type of required columns are present
-        
+
         Returns: bool
         """
         try:
@@ -43,61 +58,293 @@ class DataValidation:
             for column in self._schema_config['categorical_columns']:
                 if column not in columns:
                     missing_categorical_columns.append(column)
-            
+
             if  len(missing_categorical_columns)>0:
                 logger.error(f'{len(missing_categorical_columns)} categorical columns are missing!')
-            
+
             return False if len(missing_categorical_columns)>0 else True
         except Exception as e:
             raise CustomException(e)
-        
-        
+
+    @staticmethod
+    def is_dtype_compatible(dtype, expected: str) -> bool:
+        """A column stored as strings, plain or dictionary encoded, satisfies a 'category' column of the schema."""
+        if expected == 'category':
+            return isinstance(dtype, CategoricalDtype) or is_object_dtype(dtype) or is_string_dtype(dtype)
+        return dtype == pandas_dtype(expected)
+
+    def profile_feature_store(self) -> dict:
+        """Reduces the feature store to a profile of counts, reading one chunk at a time.
+
+        A sentence starts at each row with a 'Sentence' key and can run over the end of a chunk,
+        so the length of the sentence still open is carried into the next chunk.
+
+        Returns:
+            dict: columns, row and sentence counts, null ratios, incompatible dtypes, value counts
+            of the profiled columns, and the sentence length histogram (index = length).
+            Prediction feedback may leave the schema's `feedback_optional_columns` empty, so their
+            null ratio is over the rows of the other sentences only.
+        """
+        try:
+            schema_dtypes = get_schema_dtypes(self._schema_config)
+            columns, n_rows, rows_before_first_sentence = None, 0, 0
+            null_counts = dict.fromkeys(schema_dtypes, 0)
+            dtype_mismatches = {}
+            value_counts = {column: {} for column in PROFILED_COLUMNS}
+            length_counts = np.zeros(1, dtype=np.int64)
+            open_length = None
+            feedback_optional_columns = set(self._schema_config.get('feedback_optional_columns', []))
+            n_feedback_rows, open_is_feedback = 0, False
+
+            def add_lengths(lengths: np.ndarray) -> None:
+                nonlocal length_counts
+                counts = np.bincount(lengths)
+                if len(counts) > len(length_counts):
+                    length_counts = np.pad(length_counts, (0, len(counts) - len(length_counts)))
+                length_counts[:len(counts)] += counts
+
+            for chunk in iter_feature_store(self.data_ingestion_artifact.raw_data_file_path,
+                                            chunk_size=self.data_validation_config.chunk_size):
+                if columns is None:
+                    columns = [str(column) for column in chunk.columns]
+                n_rows += len(chunk)
+
+                # A row belongs to the sentence of the last 'Sentence' key at or before it, which may be in an earlier chunk.
+                is_feedback = np.zeros(len(chunk), dtype=bool)
+                if 'Sentence' in chunk.columns:
+                    is_start = chunk['Sentence'].notna().to_numpy()
+                    start_is_feedback = chunk['Sentence'][is_start].astype(str).str.startswith(FEEDBACK_SENTENCE_PREFIX).to_numpy()
+                    is_feedback = np.r_[open_is_feedback, start_is_feedback][np.cumsum(is_start)]
+                    open_is_feedback = bool(is_feedback[-1]) if len(chunk) else open_is_feedback
+                n_feedback_rows += int(is_feedback.sum())
+
+                for column, dtype in schema_dtypes.items():
+                    if column not in chunk.columns:
+                        continue
+                    is_null = chunk[column].isna().to_numpy()
+                    if column in feedback_optional_columns:
+                        is_null = is_null & ~is_feedback
+                    null_counts[column] += int(is_null.sum())
+                    if not self.is_dtype_compatible(chunk[column].dtype, dtype):
+                        dtype_mismatches.setdefault(column, set()).add(str(chunk[column].dtype))
+
+                for column, counts in value_counts.items():
+                    if column not in chunk.columns:
+                        continue
+                    for value, count in chunk[column].value_counts().items():
+                        if count > 0:
+                            counts[str(value)] = counts.get(str(value), 0) + int(count)
+
+                if 'Sentence' not in chunk.columns:
+                    continue
+                starts = np.flatnonzero(chunk['Sentence'].notna().to_numpy())
+                if len(starts) == 0:
+                    if open_length is None:
+                        rows_before_first_sentence += len(chunk)
+                    else:
+                        open_length += len(chunk)
+                    continue
+
+                if open_length is None:
+                    rows_before_first_sentence += int(starts[0])
+                    add_lengths(np.diff(starts))
+                else:
+                    add_lengths(np.r_[open_length + starts[0], np.diff(starts)])
+                open_length = len(chunk) - int(starts[-1])
+            if open_length is not None:
+                add_lengths(np.array([open_length]))
+
+            return {
+                'columns': columns or [],
+                'n_rows': n_rows,
+                'n_sentences': int(length_counts.sum()),
+                'rows_before_first_sentence': rows_before_first_sentence,
+                'n_feedback_rows': n_feedback_rows,
+                'null_ratio': {column: count / max(n_rows - (n_feedback_rows if column in feedback_optional_columns else 0), 1)
+                               for column, count in null_counts.items()},
+                'dtype_mismatches': {column: sorted(dtypes) for column, dtypes in dtype_mismatches.items()},
+                'value_counts': value_counts,
+                'sentence_length_counts': length_counts.tolist(),
+            }
+        except Exception as e:
+            raise CustomException(e)
+
+    @staticmethod
+    def summarise_lengths(length_counts: list) -> dict:
+        """Mean, percentiles and max of a sentence length histogram."""
+        counts = np.asarray(length_counts, dtype=np.int64)
+        total = counts.sum()
+        if total == 0:
+            return {'mean': 0.0, 'p50': 0, 'p95': 0, 'p99': 0, 'max': 0}
+        cumulative = np.cumsum(counts)
+        percentile = lambda q: int(np.searchsorted(cumulative, q * total))
+        return {'mean': float((np.arange(len(counts)) * counts).sum() / total), 'p50': percentile(0.5),
+                'p95': percentile(0.95), 'p99': percentile(0.99), 'max': int(np.flatnonzero(counts)[-1])}
+
+    def check_profile(self, profile: dict) -> list:
+        """Checks the content of the profiled data against schema.yaml and params.yaml.
+
+        Returns:
+            A message for every failed check; empty if the data is valid.
+        """
+        try:
+            failures = []
+            if profile['n_rows'] == 0:
+                failures.append('The feature store is empty.')
+            for column, dtypes in profile['dtype_mismatches'].items():
+                failures.append(f'Column {column} has dtype {dtypes}, not compatible with the schema.')
+            for column, max_null_ratio in self._params['max_null_ratio'].items():
+                null_ratio = profile['null_ratio'].get(column, 0.0)
+                if null_ratio > max_null_ratio:
+                    failures.append(f'Column {column} is {null_ratio:.2%} null, more than {max_null_ratio:.2%}.')
+
+            entity_types = set(self._schema_config['entity_types'])
+            unknown_tags = sorted(tag for tag in profile['value_counts'].get('Tag', {})
+                                  if tag != 'O' and not (tag[:2] in ('B-', 'I-') and tag[2:] in entity_types))
+            if unknown_tags:
+                failures.append(f'Tags outside the BIO scheme of the schema: {unknown_tags}.')
+            unknown_pos = sorted(set(profile['value_counts'].get('POS', {})) - set(map(str, self._schema_config['pos_values'])))
+            if unknown_pos:
+                failures.append(f'Unknown POS values: {unknown_pos}.')
+
+            if profile['rows_before_first_sentence'] > 0:
+                failures.append(f"{profile['rows_before_first_sentence']} rows come before the first 'Sentence' key.")
+            max_length = len(profile['sentence_length_counts']) - 1
+            if max_length > self._params['max_sentence_length']:
+                failures.append(f"Sentences of up to {max_length} words, longer than {self._params['max_sentence_length']}.")
+            return failures
+        except Exception as e:
+            raise CustomException(e)
+
+    @staticmethod
+    def population_stability_index(reference: np.ndarray, current: np.ndarray, epsilon: float=1e-4) -> float:
+        """PSI between two histograms over the same bins; above ~0.2 is commonly read as a significant shift."""
+        reference = np.clip(reference / max(reference.sum(), 1), epsilon, None)
+        current = np.clip(current / max(current.sum(), 1), epsilon, None)
+        return float(np.sum((current - reference) * np.log(current / reference)))
+
+    def get_drift(self, profile: dict, reference_profile: dict) -> dict:
+        """Compares the profile with the reference profile: PSI of the tag, POS and sentence length
+        distributions, values never seen in the reference, and the change of the null ratios.
+        """
+        try:
+            drift = {}
+            for column in PROFILED_COLUMNS:
+                current_counts = profile['value_counts'].get(column, {})
+                reference_counts = reference_profile['value_counts'].get(column, {})
+                values = sorted(set(current_counts) | set(reference_counts))
+                psi = self.population_stability_index(np.array([reference_counts.get(value, 0) for value in values], dtype=np.float64),
+                                                       np.array([current_counts.get(value, 0) for value in values], dtype=np.float64))
+                drift[column] = {'psi': psi, 'drifted': psi > self._params['max_psi'],
+                                 'new_values': sorted(set(current_counts) - set(reference_counts))}
+
+            bins = self._params['sentence_length_bins']
+            binned = []
+            for length_counts in (reference_profile['sentence_length_counts'], profile['sentence_length_counts']):
+                bin_ids = np.digitize(np.arange(len(length_counts)), bins)
+                binned.append(np.bincount(bin_ids, weights=length_counts, minlength=len(bins) + 1))
+            psi = self.population_stability_index(*binned)
+            drift['sentence_length'] = {
+                'psi': psi, 'drifted': psi > self._params['max_psi'],
+                'reference': self.summarise_lengths(reference_profile['sentence_length_counts']),
+                'current': self.summarise_lengths(profile['sentence_length_counts'])}
+
+            drift['null_ratio_change'] = {column: ratio - reference_profile['null_ratio'].get(column, 0.0)
+                                          for column, ratio in profile['null_ratio'].items()}
+            drift['n_rows_change'] = profile['n_rows'] - reference_profile['n_rows']
+            return drift
+        except Exception as e:
+            raise CustomException(e)
+
+    @instrument('data_validation')
     def initiate_data_validation(self) -> DataValidationArtifact:
         """Initiates DataValidation.
         Returns: bool value based on validation results
         """
         try:
             logger.info('Validating Data...')
-            dataframe = read_csv(self.data_ingestion_artifact.raw_data_file_path)
-            
+            profile = self.profile_feature_store()
+            record_rows(rows_in=profile['n_rows'])
+            logger.info(f"Profiled {profile['n_rows']} rows and {profile['n_sentences']} sentences.")
+
             validation_success = True
             validation_msg = ''
-            
-            status = self.validate_number_of_columns(dataframe)
+
+            columns = DataFrame(columns=profile['columns'])
+            status = self.validate_number_of_columns(columns)
             logger.info(f'Status for all columns are present is {status}.')
             if not status:
                 validation_success = False
                 validation_msg += 'Some columns are missing!. '
             else:
                 validation_msg += 'All columns are present. '
-            
-            status = self.is_column_present(dataframe)
+
+            status = self.is_column_present(columns)
             if status:
                 logger.info('All categorical columns are present.')
                 validation_msg += 'All categorical columns are present. '
             else:
                 validation_success = False
                 validation_msg += 'Some categorical columns are missing!'
-            
-            data_validation_artifact = DataValidationArtifact(
-                validation_status=validation_success,
-                message=validation_msg,
-                validation_report_file_path=self.data_validation_config.validation_report_file_path)
-            
-            report_dir = os.path.dirname(self.data_validation_config.validation_report_file_path)
-            os.makedirs(report_dir, exists_ok=True)
-            
+
+            failures = self.check_profile(profile)
+            for failure in failures:
+                logger.error(failure)
+            if failures:
+                validation_success = False
+                validation_msg += f'{len(failures)} content checks failed. '
+            else:
+                validation_msg += 'All content checks passed. '
+
+            drift, drift_detected = None, False
+            reference_profile_file_path = self.data_validation_config.reference_profile_file_path
+            if os.path.exists(reference_profile_file_path):
+                with open(reference_profile_file_path, 'r') as file:
+                    drift = self.get_drift(profile, json.load(file))
+                drifted = [name for name, stats in drift.items() if isinstance(stats, dict) and stats.get('drifted')]
+                drift_detected = len(drifted) > 0
+                if drift_detected:
+                    logger.warning(f'Drift from the previous profile in {drifted}: {drift}')
+                    validation_msg += f'Drift detected in {drifted}. '
+                    if self._params['fail_on_drift']:
+                        validation_success = False
+            else:
+                logger.info('No previous profile to measure drift against.')
+
+            os.makedirs(self.data_validation_config.data_validation_dir, exist_ok=True)
+            with open(self.data_validation_config.profile_file_path, 'w') as file:
+                json.dump(profile, file, indent=4)
+
             validation_report = {
                 'validation_status': validation_success,
-                'message': validation_msg
+                'message': validation_msg,
+                'failed_checks': failures,
+                'n_rows': profile['n_rows'],
+                'n_sentences': profile['n_sentences'],
+                'null_ratio': profile['null_ratio'],
+                'sentence_length': self.summarise_lengths(profile['sentence_length_counts']),
+                'drift': drift,
             }
-            
-            with open(self.data_validation_config.validation_report_file_path, 'w') as file:
-                json.dump(validation_report, file, indent=4)
-                
-            logger.info('Data Validation Artifact created and saved as JSON file.')
+            write_yaml_file(self.data_validation_config.validation_report_file_path, validation_report, replace=True)
+
+            if validation_success:
+                # Later runs measure drift against the last data that passed validation.
+                tmp_file_path = f'{reference_profile_file_path}.tmp'
+                os.makedirs(os.path.dirname(reference_profile_file_path) or '.', exist_ok=True)
+                with open(tmp_file_path, 'w') as file:
+                    json.dump(profile, file, indent=4)
+                os.replace(tmp_file_path, reference_profile_file_path)
+
+            data_validation_artifact = DataValidationArtifact(
+                validation_status=validation_success,
+                message=validation_msg,
+                validation_report_file_path=self.data_validation_config.validation_report_file_path,
+                profile_file_path=self.data_validation_config.profile_file_path,
+                drift_detected=drift_detected)
+
+            logger.info('Data Validation Artifact created and validation report saved.')
             logger.info(f'Data validation artifact: {data_validation_artifact}')
-            
+
             return data_validation_artifact
         except Exception as e:
-            raise CustomException(e)
\ No newline at end of file
+            raise CustomException(e)
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import instrument, record_rows
+from src.utils.main_utils import read_yaml_file, load_string_table, load_numpy_array_data
+from src.utils.sequence_utils import BucketBatchSampler, pad_sentences, get_bio_scheme, extract_entity_spans
+from src.entity.estimator import load_estimator
+from src.entity.config_entity import ModelEvaluationConfig
+from src.entity.artifact_entity import DataTransformationArtifact, ModelExporterArtifact, ModelEvaluationArtifact
+from src.constants import PAD_TOKEN_ID
+
+logger = logging.getLogger('Model Evaluation')
+
+
+def precision_recall_f1(true_positives: np.ndarray, predicted: np.ndarray, actual: np.ndarray) -> tuple:
+    """Element-wise precision, recall and F1 from counts, 0 where undefined."""
+    true_positives = np.asarray(true_positives, dtype=np.float64)
+    precision = np.divide(true_positives, predicted, out=np.zeros_like(true_positives), where=np.asarray(predicted) > 0)
+    recall = np.divide(true_positives, actual, out=np.zeros_like(true_positives), where=np.asarray(actual) > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(true_positives),
+                   where=(precision + recall) > 0)
+    return precision, recall, f1
+
+
+class ModelEvaluation:
+    """Evaluates the exported model on the test split, per tag and per BIO entity.
+
+    Padded positions never count: predictions are gathered back to real tokens only, so neither
+    padding nor the 'O' tag (excluded from the macro averages) inflates the scores.
+    """
+
+    def __init__(self, data_transformation_artifact: DataTransformationArtifact, model_exporter_artifact: ModelExporterArtifact,
+                 model_evaluation_config: ModelEvaluationConfig=None):
+        try:
+            self.data_transformation_artifact = data_transformation_artifact
+            self.model_exporter_artifact = model_exporter_artifact
+            if model_evaluation_config is None:
+                model_evaluation_config = ModelEvaluationConfig()
+            self.model_evaluation_config = model_evaluation_config
+            self._params = read_yaml_file(file_path=model_evaluation_config.params_file_path)['model_evaluation']
+        except Exception as e:
+            raise CustomException(e)
+
+    def predict_test_split(self, estimator) -> tuple:
+        """Runs batched inference over the memory-mapped test split.
+
+        Returns:
+            (y_true, y_pred, sentence_starts): flat arrays over the real tokens of the test sentences.
+        """
+        try:
+            artifact = self.data_transformation_artifact
+            token_ids = load_numpy_array_data(artifact.token_ids_file_path, mmap_mode='r')
+            tag_ids = load_numpy_array_data(artifact.tag_ids_file_path, mmap_mode='r')
+            sentence_offsets = load_numpy_array_data(artifact.sentence_offsets_file_path, mmap_mode='r')
+            lengths = load_numpy_array_data(artifact.sentence_lengths_file_path, mmap_mode='r')
+            test_indices = load_numpy_array_data(artifact.test_indices_file_path, mmap_mode='r')
+
+            sampler = BucketBatchSampler(lengths, test_indices, self._params['batch_size'],
+                                         self._params['bucket_boundaries'], shuffle=False)
+            y_true, y_pred, sentence_starts = [], [], []
+            for batch in sampler.get_batches():
+                tokens = pad_sentences(token_ids, sentence_offsets, batch, pad_value=PAD_TOKEN_ID)
+                mask = tokens != PAD_TOKEN_ID
+                starts = np.zeros_like(mask)
+                starts[:, 0] = True
+
+                y_true.append(pad_sentences(tag_ids, sentence_offsets, batch)[mask])
+                y_pred.append(estimator.predict_ids(tokens)[mask])
+                sentence_starts.append(starts[mask])
+            return np.concatenate(y_true), np.concatenate(y_pred).astype(np.int32), np.concatenate(sentence_starts)
+        except Exception as e:
+            raise CustomException(e)
+
+    @staticmethod
+    def evaluate_tags(y_true: np.ndarray, y_pred: np.ndarray, tag_vocab: list) -> dict:
+        """Per-tag precision/recall/F1 from a confusion matrix built with one bincount."""
+        n_tags = len(tag_vocab)
+        confusion = np.bincount(y_true.astype(np.int64) * n_tags + y_pred, minlength=n_tags * n_tags).reshape(n_tags, n_tags)
+        support = confusion.sum(axis=1)
+        precision, recall, f1 = precision_recall_f1(np.diag(confusion), confusion.sum(axis=0), support)
+
+        entity_tags = np.array([tag != 'O' for tag in tag_vocab]) & (support > 0)
+        return {
+            'accuracy': float(np.trace(confusion) / max(confusion.sum(), 1)),
+            'macro_f1': float(f1[entity_tags].mean()) if entity_tags.any() else 0.0,
+            'per_tag': {tag: {'precision': float(precision[i]), 'recall': float(recall[i]), 'f1': float(f1[i]),
+                              'support': int(support[i])} for i, tag in enumerate(tag_vocab)},
+        }
+
+    @staticmethod
+    def evaluate_entities(y_true: np.ndarray, y_pred: np.ndarray, sentence_starts: np.ndarray, tag_vocab: list) -> dict:
+        """Exact-match span precision/recall/F1, overall and per entity type."""
+        is_inside, entity_type, entity_types = get_bio_scheme(tag_vocab)
+        n_types, n_tokens = len(entity_types), len(y_true)
+
+        def encode(tag_ids):
+            starts, ends, types = extract_entity_spans(tag_ids, sentence_starts, is_inside, entity_type)
+            # One integer per (start, end, type), so matching spans is a set intersection.
+            return (starts.astype(np.int64) * n_tokens + ends) * max(n_types, 1) + types, types
+
+        true_spans, true_types = encode(y_true)
+        pred_spans, pred_types = encode(y_pred)
+        correct_types = np.intersect1d(true_spans, pred_spans) % max(n_types, 1)
+
+        counts = [np.bincount(types, minlength=n_types) for types in (correct_types, pred_types, true_types)]
+        precision, recall, f1 = precision_recall_f1(*counts)
+        overall = precision_recall_f1(*[[count.sum()] for count in counts])
+        return {
+            'precision': float(overall[0][0]), 'recall': float(overall[1][0]), 'f1': float(overall[2][0]),
+            'per_type': {name: {'precision': float(precision[i]), 'recall': float(recall[i]), 'f1': float(f1[i]),
+                                'support': int(counts[2][i])} for i, name in enumerate(entity_types)},
+        }
+
+    @instrument('model_evaluation')
+    def initiate_model_evaluation(self) -> ModelEvaluationArtifact:
+        """Evaluates the exported model on the test split and writes a JSON report.
+
+        Returns: ModelEvaluationArtifact
+        """
+        try:
+            logger.info('Initiating Model Evaluation....')
+            model_dir = os.path.dirname(self.model_exporter_artifact.onnx_model_file_path)
+            estimator = load_estimator(model_dir, self._params['backend'])
+            tag_vocab = np.char.decode(load_string_table(self.data_transformation_artifact.tag_vocab_file_path),
+                                       'utf-8').tolist()
+
+            start = time.perf_counter()
+            y_true, y_pred, sentence_starts = self.predict_test_split(estimator)
+            inference_seconds = time.perf_counter() - start
+            record_rows(rows_in=len(y_true))
+            tag_report = self.evaluate_tags(y_true, y_pred, tag_vocab)
+            entity_report = self.evaluate_entities(y_true, y_pred, sentence_starts, tag_vocab)
+            seconds = time.perf_counter() - start
+
+            report = {
+                'model_dir': model_dir,
+                'backend': self._params['backend'],
+                'n_sentences': int(sentence_starts.sum()),
+                'n_tokens': int(len(y_true)),
+                'inference_seconds': inference_seconds,
+                'seconds': seconds,
+                'token': tag_report,
+                'entity': entity_report,
+            }
+            report_file_path = self.model_evaluation_config.report_file_path
+            os.makedirs(os.path.dirname(report_file_path), exist_ok=True)
+            with open(report_file_path, 'w') as file:
+                json.dump(report, file, indent=4)
+
+            logger.info(f"Evaluated {report['n_tokens']} test tokens in {seconds:.2f}s: token accuracy "
+                        f"{tag_report['accuracy']:.4f}, tag macro F1 {tag_report['macro_f1']:.4f}, entity F1 {entity_report['f1']:.4f}")
+
+            model_evaluation_artifact = ModelEvaluationArtifact(
+                report_file_path=report_file_path,
+                token_accuracy=tag_report['accuracy'],
+                token_macro_f1=tag_report['macro_f1'],
+                entity_precision=entity_report['precision'],
+                entity_recall=entity_report['recall'],
+                entity_f1=entity_report['f1'])
+
+            logger.info(f'Model Evaluation Artifact: {model_evaluation_artifact}')
+            return model_evaluation_artifact
+        except Exception as e:
+            raise CustomException(e)
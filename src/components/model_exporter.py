@@ -0,0 +1,148 @@
+import os
+import shutil
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import load_model #type: ignore
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import instrument, record_rows
+from src.utils.main_utils import read_yaml_file, load_numpy_array_data
+from src.utils.sequence_utils import pad_sentences
+from src.entity.estimator import create_onnx_session
+from src.entity.config_entity import ModelExporterConfig
+from src.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact, ModelExporterArtifact
+from src.constants import PAD_TOKEN_ID, ONNX_INPUT_NAME, TOKEN_VOCAB_FILE_NAME, TAG_VOCAB_FILE_NAME
+
+logger = logging.getLogger('Model Exporter')
+
+
+class ModelExporter:
+    """Exports the trained tagger to ONNX, optionally quantizes it to int8, and checks both against Keras."""
+
+    def __init__(self, data_transformation_artifact: DataTransformationArtifact, model_trainer_artifact: ModelTrainerArtifact,
+                 model_exporter_config: ModelExporterConfig=None):
+        try:
+            self.data_transformation_artifact = data_transformation_artifact
+            self.model_trainer_artifact = model_trainer_artifact
+            if model_exporter_config is None:
+                model_exporter_config = ModelExporterConfig()
+            self.model_exporter_config = model_exporter_config
+            self._params = read_yaml_file(file_path=model_exporter_config.params_file_path)['model_exporter']
+        except Exception as e:
+            raise CustomException(e)
+
+    def export_to_onnx(self, model, onnx_model_file_path: str) -> None:
+        """Converts the Keras model to ONNX with both the batch and the sequence axis left dynamic."""
+        try:
+            import tf2onnx
+
+            input_signature = (tf.TensorSpec(shape=(None, None), dtype=tf.int32, name=ONNX_INPUT_NAME),)
+
+            @tf.function(input_signature=input_signature)
+            def serve(token_ids):
+                return model(token_ids, training=False)
+
+            tf2onnx.convert.from_function(serve, input_signature=input_signature, opset=self._params['opset'],
+                                          output_path=onnx_model_file_path)
+            logger.info(f'ONNX model saved to {onnx_model_file_path}')
+        except Exception as e:
+            raise CustomException(e)
+
+    def quantize(self, onnx_model_file_path: str, quantized_model_file_path: str) -> None:
+        """Writes a copy of the model with int8 weights; activations are quantized on the fly at run time."""
+        try:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+
+            quantize_dynamic(onnx_model_file_path, quantized_model_file_path, weight_type=QuantType.QInt8)
+            logger.info(f'Quantized ONNX model saved to {quantized_model_file_path}')
+        except Exception as e:
+            raise CustomException(e)
+
+    def get_parity_batch(self) -> tuple:
+        """Pads the first `parity_samples` test sentences into one batch.
+
+        Returns: (token_ids, mask)
+        """
+        try:
+            artifact = self.data_transformation_artifact
+            token_ids = load_numpy_array_data(artifact.token_ids_file_path, mmap_mode='r')
+            sentence_offsets = load_numpy_array_data(artifact.sentence_offsets_file_path, mmap_mode='r')
+            test_indices = load_numpy_array_data(artifact.test_indices_file_path, mmap_mode='r')
+
+            batch = np.asarray(test_indices[:self._params['parity_samples']])
+            tokens = pad_sentences(token_ids, sentence_offsets, batch, pad_value=PAD_TOKEN_ID)
+            return tokens, tokens != PAD_TOKEN_ID
+        except Exception as e:
+            raise CustomException(e)
+
+    @staticmethod
+    def compare_outputs(expected: np.ndarray, actual: np.ndarray, mask: np.ndarray) -> tuple:
+        """Compares two tag probability tensors on real (non padded) positions.
+
+        Returns: (max_abs_diff, tag_agreement)
+        """
+        max_abs_diff = float(np.abs(expected[mask] - actual[mask]).max(initial=0.0))
+        tag_agreement = float((expected.argmax(axis=-1) == actual.argmax(axis=-1))[mask].mean())
+        return max_abs_diff, tag_agreement
+
+    @instrument('model_exporter')
+    def initiate_model_exporter(self) -> ModelExporterArtifact:
+        """Exports the trained model and verifies that ONNX Runtime reproduces the Keras outputs.
+
+        Returns: ModelExporterArtifact
+        """
+        try:
+            logger.info('Initiating Model Exporter....')
+            config = self.model_exporter_config
+            os.makedirs(config.exported_model_dir, exist_ok=True)
+
+            trained_model_file_path = self.model_trainer_artifact.trained_model_file_path
+            model = load_model(trained_model_file_path)
+            self.export_to_onnx(model, config.onnx_model_file_path)
+
+            # The exported directory is a self-contained bundle for the prediction pipeline.
+            shutil.copyfile(self.data_transformation_artifact.token_vocab_file_path,
+                            os.path.join(config.exported_model_dir, TOKEN_VOCAB_FILE_NAME))
+            shutil.copyfile(self.data_transformation_artifact.tag_vocab_file_path,
+                            os.path.join(config.exported_model_dir, TAG_VOCAB_FILE_NAME))
+
+            tokens, mask = self.get_parity_batch()
+            record_rows(rows_in=len(tokens))
+            expected = np.asarray(model.predict_on_batch(tokens))
+
+            session = create_onnx_session(config.onnx_model_file_path)
+            actual = session.run(None, {ONNX_INPUT_NAME: tokens})[0]
+            max_abs_diff, tag_agreement = self.compare_outputs(expected, actual, mask)
+            logger.info(f'ONNX parity: max abs diff {max_abs_diff:.2e}, tag agreement {tag_agreement:.4f}')
+            if max_abs_diff > self._params['parity_atol']:
+                raise CustomException(f"ONNX outputs differ from Keras by {max_abs_diff:.2e}, "
+                                      f"more than parity_atol={self._params['parity_atol']}")
+
+            quantized_model_file_path, quantized_tag_agreement = None, None
+            if self._params['quantize']:
+                self.quantize(config.onnx_model_file_path, config.quantized_model_file_path)
+                quantized_session = create_onnx_session(config.quantized_model_file_path)
+                _, quantized_tag_agreement = self.compare_outputs(
+                    expected, quantized_session.run(None, {ONNX_INPUT_NAME: tokens})[0], mask)
+                logger.info(f'Quantized ONNX tag agreement {quantized_tag_agreement:.4f}')
+
+                if quantized_tag_agreement >= self._params['min_quantized_tag_agreement']:
+                    quantized_model_file_path = config.quantized_model_file_path
+                else:
+                    logger.warning(f"Quantized model agrees on only {quantized_tag_agreement:.4f} of the tags, "
+                                   f"below {self._params['min_quantized_tag_agreement']}; discarding it")
+                    os.remove(config.quantized_model_file_path)
+
+            model_exporter_artifact = ModelExporterArtifact(
+                onnx_model_file_path=config.onnx_model_file_path,
+                quantized_model_file_path=quantized_model_file_path,
+                max_abs_diff=max_abs_diff,
+                tag_agreement=tag_agreement,
+                quantized_tag_agreement=quantized_tag_agreement)
+
+            logger.info(f'Model Exporter Artifact: {model_exporter_artifact}')
+            return model_exporter_artifact
+        except Exception as e:
+            raise CustomException(e)
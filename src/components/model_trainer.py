@@ -0,0 +1,243 @@
+import os
+import time
+import shutil
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import Sequential, Input #type: ignore
+from tensorflow.keras.layers import LSTM, Embedding, Dense, Bidirectional #type: ignore
+from tensorflow.keras.callbacks import EarlyStopping, Callback #type: ignore
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import instrument, record_rows
+from src.utils.main_utils import read_yaml_file, load_numpy_array_data
+from src.utils.sequence_utils import BucketBatchSampler, gather_sentences
+from src.entity.config_entity import ModelTrainerConfig
+from src.entity.vocabulary import Vocabulary
+from src.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact
+from src.constants import PAD_TOKEN_ID, UNK_TOKEN_ID, TOKEN_VOCAB_FILE_NAME, TAG_VOCAB_FILE_NAME
+
+logger = logging.getLogger('Model Trainer')
+
+
+class ThroughputLogger(Callback):
+    """Logs the training samples and tokens per second of every epoch.
+
+    The clock starts when the first batch has finished, so tracing the training step is left out,
+    and that batch is counted as an average one; it stops when validation starts, so the rate covers
+    the training batches only. It is also added to the epoch logs as `samples_per_second`, and so to
+    the history.
+    """
+
+    def __init__(self, n_samples: int, n_tokens: int):
+        super().__init__()
+        self.n_samples = n_samples
+        self.n_tokens = n_tokens
+        self._epoch_start = None
+        self._start = None
+        self._end = None
+
+    def on_epoch_begin(self, epoch: int, logs: dict=None) -> None:
+        self._epoch_start, self._start, self._end = time.perf_counter(), None, None
+
+    def on_train_batch_end(self, batch: int, logs: dict=None) -> None:
+        if batch == 0:
+            self._start = time.perf_counter()
+
+    def on_test_begin(self, logs: dict=None) -> None:
+        if self._epoch_start is not None and self._end is None:
+            self._end = time.perf_counter()
+
+    def on_epoch_end(self, epoch: int, logs: dict=None) -> None:
+        n_batches = self.params.get('steps') or 0
+        if self._start is not None and n_batches > 1:
+            start, timed_fraction = self._start, (n_batches - 1) / n_batches
+        else:
+            start, timed_fraction = self._epoch_start, 1.0
+        seconds = (self._end or time.perf_counter()) - start
+        samples_per_second = self.n_samples * timed_fraction / seconds if seconds > 0 else 0.0
+        tokens_per_second = self.n_tokens * timed_fraction / seconds if seconds > 0 else 0.0
+        if logs is not None:
+            logs['samples_per_second'] = samples_per_second
+        logger.info(f'Epoch {epoch + 1}: {samples_per_second:.1f} samples/s, '
+                    f'{tokens_per_second:.1f} tokens/s over {seconds:.2f}s')
+
+
+class ModelTrainer:
+    def __init__(self, data_transformation_artifact: DataTransformationArtifact,
+                 model_trainer_config: ModelTrainerConfig=None):
+        try:
+            self.data_transformation_artifact = data_transformation_artifact
+            if model_trainer_config is None:
+                model_trainer_config = ModelTrainerConfig()
+            self.model_trainer_config = model_trainer_config
+            self._params = read_yaml_file(file_path=model_trainer_config.params_file_path)['model_trainer']
+        except Exception as e:
+            raise CustomException(e)
+
+    def get_bilstm_lstm_model(self, vocab_size: int, n_tags: int) -> Sequential:
+        """Builds the BiLSTM-LSTM tagger.
+
+        The input has no fixed length, so every batch can be padded to its own length.
+        Dense is applied per time step on the 3D LSTM output, which is what TimeDistributed
+        did, but without fixing the number of time steps at trace time.
+        """
+        try:
+            output_dim = self._params['embedding_dim']
+            units = self._params['lstm_units']
+
+            model = Sequential()
+            model.add(Input(shape=(None,), dtype='int32'))
+            model.add(Embedding(input_dim=vocab_size, output_dim=output_dim))
+            model.add(Bidirectional(LSTM(units=units, return_sequences=True, dropout=0.2, recurrent_dropout=0.2), merge_mode='concat'))
+            model.add(LSTM(units=units, return_sequences=True, dropout=0.5, recurrent_dropout=0.5))
+            model.add(Dense(n_tags, activation='softmax'))
+
+            # Tags are class ids, not one-hot rows; accuracy is weighted by the padding mask.
+            model.compile(loss='sparse_categorical_crossentropy', optimizer='adam', weighted_metrics=['accuracy'])
+            return model
+        except Exception as e:
+            raise CustomException(e)
+
+    def configure_parallelism(self) -> None:
+        """Sets the intra-op and inter-op thread pools of the TensorFlow runtime from params.yaml; 0 uses every core.
+
+        The pools are created when the first operation runs, so this has to be called before that;
+        afterwards TensorFlow keeps its current pools and only a warning is logged.
+        """
+        intra_op_threads = self._params['intra_op_parallelism_threads']
+        inter_op_threads = self._params['inter_op_parallelism_threads']
+        try:
+            if tf.config.threading.get_intra_op_parallelism_threads() != intra_op_threads:
+                tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+            if tf.config.threading.get_inter_op_parallelism_threads() != inter_op_threads:
+                tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        except RuntimeError as e:
+            logger.warning(f'TensorFlow is already initialized, keeping its thread pools: {e}')
+        logger.info(f'{os.cpu_count()} cores: {intra_op_threads or "all"} intra-op threads, '
+                    f'{inter_op_threads or "all"} inter-op threads')
+
+    def make_dataset(self, token_ids: np.ndarray, tag_ids: np.ndarray, sentence_offsets: np.ndarray,
+                     sentence_indices: np.ndarray, shuffle: bool) -> tf.data.Dataset:
+        """tf.data pipeline of length-bucketed batches of the given sentences, each padded only to its own longest sentence.
+
+        Batches are (token_ids, tag_ids, mask): tags stay int32 class ids for a sparse loss,
+        and the mask is the per-token sample weight that excludes padded positions.
+        Sentences are bucketed at the same boundaries as BucketBatchSampler. With shuffle, they
+        are reshuffled every epoch from a fixed seed, so the batches of a run are reproducible.
+        Sentences are sliced and masks computed by parallel maps, and batches are prefetched
+        while the model trains on the previous ones.
+        """
+        try:
+            # The sentences of the split are gathered in numpy, so only they are read and copied into TensorFlow.
+            sentence_indices = np.asarray(sentence_indices)
+            split_token_ids, split_offsets = gather_sentences(token_ids, sentence_offsets, sentence_indices)
+            split_tag_ids, _ = gather_sentences(tag_ids, sentence_offsets, sentence_indices)
+            tokens = tf.RaggedTensor.from_row_splits(split_token_ids, split_offsets)
+            tags = tf.RaggedTensor.from_row_splits(split_tag_ids, split_offsets)
+
+            # The shuffle buffer holds sentence positions; the sentences are sliced out by a parallel map.
+            dataset = tf.data.Dataset.range(len(sentence_indices))
+            if shuffle:
+                dataset = dataset.shuffle(len(sentence_indices), seed=self._params['random_state'],
+                                          reshuffle_each_iteration=True)
+            dataset = dataset.map(lambda position: (tokens[position], tags[position]),
+                                  num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+
+            batch_size = self._params['batch_size']
+            bucket_boundaries = self._params['bucket_boundaries']
+            dataset = dataset.bucket_by_sequence_length(
+                lambda tokens, tags: tf.shape(tokens)[0], bucket_boundaries,
+                [batch_size] * (len(bucket_boundaries) + 1),
+                padding_values=(tf.constant(PAD_TOKEN_ID, tf.int32), tf.constant(0, tf.int32)))
+            # Bucketing hides the number of batches from Keras; it is the sampler's, which batches the same buckets.
+            lengths = np.diff(np.asarray(sentence_offsets))
+            n_batches = len(BucketBatchSampler(lengths, sentence_indices, batch_size, bucket_boundaries))
+            dataset = dataset.apply(tf.data.experimental.assert_cardinality(n_batches))
+
+            def add_mask(tokens: tf.Tensor, tags: tf.Tensor) -> tuple:
+                mask = tf.cast(tokens != PAD_TOKEN_ID, tf.float32)
+                # The loss is averaged over all positions, so scale the weights to average over real tokens only.
+                mask *= tf.cast(tf.size(mask), tf.float32) / tf.maximum(tf.reduce_sum(mask), 1.0)
+                return tokens, tags, mask
+
+            dataset = dataset.map(add_mask, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+
+            options = tf.data.Options()
+            options.threading.private_threadpool_size = self._params['data_pipeline_threads']
+            return dataset.with_options(options).prefetch(tf.data.AUTOTUNE)
+        except Exception as e:
+            raise CustomException(e)
+
+    @instrument('model_trainer')
+    def initiate_model_trainer(self) -> ModelTrainerArtifact:
+        """Trains the tagger on length-bucketed batches from a tf.data pipeline and saves it.
+
+        Returns: ModelTrainerArtifact
+        """
+        try:
+            logger.info('Initiating Model Trainer....')
+            self.configure_parallelism()
+            # Memory mapped: only the sentences of the splits are read into the input pipelines.
+            artifact = self.data_transformation_artifact
+            token_ids = load_numpy_array_data(artifact.token_ids_file_path, mmap_mode='r')
+            tag_ids = load_numpy_array_data(artifact.tag_ids_file_path, mmap_mode='r')
+            sentence_offsets = load_numpy_array_data(artifact.sentence_offsets_file_path, mmap_mode='r')
+            lengths = load_numpy_array_data(artifact.sentence_lengths_file_path, mmap_mode='r')
+            train_indices = load_numpy_array_data(artifact.train_indices_file_path, mmap_mode='r')
+            val_indices = load_numpy_array_data(artifact.val_indices_file_path, mmap_mode='r')
+            token_vocab = Vocabulary.load(artifact.token_vocab_file_path, offset=UNK_TOKEN_ID + 1, unknown_id=UNK_TOKEN_ID)
+            tag_vocab = Vocabulary.load(artifact.tag_vocab_file_path)
+
+            record_rows(rows_in=len(train_indices) + len(val_indices))
+            vocab_size = len(token_vocab)
+            n_tags = len(tag_vocab)
+
+            batch_size = self._params['batch_size']
+            bucket_boundaries = self._params['bucket_boundaries']
+            # Same buckets as the input pipeline, for the padding statistics.
+            train_sampler = BucketBatchSampler(lengths, train_indices, batch_size, bucket_boundaries,
+                                               shuffle=True, seed=self._params['random_state'])
+
+            padding_stats = train_sampler.get_padding_stats()
+            logger.info(f"Padding ratio {padding_stats['bucketed_padding_ratio']:.3f} with length buckets, "
+                        f"{padding_stats['global_padding_ratio']:.3f} with global max length padding; "
+                        f"{padding_stats['padded_positions_avoided']} padded positions per epoch avoided")
+
+            train_batches = self.make_dataset(token_ids, tag_ids, sentence_offsets, train_indices, shuffle=True)
+            val_batches = self.make_dataset(token_ids, tag_ids, sentence_offsets, val_indices, shuffle=False)
+            throughput_logger = ThroughputLogger(n_samples=len(train_indices), n_tokens=int(lengths[train_indices].sum()))
+
+            logger.info('Initializing BiLSTM Model...')
+            model = self.get_bilstm_lstm_model(vocab_size=vocab_size, n_tags=n_tags)
+
+            early_stopping = EarlyStopping(monitor='val_accuracy', patience=self._params['early_stopping_patience'],
+                                           restore_best_weights=True)
+
+            logger.info('Training Neural Network...')
+            history = model.fit(train_batches, validation_data=val_batches, epochs=self._params['epochs'],
+                                callbacks=[throughput_logger, early_stopping]).history
+            logger.info('Network Training Complete')
+
+            trained_model_file_path = self.model_trainer_config.trained_model_file_path
+            trained_model_dir = os.path.dirname(trained_model_file_path)
+            os.makedirs(trained_model_dir, exist_ok=True)
+            model.save(trained_model_file_path)
+            # The model directory is a self-contained bundle for the prediction pipeline.
+            shutil.copyfile(artifact.token_vocab_file_path, os.path.join(trained_model_dir, TOKEN_VOCAB_FILE_NAME))
+            shutil.copyfile(artifact.tag_vocab_file_path, os.path.join(trained_model_dir, TAG_VOCAB_FILE_NAME))
+
+            model_trainer_artifact = ModelTrainerArtifact(
+                trained_model_file_path=trained_model_file_path,
+                train_loss=float(history['loss'][-1]),
+                val_loss=float(history['val_loss'][-1]),
+                val_accuracy=float(history['val_accuracy'][-1]),
+                bucketed_padding_ratio=padding_stats['bucketed_padding_ratio'],
+                global_padding_ratio=padding_stats['global_padding_ratio'],
+                train_samples_per_second=float(np.mean(history['samples_per_second'])))
+
+            logger.info(f'Model Trainer Artifact: {model_trainer_artifact}')
+            return model_trainer_artifact
+        except Exception as e:
+            raise CustomException(e)
@@ -1,10 +1,6 @@
 import os
 import uuid
 
-from azure.identity import ClientSecretCredential 
-from azure.storage.blob import BlobServiceClient
-
-from src.constants import AZURE_CLIENT_ID, AZURE_CLIENT_SECRET, AZURE_STORAGE_ACCOUNT_URL, AZURE_TENANT_ID
 from src.exception import CustomException, handle_exception
 from src.logger import logging
 
@@ -23,6 +19,10 @@ class CreateBlobServiceClient:
             logger.info('Connecting to Azure Storage')
             
             if CreateBlobServiceClient.blob_service_client==None:
+                # The Azure SDK and credentials are only loaded by processes that actually connect.
+                from azure.identity import ClientSecretCredential
+                from azure.storage.blob import BlobServiceClient
+                from src.constants import AZURE_CLIENT_ID, AZURE_CLIENT_SECRET, AZURE_STORAGE_ACCOUNT_URL, AZURE_TENANT_ID
                 
                 __tenant_id = AZURE_TENANT_ID
                 __client_id = AZURE_CLIENT_ID
@@ -1,63 +1,167 @@
-import os
-import sys
+import threading
+import importlib.util
 
-import pymongo
-import certifi
-
-from src.exception import CustomException, handle_exception
+from src.exception import CustomException
 from src.logger import logging
-from src.constants import DATABASE_NAME, MONOGDB_URI
-
-ca = certifi.where()
+from src.entity.config_entity import MongoDBClientConfig
+from src.constants import DATABASE_NAME
 
 logger = logging.getLogger('mongodb_connection')
 
+# Module each wire protocol compressor needs; zlib is part of the standard library.
+COMPRESSOR_MODULES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': 'zlib'}
+
+
+def get_connection_uri(mongodb_connection_uri: str=None) -> str:
+    """Returns the given connection string, or the MONGODB_URI environment variable."""
+    from src.constants import MONGODB_URI
+
+    mongodb_connection_uri = mongodb_connection_uri or MONGODB_URI
+    if mongodb_connection_uri is None:
+        raise Exception('Environment variable MONGODB_URI is not set.')
+    return mongodb_connection_uri
+
+
+def get_client_options(mongo_client_config: MongoDBClientConfig, mongodb_connection_uri: str) -> dict:
+    """Keyword arguments of pymongo.MongoClient and AsyncMongoClient for the given configuration.
+
+    Compressors whose library is not installed are left out; the server picks the first of the
+    remaining ones it supports. The certifi CA bundle is only used for TLS connections (Atlas
+    mongodb+srv:// URIs, or tls=true), so the client also connects to a local mongod.
+    """
+    config = mongo_client_config
+    options = {
+        'maxPoolSize': config.max_pool_size,
+        'minPoolSize': config.min_pool_size,
+        'maxIdleTimeMS': config.max_idle_time_ms,
+        'waitQueueTimeoutMS': config.wait_queue_timeout_ms,
+        'connectTimeoutMS': config.connect_timeout_ms,
+        'serverSelectionTimeoutMS': config.server_selection_timeout_ms,
+        'socketTimeoutMS': config.socket_timeout_ms,
+        'readPreference': config.read_preference,
+        'appname': config.app_name,
+    }
+    compressors = [compressor for compressor in config.compressors
+                   if importlib.util.find_spec(COMPRESSOR_MODULES.get(compressor, compressor)) is not None]
+    if compressors:
+        options['compressors'] = ','.join(compressors)
+
+    uri = mongodb_connection_uri.lower()
+    if uri.startswith('mongodb+srv://') or 'tls=true' in uri or 'ssl=true' in uri:
+        import certifi
+
+        options['tlsCAFile'] = certifi.where()
+    return options
+
+
 class MongoDBClient:
     """
     MongoDBClient is responsible for establishing a connection with MongoDB Database
-    
+
     Attributes:
     ------------
     client : MongoClient
-        A shared MongoClient instance for the class
+        A shared, pooled MongoClient instance for the class
     database : Database
         The specific database instance that MongoDBClient connects to.
-        
+
     Methods:
     ---------
-    __init__ : 
+    __init__ :
         Initializes the MongoDB connection using the given database name.
-        
+
         params:
             database_name : str
         return:
             None
+    close :
+        Closes the shared client and its pooled connections.
     """
-    
+
     client = None
-    
-    @handle_exception
-    def __init__(self, database_name: str = DATABASE_NAME, mongodb_connection_uri: str = MONOGDB_URI) -> None:
+    _lock = threading.Lock()
+
+    def __init__(self, database_name: str = DATABASE_NAME, mongodb_connection_uri: str = None,
+                 mongo_client_config: MongoDBClientConfig = MongoDBClientConfig()) -> None:
         """
         Initializes a connection to MongoDB Database. If no existing connection is found it establishes a new one.
-        
+
         parameters:
         -----------
-        database_name : str, Optional 
+        database_name : str, Optional
             Name of the MongoDB Database to connect to. Default is set to DATABASE_NAME constant
+        mongodb_connection_uri : str, Optional
+            Connection string. Default is the MONGODB_URI environment variable
+        mongo_client_config : MongoDBClientConfig, Optional
+            Pool size, timeouts, read preference and compressors of the shared client
         """
-        
+
         try:
             if MongoDBClient.client is None:
-                if mongodb_connection_uri is None:
-                    raise Exception(f'Environment variable {MONOGDB_URI} is not set.')
-                
-                MongoDBClient.client = pymongo.MongoClient(mongodb_connection_uri, tlsCAFile=ca)
-            
+                with MongoDBClient._lock:
+                    if MongoDBClient.client is None:
+                        # pymongo is only imported by processes that actually connect.
+                        import pymongo
+
+                        mongodb_connection_uri = get_connection_uri(mongodb_connection_uri)
+                        options = get_client_options(mongo_client_config, mongodb_connection_uri)
+                        # One pooled client is shared by every thread, e.g. the parallel export workers of NerData.
+                        MongoDBClient.client = pymongo.MongoClient(mongodb_connection_uri, **options)
+                        logger.info(f"MongoDB client created: pool of {options['maxPoolSize']} connections, "
+                                    f"read preference {options['readPreference']}, "
+                                    f"compressors {options.get('compressors', 'none')}")
+
             self.client = MongoDBClient.client
             self.database = self.client[database_name]
             self.database_name = database_name
-            logger.info('MongoDB connection successful.')
-                
+
+        except Exception as e:
+            raise CustomException(e)
+
+    @classmethod
+    def close(cls) -> None:
+        with cls._lock:
+            if cls.client is not None:
+                cls.client.close()
+                cls.client = None
+
+
+class AsyncMongoDBClient:
+    """
+    Asyncio counterpart of MongoDBClient, over pymongo's AsyncMongoClient.
+
+    Operations are awaited on the event loop instead of blocking it, so the serving app can read
+    and write MongoDB from its request handlers. The shared client belongs to the event loop it is
+    first used on (one per uvicorn worker); close it with `await AsyncMongoDBClient.close()` when
+    the loop shuts down. For tests, assign an InMemoryAsyncMongoClient (tests/in_memory_mongo.py) to
+    `AsyncMongoDBClient.client`.
+    """
+
+    client = None
+    _lock = threading.Lock()
+
+    def __init__(self, database_name: str = DATABASE_NAME, mongodb_connection_uri: str = None,
+                 mongo_client_config: MongoDBClientConfig = MongoDBClientConfig()) -> None:
+        try:
+            if AsyncMongoDBClient.client is None:
+                with AsyncMongoDBClient._lock:
+                    if AsyncMongoDBClient.client is None:
+                        from pymongo import AsyncMongoClient
+
+                        mongodb_connection_uri = get_connection_uri(mongodb_connection_uri)
+                        options = get_client_options(mongo_client_config, mongodb_connection_uri)
+                        AsyncMongoDBClient.client = AsyncMongoClient(mongodb_connection_uri, **options)
+                        logger.info(f"Async MongoDB client created: pool of {options['maxPoolSize']} connections")
+
+            self.client = AsyncMongoDBClient.client
+            self.database = self.client[database_name]
+            self.database_name = database_name
+
         except Exception as e:
-            raise CustomException(e)
\ No newline at end of file
+            raise CustomException(e)
+
+    @classmethod
+    async def close(cls) -> None:
+        client, cls.client = cls.client, None
+        if client is not None:
+            await client.close()
@@ -1,32 +1,55 @@
 import os
-from datetime import datetime
-from dotenv import load_dotenv
-from from_root import from_root
 from pathlib import Path
 
-ROOT_DIR = from_root()
-
-env_file_path = Path(ROOT_DIR, '.env')
-load_dotenv(env_file_path)
+# ROOT_DIR, MODEL_DIR, LOG_FILENAME and the settings read from the environment (.env) are resolved
+# on first access by __getattr__ at the bottom of this module, so importing constants does no I/O.
+ENV_SETTINGS = ('MONGODB_URI', 'BLOB_STORAGE_INSTANCE_NAME', 'AZURE_TENANT_ID', 'AZURE_CLIENT_ID',
+                'AZURE_CLIENT_SECRET', 'AZURE_STORAGE_ACCOUNT_URL')
 
 # MongoDB
 DATABASE_NAME='ner-mlops'
 COLLECTION_NAME='ner-mlops-data'
-MONGODB_URI=os.getenv('MONGODB_URI')
+MONGODB_EXPORT_BATCH_SIZE=10000
+MONGODB_EXPORT_WORKERS=4
+MONGODB_MAX_POOL_SIZE=16
+MONGODB_MIN_POOL_SIZE=0
+# Connections idle for longer are closed, so a quiet worker does not hold sockets to every node.
+MONGODB_MAX_IDLE_TIME_MS=300_000
+# How long an operation waits for a free pooled connection before failing, instead of queueing forever.
+MONGODB_WAIT_QUEUE_TIMEOUT_MS=10_000
+MONGODB_CONNECT_TIMEOUT_MS=10_000
+MONGODB_SERVER_SELECTION_TIMEOUT_MS=10_000
+MONGODB_SOCKET_TIMEOUT_MS=120_000
+# Exports are large reads; serve them from secondaries when the replica set has any.
+MONGODB_READ_PREFERENCE='secondaryPreferred'
+# In order of preference; compressors whose library (zstandard, python-snappy) is not installed are skipped.
+MONGODB_COMPRESSORS=('zstd', 'snappy', 'zlib')
+MONGODB_APP_NAME='ner-mlops'
 
 # Logging
 LOG_DIR='logs'
-LOG_FILENAME = f"{datetime.now().strftime('%Y-%m-%d--%H-%M-%S')}.log"
 MAX_LOG_SIZE=5*1024*1024
 BACKUP_COUNT=3
+# 'text' or 'json'; the LOG_FORMAT environment variable overrides it.
+LOG_FORMAT='text'
+# Level of each logger by name, '' being the root logger. The LOG_LEVELS environment variable adds
+# or overrides entries, e.g. LOG_LEVELS="instrumentation=INFO,Prediction Pipeline=WARNING".
+LOG_LEVELS={'': 'DEBUG', 'azure.core.pipeline.policies.http_logging_policy': 'WARNING'}
+CONSOLE_LOG_LEVEL='INFO'
+# Records waiting for the log writer thread; beyond this, new records are dropped instead of blocking.
+LOG_QUEUE_SIZE=10000
 
 # Azure
 BLOB_STORAGE_REGION='eastasia'
-BLOB_STORAGE_INSTANCE_NAME=os.getenv('BLOB_STORAGE_INSTANCE_NAME')
-AZURE_TENANT_ID=os.getenv('AZURE_TENANT_ID')
-AZURE_CLIENT_ID=os.getenv('AZURE_CLIENT_ID')
-AZURE_CLIENT_SECRET=os.getenv('AZURE_CLIENT_SECRET')
-AZURE_STORAGE_ACCOUNT_URL=os.getenv('AZURE_STORAGE_ACCOUNT_URL')
+AZURE_BLOB_BLOCK_SIZE=4*1024*1024
+AZURE_BLOB_MAX_CONCURRENCY=4
+AZURE_BLOB_MAX_RETRIES=3
+AZURE_BLOB_RETRY_BACKOFF_SECONDS=1.0
+MODEL_CACHE_DIR=os.path.join(os.path.expanduser('~'), '.cache', 'ner-mlops', 'models')
+MODEL_CACHE_INDEX_FILE_NAME='index.json'
+MODEL_CACHE_LOCK_FILE_NAME='.lock'
+MODEL_CACHE_MAX_ENTRIES=5
+MODEL_CACHE_MAX_SIZE_BYTES=5*1024*1024*1024
 
 # print('BLOB_STORAGE_INSTANCE_NAME: ', BLOB_STORAGE_INSTANCE_NAME)
 # print('AZURE_TENANT_ID: ', AZURE_TENANT_ID)
@@ -37,25 +60,151 @@ AZURE_STORAGE_ACCOUNT_URL=os.getenv('AZURE_STORAGE_ACCOUNT_URL')
 # Pipeline
 PIPELINE_NAME: str = ''
 ARTIFACT_DIR: str = 'artifact'
+STAGE_CACHE_FILE_NAME: str = 'stage_cache.json'
+STAGE_CACHE_MAX_RUNS: int = 5
+STAGE_CACHE_MAX_SIZE_BYTES: int = 10*1024*1024*1024
 
 # Files and Model
-MODEL_DIR = os.path.join(ROOT_DIR, 'models')
 MODEL_NAME = 'model.pkl'
 MODEL_BLOB_NAME = 'model.pkl'
 MODEL_BLOB_DIR = 'models'
 MODEL_BLOB_CONTAINER = 'capstonemodel'
 FILE_NAME: str = 'data.csv'
+FEATURE_STORE_FORMAT: str = 'parquet'
 TRAIN_FILE_NAME: str = 'train.csv'
 TEST_FILE_NAME: str = 'test.csv'
 
 SCHEMA_FILE_PATH: str = os.path.join('config', 'schema.yaml')
+PARAMS_FILE_PATH: str = 'params.yaml'
 
 # Data Ingestion
 DATA_INGESTION_COLLECTION_NAME: str = 'Project1-Data'
 DATA_INGESTION_DIR_NAME: str = 'data_ingestion'
 DATA_INGESTION_RAW_DATA_DIR: str = 'raw_data'
+DATA_INGESTION_FEATURE_STORE_DIR_NAME: str = 'feature_store'
+DATA_INGESTION_WATERMARK_FILE_NAME: str = 'watermark.json'
+DATA_INGESTION_MODE: str = 'incremental'
+DATA_INGESTION_WATERMARK_FIELD: str = '_id'
+# Only documents whose watermark field is older than this are ingested. ObjectIds are made by the
+# clients, so a document can be inserted after others with larger ids (slow or retried writes,
+# clock skew between writers); the lag leaves them time to land before the watermark passes them.
+DATA_INGESTION_WATERMARK_LAG_SECONDS: int = 600
 
 # Data Validation
 DATA_VALIDATION_DIR_NAME: str = 'data_validation'
 DATA_VALIDATION_REPORT_FILE_NAME: str = 'report.yaml'
+DATA_VALIDATION_PROFILE_FILE_NAME: str = 'profile.json'
+# Profile of the last data that passed validation, kept outside the run directories to measure drift against.
+DATA_VALIDATION_REFERENCE_PROFILE_FILE_NAME: str = 'data_profile.json'
+DATA_VALIDATION_CHUNK_SIZE: int = 100_000
+
+# Data Transformation
+DATA_TRANSFORMATION_DIR_NAME: str = 'data_transformation'
+DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR: str = 'transformed'
+DATA_TRANSFORMATION_VOCAB_DIR: str = 'vocab'
+TOKEN_IDS_FILE_NAME: str = 'token_ids.npy'
+TAG_IDS_FILE_NAME: str = 'tag_ids.npy'
+SENTENCE_OFFSETS_FILE_NAME: str = 'sentence_offsets.npy'
+SENTENCE_LENGTHS_FILE_NAME: str = 'sentence_lengths.npy'
+TRAIN_INDICES_FILE_NAME: str = 'train_indices.npy'
+VAL_INDICES_FILE_NAME: str = 'val_indices.npy'
+TEST_INDICES_FILE_NAME: str = 'test_indices.npy'
+# Vocabularies are sorted string tables (see save_string_table), not pickles.
+TOKEN_VOCAB_FILE_NAME: str = 'token_vocab.npy'
+TAG_VOCAB_FILE_NAME: str = 'tag_vocab.npy'
+PAD_TOKEN_ID: int = 0
+UNK_TOKEN_ID: int = 1
+# The token table is as wide as its longest token; longer tokens (URLs, markup) are left out and encoded as UNK.
+MAX_TOKEN_BYTES: int = 64
+
+# Model Trainer
+MODEL_TRAINER_DIR_NAME: str = 'model_trainer'
+MODEL_TRAINER_TRAINED_MODEL_DIR: str = 'trained_model'
+MODEL_TRAINER_TRAINED_MODEL_NAME: str = 'model.keras'
+
+# Prediction
+PREDICTION_MAX_BATCH_SIZE: int = 64
+PREDICTION_MAX_WAIT_MS: float = 5.0
+# Most texts one /predict/batch request may send; larger requests are rejected.
+PREDICTION_MAX_REQUEST_TEXTS: int = 256
+PREDICTION_BACKEND: str = 'auto'
+APP_HOST: str = '0.0.0.0'
+APP_PORT: int = 8000
+
+# Prediction Feedback
+# Corrections posted to /feedback are written back to COLLECTION_NAME for retraining; with
+# FEEDBACK_LOG_PREDICTIONS the served predictions are written too.
+FEEDBACK_ENABLED: bool = False
+FEEDBACK_LOG_PREDICTIONS: bool = False
+# Documents (one per token) per unordered insert_many, and the longest a document waits to be written.
+FEEDBACK_MAX_BATCH_SIZE: int = 1000
+FEEDBACK_FLUSH_INTERVAL_SECONDS: float = 1.0
+# Documents buffered in memory; beyond this, adding feedback waits for a flush, then gives up.
+FEEDBACK_MAX_BUFFER_SIZE: int = 50_000
+FEEDBACK_MAX_RETRIES: int = 3
+FEEDBACK_RETRY_BACKOFF_SECONDS: float = 1.0
+# No write of a batch is started once its _ids are older than this. An attempt lasts at most the
+# MongoDB server selection, wait queue and socket timeouts, so every batch is committed (or given
+# up) well before ingestion, which lags DATA_INGESTION_WATERMARK_LAG_SECONDS behind, reaches its ids.
+FEEDBACK_MAX_WRITE_SECONDS: float = DATA_INGESTION_WATERMARK_LAG_SECONDS / 4
+# 'Sentence #' key prefix of feedback sentences; data validation recognises feedback rows by it.
+FEEDBACK_SENTENCE_PREFIX: str = 'Sentence: feedback-'
+
+# Instrumentation
+METRICS_PREFIX: str = 'ner'
+# Serves the stage metrics of a prediction worker in the Prometheus text format at /metrics.
+METRICS_ENDPOINT_ENABLED: bool = True
+RSS_SAMPLE_INTERVAL_SECONDS: float = 0.01
+MLFLOW_EXPERIMENT_NAME: str = 'ner-mlops'
+
+# Model Evaluation
+MODEL_EVALUATION_DIR_NAME: str = 'model_evaluation'
+MODEL_EVALUATION_REPORT_FILE_NAME: str = 'report.json'
+
+# Model Exporter
+MODEL_EXPORTER_DIR_NAME: str = 'model_exporter'
+MODEL_EXPORTER_EXPORTED_MODEL_DIR: str = 'exported_model'
+ONNX_MODEL_FILE_NAME: str = 'model.onnx'
+ONNX_QUANTIZED_MODEL_FILE_NAME: str = 'model.int8.onnx'
+ONNX_INPUT_NAME: str = 'token_ids'
+ONNX_INTRA_OP_NUM_THREADS: int = 0
+ONNX_INTER_OP_NUM_THREADS: int = 1
+
+# Model Watcher
+MODEL_SOURCE: str = 'local'
+MODEL_WATCHER_POLL_INTERVAL_SECONDS: float = 30.0
+# Files of a served model bundle in MODEL_BLOB_DIR, and the manifest of their ETags; it is uploaded last,
+# and its ETag is the version.
+MODEL_BUNDLE_FILE_NAMES: tuple = (TOKEN_VOCAB_FILE_NAME, TAG_VOCAB_FILE_NAME, ONNX_MODEL_FILE_NAME)
+MODEL_MANIFEST_FILE_NAME: str = 'manifest.json'
+
+
+_env_loaded = False
+
+
+def _load_env() -> None:
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv(Path(__getattr__('ROOT_DIR'), '.env'))
+        _env_loaded = True
+
 
+def __getattr__(name: str):
+    """Resolves the lazy constants on first access and caches them as module attributes."""
+    if name == 'ROOT_DIR':
+        from from_root import from_root
+        value = from_root()
+    elif name == 'MODEL_DIR':
+        value = os.path.join(__getattr__('ROOT_DIR'), 'models')
+    elif name == 'LOG_FILENAME':
+        # Timestamped when the first log file is opened, not when constants is imported.
+        from datetime import datetime
+        value = f"{datetime.now().strftime('%Y-%m-%d--%H-%M-%S')}.log"
+    elif name in ENV_SETTINGS:
+        _load_env()
+        value = os.getenv(name)
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    globals()[name] = value
+    return value
@@ -0,0 +1,210 @@
+import time
+import uuid
+import threading
+from collections import deque
+
+from src.exception import CustomException
+from src.logger import logging
+from src.configuration.mongo_db_connection import MongoDBClient
+from src.entity.config_entity import MongoDBClientConfig
+from src.constants import (DATABASE_NAME, COLLECTION_NAME, FEEDBACK_MAX_BATCH_SIZE, FEEDBACK_FLUSH_INTERVAL_SECONDS,
+                           FEEDBACK_MAX_BUFFER_SIZE, FEEDBACK_MAX_RETRIES, FEEDBACK_RETRY_BACKOFF_SECONDS,
+                           FEEDBACK_MAX_WRITE_SECONDS, FEEDBACK_SENTENCE_PREFIX, DATA_INGESTION_WATERMARK_LAG_SECONDS)
+
+logger = logging.getLogger('Feedback Writer')
+
+
+def make_feedback_documents(tokens: list, tags: list, pos: list=None) -> list:
+    """One document per token, in the layout NerData exports: only the first token carries the
+    'Sentence #' key, other missing values are NaN as in the uploaded dataset.
+
+    Feedback has no part of speech unless the client sends it; the transformation does not use POS.
+    """
+    if len(tokens) != len(tags) or (pos is not None and len(pos) != len(tokens)):
+        raise ValueError(f'Got {len(tokens)} tokens but {len(tags)} tags' +
+                         ('' if pos is None else f' and {len(pos)} POS tags'))
+    sentence_key = f'{FEEDBACK_SENTENCE_PREFIX}{uuid.uuid4().hex}'
+    return [{'Sentence #': sentence_key if i == 0 else float('nan'),
+             'Word': token,
+             'POS': float('nan') if pos is None else pos[i],
+             'Tag': tag} for i, (token, tag) in enumerate(zip(tokens, tags))]
+
+
+def make_object_ids(n: int) -> list:
+    """n ObjectIds that sort in the order they were made and share one timestamp.
+
+    Ingestion reads the collection in `_id` order. Other processes' ids share the 4 timestamp bytes
+    but differ in their random bytes, so they cannot sort between these: the sentences of a flush
+    stay contiguous even if the clock ticks while it is written.
+
+    Ids made by the writers of several workers, and retried writes, can still be committed out of
+    `_id` order; ingestion only reads ids older than its watermark lag, which FeedbackWriter stays under.
+    """
+    from bson import ObjectId
+
+    first = ObjectId()
+    timestamp = first.binary[:4]
+    return [first] + [ObjectId(timestamp + ObjectId().binary[4:]) for _ in range(n - 1)]
+
+
+class FeedbackWriter:
+    """Buffers prediction feedback in memory and writes it to MongoDB in bulk from a background thread.
+
+    Sentences are added as whole records and flushed with one unordered insert_many per batch of up
+    to `max_batch_size` documents, whenever a batch is full or `flush_interval_seconds` have passed.
+    When `max_buffer_size` documents are waiting, `add` blocks up to its timeout for a flush to make
+    room, then drops the sentence and returns False. Failed batches are retried with backoff.
+    `stop` writes everything still buffered.
+
+    The `_id`s are assigned when a batch is first written, and no attempt is started once they are
+    older than `max_write_seconds`; the batch is counted as failed instead. Ingestion only reads ids
+    older than DATA_INGESTION_WATERMARK_LAG_SECONDS, so a batch is committed before the watermark
+    can pass its ids, including the ids of other workers' writers committed out of order.
+    """
+
+    def __init__(self, collection_name: str=COLLECTION_NAME, database_name: str=DATABASE_NAME,
+                 max_batch_size: int=FEEDBACK_MAX_BATCH_SIZE,
+                 flush_interval_seconds: float=FEEDBACK_FLUSH_INTERVAL_SECONDS,
+                 max_buffer_size: int=FEEDBACK_MAX_BUFFER_SIZE, max_retries: int=FEEDBACK_MAX_RETRIES,
+                 retry_backoff_seconds: float=FEEDBACK_RETRY_BACKOFF_SECONDS,
+                 max_write_seconds: float=FEEDBACK_MAX_WRITE_SECONDS):
+        self.collection_name = collection_name
+        self.database_name = database_name
+        self.max_batch_size = max_batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_buffer_size = max_buffer_size
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_write_seconds = max_write_seconds
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._records = deque()
+        self._buffered = 0
+        self._in_flight = 0
+        self._stopping = False
+        self._flush_requested = False
+        self._condition = threading.Condition()
+        self._collection = None
+        self._thread = None
+
+    def start(self) -> None:
+        try:
+            config = MongoDBClientConfig()
+            attempt_seconds = (config.server_selection_timeout_ms + config.wait_queue_timeout_ms +
+                               config.socket_timeout_ms) / 1000
+            if self.max_write_seconds + attempt_seconds >= DATA_INGESTION_WATERMARK_LAG_SECONDS:
+                logger.warning(f'Feedback writes can take up to {self.max_write_seconds + attempt_seconds:.0f}s, '
+                               f'not less than the {DATA_INGESTION_WATERMARK_LAG_SECONDS}s ingestion watermark lag: '
+                               f'late batches may be skipped by incremental ingestion')
+            mongo_client = MongoDBClient(database_name=self.database_name)
+            self._collection = mongo_client.database[self.collection_name]
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='feedback-writer', daemon=True)
+            self._thread.start()
+        except Exception as e:
+            raise CustomException(e)
+
+    def stop(self, timeout: float=None) -> None:
+        """Writes the buffered feedback and stops the writer thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        logger.info(f'Feedback writer stopped: {self.written} documents written, {self.dropped} dropped, '
+                    f'{self.failed} failed')
+
+    def add(self, tokens: list, tags: list, pos: list=None, timeout: float=0.0) -> bool:
+        """Buffers one tagged sentence.
+
+        Arguments:
+            timeout(float): Seconds to wait for room when the buffer is full; 0 never blocks,
+                which is what code running on an event loop should use.
+
+        Returns: False if the sentence was dropped because the buffer stayed full.
+        """
+        documents = make_feedback_documents(tokens, tags, pos)
+        if len(documents) == 0:
+            return True
+        with self._condition:
+            if self._stopping:
+                raise CustomException('FeedbackWriter is stopped')
+            has_room = lambda: self._buffered + len(documents) <= self.max_buffer_size or self._buffered == 0
+            if not self._condition.wait_for(has_room, timeout):
+                self.dropped += len(documents)
+                return False
+            self._records.append(documents)
+            self._buffered += len(documents)
+            if self._buffered >= self.max_batch_size:
+                self._condition.notify_all()
+            return True
+
+    def flush(self, timeout: float=None) -> bool:
+        """Waits until everything added so far has been written (or given up on).
+
+        Returns: False on timeout.
+        """
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: self._buffered == 0 and self._in_flight == 0, timeout)
+
+    def _take_batch(self) -> list:
+        # Whole sentences only, so a sentence is never split between two batches.
+        batch = []
+        while self._records and (not batch or len(batch) + len(self._records[0]) <= self.max_batch_size):
+            batch.extend(self._records.popleft())
+        self._buffered -= len(batch)
+        self._in_flight = len(batch)
+        if not self._records:
+            self._flush_requested = False
+        self._condition.notify_all()
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._stopping or self._flush_requested or
+                                         self._buffered >= self.max_batch_size, self.flush_interval_seconds)
+                if self._buffered == 0:
+                    if self._stopping:
+                        return
+                    self._flush_requested = False
+                    continue
+                batch = self._take_batch()
+            self._write(batch)
+            with self._condition:
+                self._in_flight = 0
+                self._condition.notify_all()
+
+    def _write(self, batch: list) -> None:
+        from pymongo.errors import BulkWriteError
+
+        # Assigned once: a retry after a partly applied insert_many hits duplicate keys instead of writing twice.
+        for document, object_id in zip(batch, make_object_ids(len(batch))):
+            document['_id'] = object_id
+        assigned_at = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._collection.insert_many(batch, ordered=False)
+                self.written += len(batch)
+                return
+            except BulkWriteError as e:
+                # Unordered: every other document was written. Duplicate keys are documents an
+                # earlier attempt already wrote.
+                errors = [error for error in e.details.get('writeErrors', []) if error.get('code') != 11000]
+                self.written += len(batch) - len(errors)
+                self.failed += len(errors)
+                if errors:
+                    logger.error(f'{len(errors)} of {len(batch)} feedback documents were not written: {errors[0]}')
+                return
+            except Exception as e:
+                delay = self.retry_backoff_seconds * 2 ** attempt
+                # A retry that starts too late could commit ids the ingestion watermark has already passed.
+                if attempt == self.max_retries or time.monotonic() - assigned_at + delay > self.max_write_seconds:
+                    self.failed += len(batch)
+                    logger.error(f'Dropping {len(batch)} feedback documents after {attempt + 1} attempts: {e}')
+                    return
+                logger.warning(f'Writing {len(batch)} feedback documents failed, retrying: {e}')
+                time.sleep(delay)
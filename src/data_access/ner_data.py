@@ -1,45 +1,216 @@
 import sys
 import pandas as pd
 import numpy as np
-from typing import Optional
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+from pandas.api.types import union_categoricals
 
 from src.configuration.mongo_db_connection import MongoDBClient
-from src.constants import DATABASE_NAME
+from src.constants import DATABASE_NAME, MONGODB_EXPORT_BATCH_SIZE, MONGODB_EXPORT_WORKERS
 from src.exception import CustomException
 
 class NerData:
     """A Class to import MongoDB Records as pandas DataFrame."""
-    
+
     def __init__(self):
         try:
             self.mongo_client = MongoDBClient(database_name=DATABASE_NAME)
         except Exception as e:
             raise CustomException(e)
-        
-    def export_collection_as_DataFrame(self, collection_name: str, database_name: Optional[str]=None) -> pd.DataFrame:
+
+    def _get_collection(self, collection_name: str, database_name: Optional[str]=None):
+        """Returns the pymongo collection handle from the shared MongoDB client."""
+        if database_name is None:
+            return self.mongo_client.database[collection_name]
+        return self.mongo_client.client[database_name][collection_name]
+
+    @staticmethod
+    def _records_to_chunk(records: list) -> pd.DataFrame:
+        """Converts one cursor batch into a typed DataFrame chunk.
+
+        String columns are stored as pandas categoricals, so a chunk holds one copy
+        of every distinct value plus compact integer codes.
+        """
+        chunk = pd.DataFrame.from_records(records)
+        # Changing the name of Column 'Sentence #' to 'Sentence'
+        chunk.rename(columns={'Sentence #': 'Sentence'}, inplace=True)
+        for column in chunk.columns:
+            if pd.api.types.is_object_dtype(chunk[column]) or pd.api.types.is_string_dtype(chunk[column]):
+                chunk[column] = chunk[column].replace('na', np.nan).astype('category')
+        return chunk
+
+    @staticmethod
+    def concat_chunks(chunks: list) -> pd.DataFrame:
+        """Concatenates typed chunks, merging categorical columns without decoding them to strings."""
+        chunks = [chunk for chunk in chunks if len(chunk) > 0]
+        if len(chunks) == 0:
+            return pd.DataFrame()
+        if len(chunks) == 1:
+            return chunks[0].reset_index(drop=True)
+
+        columns = {}
+        for column in chunks[0].columns:
+            parts = [chunk[column] for chunk in chunks]
+            if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+                columns[column] = pd.Series(union_categoricals(parts, ignore_order=True), name=column)
+            else:
+                columns[column] = pd.concat(parts, ignore_index=True)
+        return pd.DataFrame(columns)
+
+    def export_collection_in_batches(self, collection_name: str, database_name: Optional[str]=None,
+                                     batch_size: int=MONGODB_EXPORT_BATCH_SIZE, projection: Optional[dict]=None,
+                                     query: Optional[dict]=None) -> Iterator[pd.DataFrame]:
+        """Streams a MongoDB Collection as typed DataFrame chunks of at most `batch_size` rows.
+
+        Parameters
+        ----------
+        collection_name: str
+            The name of the MongoDB collection to export.
+        database_name: Optional[str]
+            Name of the Database (Optional). Defaults to DATABASE_NAME.
+        batch_size: int
+            Number of documents fetched per cursor round trip and per yielded chunk.
+        projection: Optional[dict]
+            Fields to fetch. Defaults to every field except `_id`.
+        query: Optional[dict]
+            Filter applied to the collection. Defaults to the whole collection.
+
+        Yields
+        ------
+        pd.DataFrame
+            Chunks in `_id` order, so rows of one sentence stay contiguous.
+        """
+        try:
+            collection = self._get_collection(collection_name, database_name)
+            if projection is None:
+                projection = {'_id': 0}
+
+            cursor = collection.find(query or {}, projection=projection, batch_size=batch_size).sort('_id', 1)
+            while True:
+                records = list(islice(cursor, batch_size))
+                if len(records) == 0:
+                    break
+                yield self._records_to_chunk(records)
+        except Exception as e:
+            raise CustomException(e)
+
+    def get_range_boundaries(self, collection_name: str, num_partitions: int, database_name: Optional[str]=None,
+                             query: Optional[dict]=None) -> list:
+        """Splits the matching documents into `num_partitions` contiguous `_id` ranges of similar size.
+
+        Returns
+        -------
+        list
+            The sorted `_id` values where each range after the first begins.
+        """
+        try:
+            collection = self._get_collection(collection_name, database_name)
+            count = collection.count_documents(query or {})
+            if count == 0 or num_partitions < 2:
+                return []
+            step = -(-count // num_partitions)
+            # One pass over the sorted `_id` index, keeping every step-th `_id`; it stops at the last boundary.
+            cursor = collection.find(query or {}, projection={'_id': 1}).sort('_id', 1)
+            return [document['_id'] for document in islice(cursor, step, (num_partitions - 1) * step + 1, step)]
+        except Exception as e:
+            raise CustomException(e)
+
+    def export_collection_in_parallel(self, collection_name: str, database_name: Optional[str]=None,
+                                      num_workers: int=MONGODB_EXPORT_WORKERS,
+                                      batch_size: int=MONGODB_EXPORT_BATCH_SIZE,
+                                      query: Optional[dict]=None) -> pd.DataFrame:
+        """Exports a MongoDB Collection by reading `_id` ranges concurrently.
+
+        Every range is streamed with `export_collection_in_batches` on a thread pool that shares
+        the pooled `MongoDBClient.client`. The partitions are reassembled in `_id` order, so the
+        result is identical to a single sequential export and sentence rows stay contiguous.
+        """
+        try:
+            boundaries = self.get_range_boundaries(collection_name, num_workers, database_name=database_name, query=query)
+            lower_bounds = [None] + boundaries
+            upper_bounds = boundaries + [None]
+
+            range_queries = []
+            for lower_bound, upper_bound in zip(lower_bounds, upper_bounds):
+                id_range = {}
+                if lower_bound is not None:
+                    id_range['$gte'] = lower_bound
+                if upper_bound is not None:
+                    id_range['$lt'] = upper_bound
+                range_query = {'_id': id_range} if id_range else {}
+                range_queries.append({'$and': [query, range_query]} if query else range_query)
+
+            def export_range(range_query: dict) -> pd.DataFrame:
+                chunks = self.export_collection_in_batches(collection_name=collection_name, database_name=database_name,
+                                                           batch_size=batch_size, query=range_query)
+                return self.concat_chunks(list(chunks))
+
+            with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix='ner-export') as executor:
+                # map() yields results in submission order, i.e. in `_id` order.
+                partitions = list(executor.map(export_range, range_queries))
+            return self.concat_chunks(partitions)
+        except Exception as e:
+            raise CustomException(e)
+
+    def get_max_value(self, collection_name: str, field: str='_id', database_name: Optional[str]=None,
+                      query: Optional[dict]=None):
+        """Returns the largest value of `field` in the collection, or None if no document matches.
+
+        Used as the high-water mark of incremental ingestion; an index on `field` keeps this a single lookup.
+        """
+        try:
+            collection = self._get_collection(collection_name, database_name)
+            document = collection.find_one(query or {}, projection={field: 1}, sort=[(field, -1)])
+            return None if document is None else document.get(field)
+        except Exception as e:
+            raise CustomException(e)
+
+    def export_collection_as_DataFrame(self, collection_name: str, database_name: Optional[str]=None,
+                                       batch_size: Optional[int]=None, query: Optional[dict]=None,
+                                       num_workers: int=1) -> pd.DataFrame:
         """Exports an Entire MongoDB Collection as Pandas DataFrame.
-        
+
         Parameters
         ----------
         collection_name: str
             The name of the MongoDB collection to export.
         database_name: Optional[str]
             Name of the Database (Optional). Defaults to DATABASE_NAME.
-            
+        batch_size: Optional[int]
+            If given, the collection is streamed in batches of this size (see
+            `export_collection_in_batches`) and the chunks are concatenated, so peak
+            memory is bounded by one batch of raw documents.
+        query: Optional[dict]
+            Filter applied to the collection. Defaults to the whole collection.
+        num_workers: int
+            With more than one worker and a `batch_size`, `_id` ranges are read concurrently
+            (see `export_collection_in_parallel`).
+
         Returns
         -------
         pd.DataFrame
         """
         try:
-            if database_name is None:
-                collection = self.mongo_client.database[collection_name]
-            else:
-                collection = self.mongo_client[database_name][collection_name]
-            
-            df = pd.DataFrame(list(collection.find()))
+            if batch_size is not None and num_workers > 1:
+                return self.export_collection_in_parallel(collection_name=collection_name,
+                                                          database_name=database_name,
+                                                          num_workers=num_workers,
+                                                          batch_size=batch_size,
+                                                          query=query)
+            if batch_size is not None:
+                chunks = self.export_collection_in_batches(collection_name=collection_name,
+                                                           database_name=database_name,
+                                                           batch_size=batch_size,
+                                                           query=query)
+                return self.concat_chunks(list(chunks))
+
+            collection = self._get_collection(collection_name, database_name)
+
+            df = pd.DataFrame(list(collection.find(query or {})))
             # Changing the name of Column 'Sentence #' to 'Sentence'
             df.rename(columns={'Sentence #': 'Sentence'}, inplace=True)
             df.replace({'na': np.nan}, inplace=True)
             return df
         except Exception as e:
-            raise CustomException(e)
\ No newline at end of file
+            raise CustomException(e)
@@ -1,11 +1,60 @@
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class DataIngestionArtifact:
     raw_data_file_path: str
+    feature_store_format: str = 'csv'
+    ingestion_mode: str = 'full'
+    watermark: Optional[str] = None
+    new_rows: int = 0
+    # False when the feature store has no partitions yet, e.g. the collection is still empty.
+    has_data: bool = True
     
 @dataclass
 class DataValidationArtifact:
     validation_status: bool
     message: str
-    validation_report_file_path: str
\ No newline at end of file
+    validation_report_file_path: str
+    profile_file_path: str
+    drift_detected: bool
+    
+@dataclass
+class DataTransformationArtifact:
+    token_ids_file_path: str
+    tag_ids_file_path: str
+    sentence_offsets_file_path: str
+    sentence_lengths_file_path: str
+    train_indices_file_path: str
+    val_indices_file_path: str
+    test_indices_file_path: str
+    token_vocab_file_path: str
+    tag_vocab_file_path: str
+    vocab_version: str
+    
+@dataclass
+class ModelTrainerArtifact:
+    trained_model_file_path: str
+    train_loss: float
+    val_loss: float
+    val_accuracy: float
+    bucketed_padding_ratio: float
+    global_padding_ratio: float
+    train_samples_per_second: float
+    
+@dataclass
+class ModelExporterArtifact:
+    onnx_model_file_path: str
+    quantized_model_file_path: Optional[str]
+    max_abs_diff: float
+    tag_agreement: float
+    quantized_tag_agreement: Optional[float] = None
+    
+@dataclass
+class ModelEvaluationArtifact:
+    report_file_path: str
+    token_accuracy: float
+    token_macro_f1: float
+    entity_precision: float
+    entity_recall: float
+    entity_f1: float
@@ -1,27 +1,110 @@
 import os
 from src.constants import *
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
 
-TIMESTAMP: str = datetime.now().strftime('%Y-%m-%d--%H-%M-%S')
+
+@lru_cache(maxsize=None)
+def get_timestamp() -> str:
+    """Timestamp of this run, fixed the first time a config needs it rather than at import."""
+    return datetime.now().strftime('%Y-%m-%d--%H-%M-%S')
+
+
+def run_path(*parts: str):
+    """Default for a path inside the run's artifact directory, resolved when the config is created."""
+    return field(default_factory=lambda: os.path.join(ARTIFACT_DIR, get_timestamp(), *parts))
 
 
 @dataclass
 class TrainingPipelineConfig:
     training_pipeline_name: str = PIPELINE_NAME
-    artifact_dir: str = os.path.join(ARTIFACT_DIR, TIMESTAMP)
-    timestamp: str = TIMESTAMP
-    
-training_pipeline_config: TrainingPipelineConfig = TrainingPipelineConfig()
+    artifact_dir: str = run_path()
+    timestamp: str = field(default_factory=get_timestamp)
+    stage_cache_file_path: str = os.path.join(ARTIFACT_DIR, STAGE_CACHE_FILE_NAME)
+    max_cached_runs: int = STAGE_CACHE_MAX_RUNS
+    max_cache_size_bytes: int = STAGE_CACHE_MAX_SIZE_BYTES
+
+
+@lru_cache(maxsize=None)
+def get_training_pipeline_config() -> TrainingPipelineConfig:
+    return TrainingPipelineConfig()
+
+
+def __getattr__(name: str):
+    # TIMESTAMP and training_pipeline_config used to be computed at import time.
+    if name == 'TIMESTAMP':
+        return get_timestamp()
+    if name == 'training_pipeline_config':
+        return get_training_pipeline_config()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 @dataclass
 class DataIngestionConfig:
-    data_ingestion_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_INGESTION_DIR_NAME)
-    raw_data_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_RAW_DATA_DIR, FILE_NAME)
+    data_ingestion_dir: str = run_path(DATA_INGESTION_DIR_NAME)
+    # The feature store lives outside the timestamped run directory, so incremental runs can append to it.
+    feature_store_dir: str = os.path.join(ARTIFACT_DIR, DATA_INGESTION_FEATURE_STORE_DIR_NAME)
+    watermark_file_path: str = os.path.join(feature_store_dir, DATA_INGESTION_WATERMARK_FILE_NAME)
+    feature_store_format: str = FEATURE_STORE_FORMAT
+    ingestion_mode: str = DATA_INGESTION_MODE
+    watermark_field: str = DATA_INGESTION_WATERMARK_FIELD
+    watermark_lag_seconds: int = DATA_INGESTION_WATERMARK_LAG_SECONDS
     collection_name: str = COLLECTION_NAME
-    
+    export_batch_size: int = MONGODB_EXPORT_BATCH_SIZE
+    export_workers: int = MONGODB_EXPORT_WORKERS
+
 @dataclass
 class DataValidationConfig:
-    data_validation_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_VALIDATION_DIR_NAME)
-    validation_report_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_REPORT_FILE_NAME)
-    
\ No newline at end of file
+    data_validation_dir: str = run_path(DATA_VALIDATION_DIR_NAME)
+    validation_report_file_path: str = run_path(DATA_VALIDATION_DIR_NAME, DATA_VALIDATION_REPORT_FILE_NAME)
+    profile_file_path: str = run_path(DATA_VALIDATION_DIR_NAME, DATA_VALIDATION_PROFILE_FILE_NAME)
+    reference_profile_file_path: str = os.path.join(ARTIFACT_DIR, DATA_VALIDATION_REFERENCE_PROFILE_FILE_NAME)
+    chunk_size: int = DATA_VALIDATION_CHUNK_SIZE
+    params_file_path: str = PARAMS_FILE_PATH
+
+@dataclass
+class DataTransformationConfig:
+    data_transformation_dir: str = run_path(DATA_TRANSFORMATION_DIR_NAME)
+    transformed_data_dir: str = run_path(DATA_TRANSFORMATION_DIR_NAME, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR)
+    token_ids_file_path: str = run_path(DATA_TRANSFORMATION_DIR_NAME, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, TOKEN_IDS_FILE_NAME)
+    tag_ids_file_path: str = run_path(DATA_TRANSFORMATION_DIR_NAME, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, TAG_IDS_FILE_NAME)
+    sentence_offsets_file_path: str = run_path(DATA_TRANSFORMATION_DIR_NAME, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, SENTENCE_OFFSETS_FILE_NAME)
+    sentence_lengths_file_path: str = run_path(DATA_TRANSFORMATION_DIR_NAME, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, SENTENCE_LENGTHS_FILE_NAME)
+    train_indices_file_path: str = run_path(DATA_TRANSFORMATION_DIR_NAME, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, TRAIN_INDICES_FILE_NAME)
+    val_indices_file_path: str = run_path(DATA_TRANSFORMATION_DIR_NAME, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, VAL_INDICES_FILE_NAME)
+    test_indices_file_path: str = run_path(DATA_TRANSFORMATION_DIR_NAME, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, TEST_INDICES_FILE_NAME)
+    vocab_dir: str = run_path(DATA_TRANSFORMATION_DIR_NAME, DATA_TRANSFORMATION_VOCAB_DIR)
+    params_file_path: str = PARAMS_FILE_PATH
+
+@dataclass
+class ModelTrainerConfig:
+    model_trainer_dir: str = run_path(MODEL_TRAINER_DIR_NAME)
+    trained_model_file_path: str = run_path(MODEL_TRAINER_DIR_NAME, MODEL_TRAINER_TRAINED_MODEL_DIR, MODEL_TRAINER_TRAINED_MODEL_NAME)
+    params_file_path: str = PARAMS_FILE_PATH
+
+@dataclass
+class ModelExporterConfig:
+    model_exporter_dir: str = run_path(MODEL_EXPORTER_DIR_NAME)
+    exported_model_dir: str = run_path(MODEL_EXPORTER_DIR_NAME, MODEL_EXPORTER_EXPORTED_MODEL_DIR)
+    onnx_model_file_path: str = run_path(MODEL_EXPORTER_DIR_NAME, MODEL_EXPORTER_EXPORTED_MODEL_DIR, ONNX_MODEL_FILE_NAME)
+    quantized_model_file_path: str = run_path(MODEL_EXPORTER_DIR_NAME, MODEL_EXPORTER_EXPORTED_MODEL_DIR, ONNX_QUANTIZED_MODEL_FILE_NAME)
+    params_file_path: str = PARAMS_FILE_PATH
+
+@dataclass
+class ModelEvaluationConfig:
+    model_evaluation_dir: str = run_path(MODEL_EVALUATION_DIR_NAME)
+    report_file_path: str = run_path(MODEL_EVALUATION_DIR_NAME, MODEL_EVALUATION_REPORT_FILE_NAME)
+    params_file_path: str = PARAMS_FILE_PATH
+
+@dataclass
+class MongoDBClientConfig:
+    max_pool_size: int = MONGODB_MAX_POOL_SIZE
+    min_pool_size: int = MONGODB_MIN_POOL_SIZE
+    max_idle_time_ms: int = MONGODB_MAX_IDLE_TIME_MS
+    wait_queue_timeout_ms: int = MONGODB_WAIT_QUEUE_TIMEOUT_MS
+    connect_timeout_ms: int = MONGODB_CONNECT_TIMEOUT_MS
+    server_selection_timeout_ms: int = MONGODB_SERVER_SELECTION_TIMEOUT_MS
+    socket_timeout_ms: int = MONGODB_SOCKET_TIMEOUT_MS
+    read_preference: str = MONGODB_READ_PREFERENCE
+    compressors: tuple = MONGODB_COMPRESSORS
+    app_name: str = MONGODB_APP_NAME
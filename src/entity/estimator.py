@@ -0,0 +1,133 @@
+import os
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+from src.utils.main_utils import load_string_table
+from src.entity.vocabulary import Vocabulary
+from src.constants import (MODEL_TRAINER_TRAINED_MODEL_NAME, TOKEN_VOCAB_FILE_NAME, TAG_VOCAB_FILE_NAME,
+                           PAD_TOKEN_ID, UNK_TOKEN_ID, ONNX_MODEL_FILE_NAME, ONNX_QUANTIZED_MODEL_FILE_NAME,
+                           ONNX_INTRA_OP_NUM_THREADS, ONNX_INTER_OP_NUM_THREADS)
+
+logger = logging.getLogger('Estimator')
+
+
+class NERModel:
+    """Trained tagger plus its vocabularies, predicting tags for already tokenized sentences."""
+
+    def __init__(self, model, token_vocab: np.ndarray, tag_vocab: np.ndarray):
+        """The vocabularies are the string tables written by DataTransformation (see load_string_table)."""
+        self.model = model
+        self.tag_vocab = np.char.decode(tag_vocab, 'utf-8')
+        self.token_vocab = Vocabulary(token_vocab, offset=UNK_TOKEN_ID + 1, unknown_id=UNK_TOKEN_ID)
+
+    @classmethod
+    def from_model_dir(cls, model_dir: str) -> 'NERModel':
+        """Loads the model bundle written by ModelTrainer (model.keras and the vocabularies)."""
+        try:
+            from tensorflow.keras.models import load_model #type: ignore
+
+            logger.info(f'Loading model from {model_dir}')
+            model = load_model(os.path.join(model_dir, MODEL_TRAINER_TRAINED_MODEL_NAME))
+            token_vocab = load_string_table(os.path.join(model_dir, TOKEN_VOCAB_FILE_NAME))
+            tag_vocab = load_string_table(os.path.join(model_dir, TAG_VOCAB_FILE_NAME))
+            return cls(model, token_vocab, tag_vocab)
+        except Exception as e:
+            raise CustomException(e)
+
+    def encode(self, sentences: list) -> tuple:
+        """Maps token lists to one id matrix padded to the longest sentence of the batch.
+
+        Returns: (token_ids, lengths)
+        """
+        lengths = np.array([len(sentence) for sentence in sentences], dtype=np.int32)
+        token_ids = np.full((len(sentences), max(int(lengths.max(initial=0)), 1)), PAD_TOKEN_ID, dtype=np.int32)
+        # One vocabulary lookup for the whole batch, scattered into the rows in order.
+        ids = self.token_vocab.lookup([token for sentence in sentences for token in sentence])
+        token_ids[np.arange(token_ids.shape[1]) < lengths[:, None]] = ids
+        return token_ids, lengths
+
+    def predict_proba(self, token_ids: np.ndarray) -> np.ndarray:
+        """Runs one forward pass and returns the tag probabilities of every position."""
+        return np.asarray(self.model.predict_on_batch(token_ids))
+
+    def predict_ids(self, token_ids: np.ndarray) -> np.ndarray:
+        """Returns the most likely tag id of every position."""
+        return np.argmax(self.predict_proba(token_ids), axis=-1)
+
+    def predict(self, sentences: list) -> list:
+        """Predicts tags for a batch of tokenized sentences in a single forward pass.
+
+        Arguments:
+            sentences(list): List of token lists.
+
+        Returns:
+            List of tag lists, one tag per token.
+        """
+        try:
+            if len(sentences) == 0:
+                return []
+            token_ids, lengths = self.encode(sentences)
+            tag_ids = self.predict_ids(token_ids)
+            return [self.tag_vocab[row[:length]].tolist() for row, length in zip(tag_ids, lengths)]
+        except Exception as e:
+            raise CustomException(e)
+
+
+def create_onnx_session(model_file_path: str, intra_op_num_threads: int=ONNX_INTRA_OP_NUM_THREADS,
+                        inter_op_num_threads: int=ONNX_INTER_OP_NUM_THREADS):
+    """Opens an onnxruntime CPU session with all graph optimisations enabled.
+
+    Arguments:
+        intra_op_num_threads(int): Threads used inside one operator, 0 lets onnxruntime use every core.
+        inter_op_num_threads(int): Threads running independent operators in parallel.
+    """
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = intra_op_num_threads
+    options.inter_op_num_threads = inter_op_num_threads
+    return ort.InferenceSession(model_file_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+
+class OnnxNERModel(NERModel):
+    """NERModel running the exported ONNX graph through onnxruntime, without importing TensorFlow."""
+
+    def __init__(self, session, token_vocab: np.ndarray, tag_vocab: np.ndarray):
+        super().__init__(session, token_vocab, tag_vocab)
+        self.input_name = session.get_inputs()[0].name
+
+    @classmethod
+    def from_model_dir(cls, model_dir: str, quantized: bool=False, intra_op_num_threads: int=ONNX_INTRA_OP_NUM_THREADS,
+                       inter_op_num_threads: int=ONNX_INTER_OP_NUM_THREADS) -> 'OnnxNERModel':
+        """Loads the bundle written by ModelExporter (model.onnx or model.int8.onnx and the vocabularies)."""
+        try:
+            model_file_name = ONNX_QUANTIZED_MODEL_FILE_NAME if quantized else ONNX_MODEL_FILE_NAME
+            logger.info(f'Loading {model_file_name} from {model_dir}')
+            session = create_onnx_session(os.path.join(model_dir, model_file_name), intra_op_num_threads,
+                                          inter_op_num_threads)
+            token_vocab = load_string_table(os.path.join(model_dir, TOKEN_VOCAB_FILE_NAME))
+            tag_vocab = load_string_table(os.path.join(model_dir, TAG_VOCAB_FILE_NAME))
+            return cls(session, token_vocab, tag_vocab)
+        except Exception as e:
+            raise CustomException(e)
+
+    def predict_proba(self, token_ids: np.ndarray) -> np.ndarray:
+        return self.model.run(None, {self.input_name: token_ids.astype(np.int32, copy=False)})[0]
+
+
+def load_estimator(model_dir: str, backend: str='auto') -> NERModel:
+    """Loads the model bundle in `model_dir` with the requested backend.
+
+    Arguments:
+        backend(str): 'keras', 'onnx', 'onnx-int8', or 'auto' to prefer ONNX whenever the bundle has it.
+    """
+    if backend == 'auto':
+        backend = 'onnx' if os.path.exists(os.path.join(model_dir, ONNX_MODEL_FILE_NAME)) else 'keras'
+    if backend == 'keras':
+        return NERModel.from_model_dir(model_dir)
+    if backend in ('onnx', 'onnx-int8'):
+        return OnnxNERModel.from_model_dir(model_dir, quantized=backend == 'onnx-int8')
+    raise CustomException(f'Unknown prediction backend: {backend}')
@@ -0,0 +1,52 @@
+import numpy as np
+
+from src.exception import CustomException
+from src.utils.main_utils import save_string_table, load_string_table
+
+
+class Vocabulary:
+    """Maps tokens to ids through a sorted string table, a whole batch at a time.
+
+    Token i of the table has id i + offset; the ids below `offset` are reserved (PAD, UNK), and
+    tokens that are not in the table get `unknown_id`. Lookups binary search the table with
+    np.searchsorted, so no per-token dict is built: a vocabulary loaded with load() stays
+    memory mapped, loads in constant time and shares its pages between workers.
+    """
+
+    def __init__(self, table: np.ndarray, offset: int=0, unknown_id: int=-1):
+        self.table = table
+        self.offset = offset
+        self.unknown_id = unknown_id
+
+    @classmethod
+    def from_values(cls, values, offset: int=0, unknown_id: int=-1) -> 'Vocabulary':
+        """Builds a vocabulary of the distinct values, in sorted order."""
+        table = np.array([value.encode('utf-8') for value in sorted(set(values))], dtype=np.bytes_)
+        return cls(table, offset=offset, unknown_id=unknown_id)
+
+    @classmethod
+    def load(cls, file_path: str, offset: int=0, unknown_id: int=-1) -> 'Vocabulary':
+        """Memory maps a vocabulary written by save() or save_string_table."""
+        return cls(load_string_table(file_path), offset=offset, unknown_id=unknown_id)
+
+    def save(self, file_path: str) -> None:
+        save_string_table(file_path, self.to_list())
+
+    def __len__(self) -> int:
+        """Size of the id space, reserved ids included."""
+        return len(self.table) + self.offset
+
+    def to_list(self) -> list:
+        return np.char.decode(self.table, 'utf-8').tolist()
+
+    def lookup(self, tokens: list) -> np.ndarray:
+        """Returns the int32 id of every token, `unknown_id` for the tokens missing from the vocabulary."""
+        try:
+            if len(tokens) == 0 or len(self.table) == 0:
+                return np.full(len(tokens), self.unknown_id, dtype=np.int32)
+            encoded = np.array([token.encode('utf-8') for token in tokens], dtype=np.bytes_)
+            positions = np.searchsorted(self.table, encoded)
+            found = self.table[np.minimum(positions, len(self.table) - 1)] == encoded
+            return np.where(found, positions + self.offset, self.unknown_id).astype(np.int32)
+        except Exception as e:
+            raise CustomException(e)
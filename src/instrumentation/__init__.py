@@ -0,0 +1,230 @@
+import os
+import sys
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+from src.logger import logging
+from src.constants import METRICS_PREFIX, RSS_SAMPLE_INTERVAL_SECONDS, MLFLOW_EXPERIMENT_NAME
+
+logger = logging.getLogger('instrumentation')
+
+# Upper bounds of the wall time histogram buckets, in seconds.
+WALL_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+
+_current_measurement = contextvars.ContextVar('current_measurement', default=None)
+
+
+def get_rss_bytes() -> int:
+    """Resident set size of this process."""
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import psutil
+        return psutil.Process().memory_info().rss
+
+
+class Measurement:
+    """Wall time, CPU time, peak RSS and rows in/out of one run of a stage.
+
+    CPU time is that of the whole process, so it includes the worker threads of numpy,
+    pyarrow or TensorFlow. The peak RSS cannot be read per stage from the OS, so with
+    `sample_rss` a thread samples the RSS while the stage runs; otherwise the RSS at the end is used.
+    """
+
+    def __init__(self, name: str, sample_rss: bool=True, sample_interval: float=RSS_SAMPLE_INTERVAL_SECONDS):
+        self.name = name
+        self.sample_rss = sample_rss
+        self.sample_interval = sample_interval
+        self.rows_in = None
+        self.rows_out = None
+        self.metrics = {}
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def add_rows(self, rows_in: int=None, rows_out: int=None) -> None:
+        if rows_in is not None:
+            self.rows_in = (self.rows_in or 0) + int(rows_in)
+        if rows_out is not None:
+            self.rows_out = (self.rows_out or 0) + int(rows_out)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.sample_interval):
+            self._peak_rss = max(self._peak_rss, get_rss_bytes())
+
+    def start(self) -> None:
+        self._start_rss = self._peak_rss = get_rss_bytes()
+        if self.sample_rss:
+            self._sampler = threading.Thread(target=self._sample, name=f'rss-{self.name}', daemon=True)
+            self._sampler.start()
+        self._wall, self._cpu = time.perf_counter(), time.process_time()
+
+    def stop(self, status: str) -> dict:
+        wall_seconds, cpu_seconds = time.perf_counter() - self._wall, time.process_time() - self._cpu
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+        self._peak_rss = max(self._peak_rss, get_rss_bytes())
+        self.metrics = {'wall_seconds': wall_seconds, 'cpu_seconds': cpu_seconds, 'peak_rss_bytes': self._peak_rss,
+                        'rss_increase_bytes': self._peak_rss - self._start_rss}
+        if self.rows_in is not None:
+            self.metrics['rows_in'] = self.rows_in
+        if self.rows_out is not None:
+            self.metrics['rows_out'] = self.rows_out
+        self.status = status
+        return self.metrics
+
+
+class MetricsRegistry:
+    """Aggregates the measurements of this process and renders them in the Prometheus text format.
+
+    Every uvicorn worker is its own process with its own registry; Prometheus scrapes each of them.
+    """
+
+    def __init__(self, prefix: str=METRICS_PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, measurement: Measurement) -> None:
+        metrics = measurement.metrics
+        with self._lock:
+            stage = self._stages.setdefault(measurement.name, {
+                'runs': {}, 'buckets': [0] * len(WALL_SECONDS_BUCKETS), 'count': 0, 'wall_seconds': 0.0,
+                'cpu_seconds': 0.0, 'rows_in': 0, 'rows_out': 0, 'peak_rss_bytes': 0})
+            stage['runs'][measurement.status] = stage['runs'].get(measurement.status, 0) + 1
+            for i, upper_bound in enumerate(WALL_SECONDS_BUCKETS):
+                if metrics['wall_seconds'] <= upper_bound:
+                    stage['buckets'][i] += 1
+            stage['count'] += 1
+            stage['wall_seconds'] += metrics['wall_seconds']
+            stage['cpu_seconds'] += metrics['cpu_seconds']
+            stage['rows_in'] += metrics.get('rows_in', 0)
+            stage['rows_out'] += metrics.get('rows_out', 0)
+            stage['peak_rss_bytes'] = metrics['peak_rss_bytes']
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format (version 0.0.4)."""
+        prefix = self.prefix
+        with self._lock:
+            stages = {name: {**stage, 'runs': dict(stage['runs']), 'buckets': list(stage['buckets'])}
+                      for name, stage in self._stages.items()}
+
+        lines = [f'# HELP {prefix}_stage_runs_total Completed runs of an instrumented stage, by status.',
+                 f'# TYPE {prefix}_stage_runs_total counter']
+        for name, stage in stages.items():
+            for status, count in stage['runs'].items():
+                lines.append(f'{prefix}_stage_runs_total{{stage="{name}",status="{status}"}} {count}')
+
+        lines += [f'# HELP {prefix}_stage_wall_seconds Wall time of a stage run.',
+                  f'# TYPE {prefix}_stage_wall_seconds histogram']
+        for name, stage in stages.items():
+            for upper_bound, count in zip(WALL_SECONDS_BUCKETS, stage['buckets']):
+                lines.append(f'{prefix}_stage_wall_seconds_bucket{{stage="{name}",le="{upper_bound}"}} {count}')
+            lines.append(f'{prefix}_stage_wall_seconds_bucket{{stage="{name}",le="+Inf"}} {stage["count"]}')
+            lines.append(f'{prefix}_stage_wall_seconds_sum{{stage="{name}"}} {stage["wall_seconds"]}')
+            lines.append(f'{prefix}_stage_wall_seconds_count{{stage="{name}"}} {stage["count"]}')
+
+        for metric, metric_type, help_text in (
+                ('cpu_seconds', 'counter', 'Process CPU time spent in a stage.'),
+                ('rows_in', 'counter', 'Rows read by a stage.'),
+                ('rows_out', 'counter', 'Rows written by a stage.'),
+                ('peak_rss_bytes', 'gauge', 'Peak resident set size during the last run of a stage.')):
+            metric_name = f'{prefix}_stage_{metric}' + ('_total' if metric_type == 'counter' else '')
+            lines += [f'# HELP {metric_name} {help_text}', f'# TYPE {metric_name} {metric_type}']
+            for name, stage in stages.items():
+                lines.append(f'{metric_name}{{stage="{name}"}} {stage[metric]}')
+
+        lines += [f'# HELP {prefix}_process_resident_memory_bytes Resident set size of this process.',
+                  f'# TYPE {prefix}_process_resident_memory_bytes gauge',
+                  f'{prefix}_process_resident_memory_bytes {get_rss_bytes()}']
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+def log_to_mlflow(measurement: Measurement) -> None:
+    """Logs the metrics to the active MLflow run, if mlflow is in use in this process."""
+    # Checking sys.modules keeps mlflow from being imported by processes that never start a run.
+    mlflow = sys.modules.get('mlflow')
+    if mlflow is None or mlflow.active_run() is None:
+        return
+    try:
+        mlflow.log_metrics({f'{measurement.name}.{key}': float(value) for key, value in measurement.metrics.items()})
+    except Exception as e:
+        logger.warning(f'Could not log the metrics of {measurement.name} to MLflow: {e}')
+
+
+@contextmanager
+def measure(name: str, sample_rss: bool=True, log_level: int=logging.INFO):
+    """Measures the block as a run of stage `name` and emits the metrics to the log, MLflow and REGISTRY.
+
+    Usage:
+        with measure('data_transformation') as measurement:
+            ...
+            measurement.add_rows(rows_in=len(dataframe))
+    """
+    measurement = Measurement(name, sample_rss=sample_rss)
+    token = _current_measurement.set(measurement)
+    measurement.start()
+    status = 'error'
+    try:
+        yield measurement
+        status = 'ok'
+    finally:
+        _current_measurement.reset(token)
+        metrics = measurement.stop(status)
+        logger.log(log_level, f'stage={name} status={status} ' + ' '.join(
+            f'{key}={value:.4f}' if isinstance(value, float) else f'{key}={value}' for key, value in metrics.items()),
+            extra={'stage': name, 'status': status, 'metrics': metrics})
+        REGISTRY.observe(measurement)
+        log_to_mlflow(measurement)
+
+
+def instrument(name: str=None, sample_rss: bool=True, log_level: int=logging.INFO):
+    """Decorator measuring every call of a function or method as a run of stage `name`.
+
+    `name` defaults to the qualified name of the function, e.g. 'DataTransformation.initiate_data_transformation'.
+    """
+    def decorator(func):
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(stage_name, sample_rss=sample_rss, log_level=log_level):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_rows(rows_in: int=None, rows_out: int=None) -> None:
+    """Adds rows read and written to the innermost running measurement; a no-op outside of one."""
+    measurement = _current_measurement.get()
+    if measurement is not None:
+        measurement.add_rows(rows_in=rows_in, rows_out=rows_out)
+
+
+@contextmanager
+def mlflow_run(run_name: str=None, experiment_name: str=MLFLOW_EXPERIMENT_NAME):
+    """Runs the block in an MLflow run, so that the metrics of every measured stage are logged to it.
+
+    The tracking server is taken from MLFLOW_TRACKING_URI as usual. An already active run is reused;
+    if mlflow is not installed the metrics only go to the log.
+    """
+    try:
+        import mlflow
+    except ImportError:
+        logger.warning('mlflow is not installed, stage metrics are only logged.')
+        yield None
+        return
+
+    if mlflow.active_run() is not None:
+        yield mlflow.active_run()
+        return
+    mlflow.set_experiment(experiment_name)
+    with mlflow.start_run(run_name=run_name) as run:
+        yield run
@@ -1,33 +1,169 @@
 import os
+import sys
+import copy
+import json
+import queue
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
-from from_root import from_root #type: ignore
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
-from src.constants import LOG_DIR, LOG_FILENAME, MAX_LOG_SIZE, BACKUP_COUNT
+from src.constants import (LOG_DIR, MAX_LOG_SIZE, BACKUP_COUNT, LOG_FORMAT, LOG_LEVELS,
+                           CONSOLE_LOG_LEVEL, LOG_QUEUE_SIZE)
 
-log_dir_path = os.path.join(from_root(), LOG_DIR)
-os.makedirs(log_dir_path, exist_ok=True)
+# Attributes every LogRecord has; anything else on a record was passed through `extra`.
+LOG_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'taskName'}
 
-logging.getLogger("azure.core.pipeline.policies.http_logging_policy").setLevel(logging.WARNING)
+
+class LazyRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler of the process's file in the project's LOG_DIR, named after LOG_FILENAME and
+    the pid. It resolves the project root and the file name, creates the log directory and opens the
+    file on the first record, instead of when src is imported."""
+
+    def __init__(self, **kwargs):
+        super().__init__(os.devnull, delay=True, **kwargs)
+        self.pid = os.getpid()
+        self._resolved = False
+
+    def _open(self):
+        if not self._resolved:
+            from src.constants import ROOT_DIR, LOG_FILENAME
+
+            file_name = f'{os.path.splitext(LOG_FILENAME)[0]}.{self.pid}.log'
+            self.baseFilename = os.path.join(ROOT_DIR, LOG_DIR, file_name)
+            self._resolved = True
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line, including the fields passed through `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in LOG_RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Puts records on a bounded queue for the listener thread, so logging never waits on I/O.
+
+    If the writer falls behind and the queue is full, records are dropped and counted rather
+    than blocking the calling thread; a warning with the count follows once there is room again.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._reported_dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now: the arguments may change before the listener formats them.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped > self._reported_dropped:
+            dropped, self._reported_dropped = self.dropped - self._reported_dropped, self.dropped
+            warning = logging.makeLogRecord({'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                                             'msg': f'{dropped} log records were dropped, the log queue was full'})
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                pass
+
+
+def get_log_levels() -> dict:
+    """LOG_LEVELS, updated with the `name=LEVEL` pairs of the LOG_LEVELS environment variable."""
+    levels = dict(LOG_LEVELS)
+    for entry in os.getenv('LOG_LEVELS', '').split(','):
+        if '=' in entry:
+            name, level = entry.rsplit('=', 1)
+            levels['' if name.strip() == 'root' else name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener = None
+_queue_handler = None
 
 
 def configureLogger():
+    """Routes every record through a queue to a listener thread that writes the file and the console.
+
+    Each process writes its own file, named with its pid, so uvicorn or multiprocessing workers
+    never rotate a shared file. A forked child starts its own listener (see below).
+    """
+    global _listener, _queue_handler
     logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
-        
-    log_file_path = os.path.join(log_dir_path, LOG_FILENAME)
-        
-    formatter = logging.Formatter('[%(asctime)s] %(name)s - %(levelname)s - %(message)s')
-        
-    filehandler = RotatingFileHandler(log_file_path, maxBytes=MAX_LOG_SIZE, backupCount=BACKUP_COUNT)
+    stopLogger()
+    if _queue_handler is not None:
+        logger.removeHandler(_queue_handler)
+
+    if os.getenv('LOG_FORMAT', LOG_FORMAT) == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('[%(asctime)s] %(name)s - %(levelname)s - %(message)s')
+
+    filehandler = LazyRotatingFileHandler(maxBytes=MAX_LOG_SIZE, backupCount=BACKUP_COUNT)
     filehandler.setFormatter(formatter)
     filehandler.setLevel(logging.DEBUG)
-        
+
     consolehandler = logging.StreamHandler()
     consolehandler.setFormatter(formatter)
-    consolehandler.setLevel(logging.INFO)
-        
-    logger.addHandler(filehandler)
-    logger.addHandler(consolehandler)
+    consolehandler.setLevel(CONSOLE_LOG_LEVEL)
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _listener = QueueListener(_queue_handler.queue, filehandler, consolehandler, respect_handler_level=True)
+    _listener.start()
+
+    for name, level in get_log_levels().items():
+        logging.getLogger(name or None).setLevel(level)
+    logger.addHandler(_queue_handler)
+
+
+def stopLogger():
+    """Writes out the records still queued and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_after_fork():
+    # The listener thread does not exist in a forked child and the queue may hold the parent's
+    # records, so the child starts over with its own queue, listener and file.
+    # multiprocessing children leave through os._exit, which skips atexit, so the queued records
+    # are written out by a multiprocessing finalizer instead. The finalizer is registered from an
+    # after-fork callback, because the child clears the finalizers it inherited after this hook runs.
+    global _listener
+    _listener = None
+    configureLogger()
+    if 'multiprocessing' in sys.modules:
+        from multiprocessing.util import Finalize, register_after_fork
+        register_after_fork(_queue_handler, lambda handler: Finalize(None, stopLogger, exitpriority=0))
+
 
-configureLogger()
\ No newline at end of file
+configureLogger()
+atexit.register(stopLogger)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
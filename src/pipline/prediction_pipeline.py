@@ -0,0 +1,422 @@
+import os
+import re
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import instrument, record_rows
+from src.entity.estimator import load_estimator
+from src.constants import (MODEL_BLOB_DIR, MODEL_BLOB_CONTAINER, MODEL_BUNDLE_FILE_NAMES, MODEL_MANIFEST_FILE_NAME,
+                           MODEL_WATCHER_POLL_INTERVAL_SECONDS, PREDICTION_MAX_BATCH_SIZE, PREDICTION_MAX_WAIT_MS,
+                           PREDICTION_BACKEND)
+
+logger = logging.getLogger('Prediction Pipeline')
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-']\w+)*|[^\w\s]")
+
+
+def tokenize(text: str) -> list:
+    """Splits text into words and punctuation marks, the way the training corpus is tokenized."""
+    return TOKEN_PATTERN.findall(text)
+
+
+class PredictionPipeline:
+    """Loads the model bundle once and tags batches of raw texts."""
+
+    def __init__(self, model_dir: str=None, backend: str=PREDICTION_BACKEND, model_version: str=None):
+        """model_dir defaults to MODEL_DIR, resolved here rather than when the module is imported."""
+        try:
+            if model_dir is None:
+                from src.constants import MODEL_DIR
+                model_dir = MODEL_DIR
+            self.model_dir = model_dir
+            self.backend = backend
+            self.model_version = model_version
+            self.estimator = load_estimator(model_dir, backend)
+        except Exception as e:
+            raise CustomException(e)
+
+    def swap_estimator(self, estimator, model_dir: str, model_version: str) -> None:
+        """Serves every batch started from now on with `estimator`; running batches finish on the previous one."""
+        self.estimator = estimator
+        self.model_dir = model_dir
+        self.model_version = model_version
+
+    # Runs per request batch: no RSS sampling thread, and only logged at DEBUG level.
+    @instrument('predict', sample_rss=False, log_level=logging.DEBUG)
+    def predict(self, texts: list) -> list:
+        """Tags a batch of texts with one forward pass.
+
+        Returns:
+            One list of {'token': ..., 'tag': ...} per text.
+        """
+        try:
+            # Read once: the whole batch uses the same model even if it is swapped meanwhile.
+            estimator = self.estimator
+            sentences = [tokenize(text) for text in texts]
+            tags = estimator.predict(sentences)
+            record_rows(rows_in=len(texts), rows_out=sum(len(sentence) for sentence in sentences))
+            return [[{'token': token, 'tag': tag} for token, tag in zip(sentence, sentence_tags)]
+                    for sentence, sentence_tags in zip(sentences, tags)]
+        except Exception as e:
+            raise CustomException(e)
+
+
+class LocalModelSource:
+    """Model bundle in a local directory, e.g. a mounted volume.
+
+    The version is a hash of the names, sizes and modification times of the bundle's files.
+    New bundles should be written elsewhere and renamed into place, so they are never read half written.
+    """
+
+    def __init__(self, model_dir: str=None):
+        if model_dir is None:
+            from src.constants import MODEL_DIR
+            model_dir = MODEL_DIR
+        self.model_dir = model_dir
+
+    def get_version(self) -> str:
+        entries = []
+        for file_name in sorted(os.listdir(self.model_dir)):
+            stat = os.stat(os.path.join(self.model_dir, file_name))
+            entries.append((file_name, stat.st_size, stat.st_mtime_ns))
+        return hashlib.sha256(json.dumps(entries).encode('utf-8')).hexdigest()[:16]
+
+    def fetch(self, version: str) -> str:
+        return self.model_dir
+
+    def prune(self, model_dir: str) -> None:
+        pass
+
+
+class BlobModelSource:
+    """Model bundle in Azure Blob Storage, fetched through the node's ModelCache.
+
+    A bundle is pushed with `publish`: its files first, then a manifest listing the ETag of every
+    file. The version is the ETag of the manifest, and every file is fetched at the ETag the manifest
+    lists, so a fetch that overlaps a push fails rather than mixing files of two bundles; the next
+    poll fetches the new bundle whole.
+
+    Each version is assembled into its own directory of hard links to the cached files, shared by
+    every worker of the node. A worker holds a shared lock on the lease file of each bundle it may
+    serve, and `prune` only removes the bundles whose lease no live worker holds.
+    """
+
+    def __init__(self, container_name: str=MODEL_BLOB_CONTAINER, blob_dir: str=MODEL_BLOB_DIR,
+                 file_names: tuple=MODEL_BUNDLE_FILE_NAMES, manifest_file_name: str=MODEL_MANIFEST_FILE_NAME,
+                 model_cache=None):
+        # Imported here so serving processes with a local model never load the Azure SDK.
+        from src.cloud_storage.model_cache import ModelCache
+
+        self.container_name = container_name
+        self.blob_dir = blob_dir
+        self.file_names = file_names
+        self.manifest_file_name = manifest_file_name
+        self.model_cache = model_cache or ModelCache()
+        self.bundles_dir = os.path.join(self.model_cache.cache_dir, 'bundles')
+        # Bundle directory -> shared FileLock on its lease file, for the bundles this worker may serve.
+        self._leases = {}
+
+    def publish(self, model_dir: str) -> str:
+        """Uploads the bundle in `model_dir`, then its manifest.
+
+        Returns: the new version.
+        """
+        try:
+            storage = self.model_cache.storage
+            etags = {file_name: storage.upload_file_to_blob(os.path.join(model_dir, file_name),
+                                                            f'{self.blob_dir}/{file_name}', self.container_name,
+                                                            remove=False)
+                     for file_name in self.file_names}
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                manifest_file_path = os.path.join(tmp_dir, self.manifest_file_name)
+                with open(manifest_file_path, 'w') as file:
+                    json.dump({'files': etags}, file, indent=4)
+                manifest_etag = storage.upload_file_to_blob(manifest_file_path,
+                                                            f'{self.blob_dir}/{self.manifest_file_name}',
+                                                            self.container_name, remove=False)
+            version = manifest_etag.strip('"')
+            logger.info(f'Published model version {version}: {etags}')
+            return version
+        except Exception as e:
+            raise CustomException(e)
+
+    def get_version(self) -> str:
+        blob_path = f'{self.blob_dir}/{self.manifest_file_name}'
+        return self.model_cache.storage.get_blob_properties(blob_path, self.container_name).etag.strip('"')
+
+    def get_lease_file_path(self, bundle_dir: str) -> str:
+        return os.path.join(self.bundles_dir, f'.{os.path.basename(bundle_dir)}.lease')
+
+    def _lease(self, bundle_dir: str) -> None:
+        if os.name == 'nt' or bundle_dir in self._leases:
+            return
+        from src.cloud_storage.model_cache import FileLock
+
+        while True:
+            lease = FileLock(self.get_lease_file_path(bundle_dir), shared=True).acquire()
+            # prune removes the lease file of a bundle it deletes; a lock on a removed file protects nothing.
+            if lease.is_on_path():
+                self._leases[bundle_dir] = lease
+                return
+            lease.release()
+
+    def _release(self, bundle_dir: str) -> None:
+        lease = self._leases.pop(bundle_dir, None)
+        if lease is not None:
+            lease.release()
+
+    def fetch(self, version: str) -> str:
+        bundle_dir = os.path.join(self.bundles_dir, hashlib.sha256(version.encode('utf-8')).hexdigest()[:16])
+        try:
+            # Leased before it is looked at, so no other worker prunes it while it is assembled or loaded.
+            self._lease(bundle_dir)
+            if not os.path.isdir(bundle_dir):
+                manifest_file_path = self.model_cache.get(f'{self.blob_dir}/{self.manifest_file_name}',
+                                                          self.container_name, etag=version)
+                with open(manifest_file_path, 'r') as file:
+                    etags = json.load(file)['files']
+                missing = [file_name for file_name in self.file_names if file_name not in etags]
+                if missing:
+                    raise CustomException(f'Model version {version} has no {missing} in its manifest')
+
+                # Each file at the ETag in the manifest: a file replaced by a newer push fails the fetch.
+                cached_file_paths = {
+                    file_name: self.model_cache.get(f'{self.blob_dir}/{file_name}', self.container_name,
+                                                    etag=etags[file_name])
+                    for file_name in self.file_names}
+                os.makedirs(self.bundles_dir, exist_ok=True)
+                tmp_dir = tempfile.mkdtemp(dir=self.bundles_dir, prefix='.')
+                for file_name, cached_file_path in cached_file_paths.items():
+                    try:
+                        os.link(cached_file_path, os.path.join(tmp_dir, file_name))
+                    except OSError:
+                        shutil.copyfile(cached_file_path, os.path.join(tmp_dir, file_name))
+                try:
+                    os.rename(tmp_dir, bundle_dir)
+                except OSError:
+                    # Another worker on this node assembled the same version first.
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+            return bundle_dir
+        except Exception as e:
+            self._release(bundle_dir)
+            raise CustomException(e)
+
+    def prune(self, model_dir: str) -> None:
+        """Removes every bundle but `model_dir` that no worker holds a lease on, once `model_dir` is being served.
+
+        This worker first gives up its own leases on the other bundles. Runs under the model cache's lock,
+        so it never races another worker's prune.
+        """
+        for bundle_dir in [bundle_dir for bundle_dir in self._leases if bundle_dir != model_dir]:
+            self._release(bundle_dir)
+        if os.name == 'nt':
+            # Without shared locks, bundles in use cannot be told from unused ones, so they are all kept.
+            return
+        from src.cloud_storage.model_cache import FileLock
+
+        with FileLock(self.model_cache.lock_file_path):
+            bundle_names = set()
+            for name in os.listdir(self.bundles_dir):
+                if name.startswith('.') and name.endswith('.lease'):
+                    bundle_names.add(name[1:-len('.lease')])
+                elif not name.startswith('.'):
+                    bundle_names.add(name)
+            for bundle_name in bundle_names:
+                bundle_dir = os.path.join(self.bundles_dir, bundle_name)
+                if bundle_dir == model_dir:
+                    continue
+                lease_file_path = self.get_lease_file_path(bundle_dir)
+                try:
+                    with FileLock(lease_file_path, blocking=False):
+                        shutil.rmtree(bundle_dir, ignore_errors=True)
+                        os.remove(lease_file_path)
+                except BlockingIOError:
+                    logger.info(f'Keeping model bundle {bundle_dir}, another worker is serving it')
+
+
+class ModelWatcher:
+    """Polls a model source and hot swaps the pipeline's estimator when a new version appears.
+
+    A new version is fetched, loaded and warmed up with dummy batches on a background thread while
+    the current model keeps serving, then swapped in with a single assignment. Batches already
+    running finish on the old model. A version that fails to load is not retried.
+    """
+
+    def __init__(self, prediction_pipeline: PredictionPipeline, model_source,
+                 poll_interval_seconds: float=MODEL_WATCHER_POLL_INTERVAL_SECONDS,
+                 warmup_batch_size: int=PREDICTION_MAX_BATCH_SIZE):
+        self.prediction_pipeline = prediction_pipeline
+        self.model_source = model_source
+        self.poll_interval_seconds = poll_interval_seconds
+        self.warmup_batch_size = warmup_batch_size
+        self._failed_version = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.poll_interval_seconds):
+            self.check()
+
+    def warm_up(self, estimator) -> None:
+        """Runs a single sentence and a full batch, so graph set-up and allocations happen before traffic arrives."""
+        estimator.predict([['warm', 'up']])
+        estimator.predict([['warm', 'up'] * 16] * self.warmup_batch_size)
+
+    def check(self) -> bool:
+        """Loads and swaps in the source's current version if it is new.
+
+        Returns: True if the model was swapped.
+        """
+        current_version = self.prediction_pipeline.model_version
+        try:
+            version = self.model_source.get_version()
+            if version in (current_version, self._failed_version):
+                return False
+            logger.info(f'New model version {version} found, loading it in the background')
+            start = time.perf_counter()
+            model_dir = self.model_source.fetch(version)
+        except Exception as e:
+            # Storage errors are transient: the next poll tries again.
+            logger.warning(f'Could not fetch the current model version: {e}')
+            return False
+
+        try:
+            estimator = load_estimator(model_dir, self.prediction_pipeline.backend)
+            self.warm_up(estimator)
+            self.prediction_pipeline.swap_estimator(estimator, model_dir, version)
+            self.model_source.prune(model_dir)
+            logger.info(f'Now serving model version {version}, replacing {current_version} '
+                        f'({time.perf_counter() - start:.1f}s to fetch, load and warm up)')
+            return True
+        except Exception as e:
+            self._failed_version = version
+            logger.error(f'Model version {version} failed to load, still serving {current_version}: {e}')
+            return False
+
+
+class MicroBatcherStopped(CustomException):
+    """Raised to callers of MicroBatcher.submit whose request was not served because the batcher stopped."""
+
+
+class MicroBatcher:
+    """Coalesces concurrent prediction requests into micro-batches.
+
+    Requests are queued; a single worker takes the first waiting request, keeps collecting
+    until `max_batch_size` texts are gathered or `max_wait_ms` has passed, and runs one
+    forward pass for all of them on a background thread, so the event loop is never blocked.
+    `stop` answers the batch whose forward pass is running, and fails every other request it
+    has taken or still has queued with MicroBatcherStopped, so no caller is left waiting.
+    """
+
+    def __init__(self, prediction_pipeline: PredictionPipeline, max_batch_size: int=PREDICTION_MAX_BATCH_SIZE,
+                 max_wait_ms: float=PREDICTION_MAX_WAIT_MS):
+        self.prediction_pipeline = prediction_pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._worker = None
+        self._stopping = False
+        # Requests taken from the queue and not answered yet, and the forward pass running for them.
+        self._requests = []
+        self._prediction = None
+        # One inference thread: forward passes run one at a time, each on a full batch.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ner-inference')
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._stopping = False
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        if self._prediction is not None:
+            try:
+                self._answer(self._requests, results=await self._prediction)
+            except Exception as e:
+                self._answer(self._requests, error=e)
+        requests, self._requests, self._prediction = self._requests, [], None
+        while self._queue is not None and not self._queue.empty():
+            requests.append(self._queue.get_nowait())
+        self._answer(requests, error=MicroBatcherStopped('The prediction service is shutting down'))
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, texts: list) -> list:
+        """Queues texts for prediction and waits for their results.
+
+        Raises MicroBatcherStopped if the batcher stops before the texts are predicted.
+        """
+        if self._stopping:
+            raise MicroBatcherStopped('The prediction service is shutting down')
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    @staticmethod
+    def _answer(requests: list, results: list=None, error: Exception=None) -> None:
+        """Resolves the futures of `requests` with their slice of `results`, or with `error`."""
+        start = 0
+        for request_texts, future in requests:
+            if not future.done():
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[start:start + len(request_texts)])
+            start += len(request_texts)
+
+    async def _collect(self) -> None:
+        """Takes requests from the queue into `_requests` until the batch is full or `max_wait` has passed."""
+        self._requests.append(await self._queue.get())
+        n_texts = len(self._requests[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while n_texts < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                break
+            self._requests.append(request)
+            n_texts += len(request[0])
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._collect()
+            texts = [text for request_texts, _ in self._requests for text in request_texts]
+            self._prediction = loop.run_in_executor(self._executor, self.prediction_pipeline.predict, texts)
+            try:
+                # If the worker is cancelled meanwhile, stop() waits for this forward pass and answers the batch.
+                results = await asyncio.shield(self._prediction)
+            except Exception as e:
+                logger.error(f'Batch prediction failed: {e}')
+                self._answer(self._requests, error=e)
+            else:
+                self._answer(self._requests, results=results)
+            self._requests, self._prediction = [], None
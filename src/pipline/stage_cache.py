@@ -0,0 +1,166 @@
+import os
+import json
+import shutil
+import hashlib
+import inspect
+from datetime import datetime
+from dataclasses import asdict
+from typing import Optional
+
+from src.exception import CustomException
+from src.logger import logging
+
+logger = logging.getLogger('Stage Cache')
+
+
+class StageCache:
+    """Reuses the artifacts of a pipeline stage when the fingerprint of its inputs is unchanged.
+
+    Entries are kept in a JSON index mapping stage -> fingerprint -> artifact, and point into the
+    timestamped run directory that produced the artifact. Run directories are evicted least recently
+    used first, beyond `max_runs` directories or `max_size_bytes` on disk.
+    """
+
+    def __init__(self, cache_file_path: str, artifact_root: str, max_runs: int, max_size_bytes: int,
+                 keep_dirs: tuple=()):
+        self.cache_file_path = cache_file_path
+        self.artifact_root = artifact_root
+        self.max_runs = max_runs
+        self.max_size_bytes = max_size_bytes
+        # Directories under artifact_root that are not run directories, e.g. the feature store.
+        self.keep_dirs = {os.path.normpath(path) for path in keep_dirs}
+        # Run directories holding artifacts this run produced or reused; they are never evicted.
+        self._used_dirs = set()
+        self._index = self._load_index()
+
+    def _load_index(self) -> dict:
+        if not os.path.exists(self.cache_file_path):
+            return {'stages': {}, 'runs': {}}
+        with open(self.cache_file_path, 'r') as file:
+            return json.load(file)
+
+    def _save_index(self) -> None:
+        os.makedirs(os.path.dirname(self.cache_file_path) or '.', exist_ok=True)
+        tmp_file_path = f'{self.cache_file_path}.tmp'
+        with open(tmp_file_path, 'w') as file:
+            json.dump(self._index, file, indent=4)
+        os.replace(tmp_file_path, self.cache_file_path)
+
+    @staticmethod
+    def fingerprint(*parts) -> str:
+        """Hashes any JSON serialisable description of a stage's inputs."""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def file_hash(file_path: str) -> str:
+        """Content hash of a file, e.g. schema.yaml or params.yaml."""
+        file_hash = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+    @staticmethod
+    def directory_fingerprint(path: str) -> list:
+        """Cheap fingerprint of a data directory: name, size and mtime of every file."""
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            return [(os.path.basename(path), stat.st_size, stat.st_mtime_ns)]
+        entries = []
+        for file_name in sorted(os.listdir(path)):
+            stat = os.stat(os.path.join(path, file_name))
+            entries.append((file_name, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    @staticmethod
+    def code_version(*objects) -> str:
+        """Hash of the source files defining the given modules, classes or functions."""
+        code_hash = hashlib.sha256()
+        for source_file in sorted({inspect.getsourcefile(obj) for obj in objects}):
+            code_hash.update(StageCache.file_hash(source_file).encode('utf-8'))
+        return code_hash.hexdigest()
+
+    def get(self, stage: str, fingerprint: str, artifact_class: type) -> Optional[object]:
+        """Returns the cached artifact of `stage` for this fingerprint, if its run directory still exists."""
+        try:
+            entry = self._index['stages'].get(stage, {}).get(fingerprint)
+            if entry is None or not os.path.isdir(entry['artifact_dir']):
+                return None
+
+            self._touch_run(entry['artifact_dir'])
+            self._save_index()
+            return artifact_class(**entry['artifact'])
+        except Exception as e:
+            raise CustomException(e)
+
+    def put(self, stage: str, fingerprint: str, artifact: object, artifact_dir: str) -> None:
+        """Records the artifact `stage` produced in `artifact_dir` for this fingerprint."""
+        try:
+            self._index['stages'].setdefault(stage, {})[fingerprint] = {
+                'artifact_dir': artifact_dir,
+                'artifact': asdict(artifact),
+                'created_at': datetime.now().isoformat(),
+            }
+            self._touch_run(artifact_dir)
+            self._save_index()
+        except Exception as e:
+            raise CustomException(e)
+
+    def _touch_run(self, artifact_dir: str) -> None:
+        self._used_dirs.add(os.path.normpath(artifact_dir))
+        self._index['runs'][artifact_dir] = datetime.now().isoformat()
+
+    @staticmethod
+    def _directory_size(path: str) -> int:
+        size = 0
+        for dir_path, _, file_names in os.walk(path):
+            for file_name in file_names:
+                size += os.path.getsize(os.path.join(dir_path, file_name))
+        return size
+
+    def evict(self, current_artifact_dir: str) -> list:
+        """Deletes least recently used run directories beyond the configured count and size limits.
+
+        The directory of the current run is never evicted, nor any directory holding an artifact
+        this run reused from the cache, as later stages of the run read from it.
+
+        Returns:
+            The evicted directories.
+        """
+        try:
+            if not os.path.isdir(self.artifact_root):
+                return []
+            protected_dirs = self._used_dirs | {os.path.normpath(current_artifact_dir)}
+
+            run_dirs = []
+            for dir_name in os.listdir(self.artifact_root):
+                run_dir = os.path.join(self.artifact_root, dir_name)
+                if os.path.isdir(run_dir) and os.path.normpath(run_dir) not in self.keep_dirs:
+                    last_used = self._index['runs'].get(run_dir, datetime.fromtimestamp(os.path.getmtime(run_dir)).isoformat())
+                    run_dirs.append((last_used, run_dir))
+            # Most recently used first.
+            run_dirs.sort(reverse=True)
+
+            evicted = []
+            total_size = 0
+            for rank, (_, run_dir) in enumerate(run_dirs):
+                size = self._directory_size(run_dir)
+                is_protected = os.path.normpath(run_dir) in protected_dirs
+                if not is_protected and (rank >= self.max_runs or total_size + size > self.max_size_bytes):
+                    shutil.rmtree(run_dir, ignore_errors=True)
+                    evicted.append(run_dir)
+                else:
+                    total_size += size
+
+            if evicted:
+                for stage_entries in self._index['stages'].values():
+                    for fingerprint in [fp for fp, entry in stage_entries.items() if entry['artifact_dir'] in evicted]:
+                        del stage_entries[fingerprint]
+                for run_dir in evicted:
+                    self._index['runs'].pop(run_dir, None)
+                self._save_index()
+                logger.info(f'Evicted {len(evicted)} artifact directories: {evicted}')
+            return evicted
+        except Exception as e:
+            raise CustomException(e)
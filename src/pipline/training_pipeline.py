@@ -0,0 +1,163 @@
+import os
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import measure, mlflow_run
+from src.utils import main_utils, sequence_utils
+from src.utils.main_utils import read_yaml_file
+from src.constants import ARTIFACT_DIR, SCHEMA_FILE_PATH, PARAMS_FILE_PATH
+from src.pipline.stage_cache import StageCache
+from src.components import data_validation, data_transformation, model_trainer, model_exporter, model_evaluation
+from src.entity import estimator
+from src.components.data_ingestion import DataIngestion
+from src.components.data_validation import DataValidation
+from src.components.data_transformation import DataTransformation
+from src.components.model_trainer import ModelTrainer
+from src.components.model_exporter import ModelExporter
+from src.components.model_evaluation import ModelEvaluation
+from src.entity.config_entity import (get_training_pipeline_config, DataIngestionConfig, DataValidationConfig,
+                                      DataTransformationConfig, ModelTrainerConfig, ModelExporterConfig,
+                                      ModelEvaluationConfig)
+from src.entity.artifact_entity import (DataIngestionArtifact, DataValidationArtifact, DataTransformationArtifact,
+                                        ModelTrainerArtifact, ModelExporterArtifact, ModelEvaluationArtifact)
+
+logger = logging.getLogger('Training Pipeline')
+
+
+class TrainPipeline:
+    """Runs the training pipeline, skipping every stage whose inputs are unchanged since a previous run."""
+
+    def __init__(self):
+        self.training_pipeline_config = get_training_pipeline_config()
+        self.data_ingestion_config = DataIngestionConfig()
+        self.data_validation_config = DataValidationConfig()
+        self.data_transformation_config = DataTransformationConfig()
+        self.model_trainer_config = ModelTrainerConfig()
+        self.model_exporter_config = ModelExporterConfig()
+        self.model_evaluation_config = ModelEvaluationConfig()
+        self.stage_cache = StageCache(cache_file_path=self.training_pipeline_config.stage_cache_file_path,
+                                      artifact_root=ARTIFACT_DIR,
+                                      max_runs=self.training_pipeline_config.max_cached_runs,
+                                      max_size_bytes=self.training_pipeline_config.max_cache_size_bytes,
+                                      keep_dirs=(self.data_ingestion_config.feature_store_dir,))
+
+    def run_stage(self, stage: str, fingerprint: str, artifact_class: type, run) -> object:
+        """Returns the cached artifact of `stage` for `fingerprint`, or runs the stage and caches its artifact."""
+        artifact = self.stage_cache.get(stage, fingerprint, artifact_class)
+        if artifact is not None:
+            logger.info(f'Inputs of {stage} are unchanged, reusing artifact: {artifact}')
+            return artifact
+
+        artifact = run()
+        self.stage_cache.put(stage, fingerprint, artifact, self.training_pipeline_config.artifact_dir)
+        return artifact
+
+    def start_data_ingestion(self) -> DataIngestionArtifact:
+        """Ingestion always runs: in incremental mode it only pulls documents above the watermark."""
+        try:
+            logger.info('Starting Data Ingestion...')
+            data_ingestion = DataIngestion(data_ingestion_config=self.data_ingestion_config)
+            return data_ingestion.initiate_data_ingestion()
+        except Exception as e:
+            raise CustomException(e)
+
+    def start_data_validation(self, data_ingestion_artifact: DataIngestionArtifact, data_fingerprint: str) -> DataValidationArtifact:
+        try:
+            logger.info('Starting Data Validation...')
+            reference_profile_file_path = self.data_validation_config.reference_profile_file_path
+            fingerprint = StageCache.fingerprint(
+                data_fingerprint,
+                StageCache.file_hash(SCHEMA_FILE_PATH),
+                # Drift is measured against the last profile that passed, which each passing run replaces.
+                StageCache.file_hash(reference_profile_file_path) if os.path.exists(reference_profile_file_path) else None,
+                read_yaml_file(PARAMS_FILE_PATH)['data_validation'],
+                StageCache.code_version(data_validation, main_utils))
+            return self.run_stage('data_validation', fingerprint, DataValidationArtifact,
+                                  DataValidation(data_ingestion_artifact, self.data_validation_config).initiate_data_validation)
+        except Exception as e:
+            raise CustomException(e)
+
+    def start_data_transformation(self, data_ingestion_artifact: DataIngestionArtifact,
+                                  data_validation_artifact: DataValidationArtifact, data_fingerprint: str) -> DataTransformationArtifact:
+        try:
+            logger.info('Starting Data Transformation...')
+            fingerprint = StageCache.fingerprint(
+                data_fingerprint,
+                data_validation_artifact.validation_status,
+                read_yaml_file(PARAMS_FILE_PATH)['data_transformation'],
+                StageCache.code_version(data_transformation, main_utils, sequence_utils))
+            data_transformation_stage = DataTransformation(data_ingestion_artifact, data_validation_artifact,
+                                                           self.data_transformation_config)
+            return self.run_stage('data_transformation', fingerprint, DataTransformationArtifact,
+                                  data_transformation_stage.initiate_data_transformation)
+        except Exception as e:
+            raise CustomException(e)
+
+    def start_model_trainer(self, data_transformation_artifact: DataTransformationArtifact) -> ModelTrainerArtifact:
+        try:
+            logger.info('Starting Model Trainer...')
+            # The transformation artifact paths change whenever the transformation is re-run.
+            fingerprint = StageCache.fingerprint(
+                data_transformation_artifact,
+                read_yaml_file(PARAMS_FILE_PATH)['model_trainer'],
+                StageCache.code_version(model_trainer, main_utils, sequence_utils))
+            return self.run_stage('model_trainer', fingerprint, ModelTrainerArtifact,
+                                  ModelTrainer(data_transformation_artifact, self.model_trainer_config).initiate_model_trainer)
+        except Exception as e:
+            raise CustomException(e)
+
+    def start_model_exporter(self, data_transformation_artifact: DataTransformationArtifact,
+                             model_trainer_artifact: ModelTrainerArtifact) -> ModelExporterArtifact:
+        try:
+            logger.info('Starting Model Exporter...')
+            fingerprint = StageCache.fingerprint(
+                model_trainer_artifact,
+                read_yaml_file(PARAMS_FILE_PATH)['model_exporter'],
+                StageCache.code_version(model_exporter, estimator, sequence_utils))
+            model_exporter_stage = ModelExporter(data_transformation_artifact, model_trainer_artifact,
+                                                 self.model_exporter_config)
+            return self.run_stage('model_exporter', fingerprint, ModelExporterArtifact,
+                                  model_exporter_stage.initiate_model_exporter)
+        except Exception as e:
+            raise CustomException(e)
+
+    def start_model_evaluation(self, data_transformation_artifact: DataTransformationArtifact,
+                               model_exporter_artifact: ModelExporterArtifact) -> ModelEvaluationArtifact:
+        try:
+            logger.info('Starting Model Evaluation...')
+            fingerprint = StageCache.fingerprint(
+                data_transformation_artifact,
+                model_exporter_artifact,
+                read_yaml_file(PARAMS_FILE_PATH)['model_evaluation'],
+                StageCache.code_version(model_evaluation, estimator, sequence_utils))
+            model_evaluation_stage = ModelEvaluation(data_transformation_artifact, model_exporter_artifact,
+                                                     self.model_evaluation_config)
+            return self.run_stage('model_evaluation', fingerprint, ModelEvaluationArtifact,
+                                  model_evaluation_stage.initiate_model_evaluation)
+        except Exception as e:
+            raise CustomException(e)
+
+    def run_pipeline(self) -> None:
+        try:
+            # Every stage that actually runs, rather than being reused from the cache, logs its metrics to this run.
+            with mlflow_run(run_name=self.training_pipeline_config.timestamp), measure('training_pipeline'):
+                data_ingestion_artifact = self.start_data_ingestion()
+                if not data_ingestion_artifact.has_data:
+                    logger.warning('The feature store has no data yet, skipping the rest of the training pipeline.')
+                    return
+                # Partitions are immutable and named by write time, so listing them identifies the data.
+                data_fingerprint = StageCache.fingerprint(
+                    data_ingestion_artifact.watermark,
+                    StageCache.directory_fingerprint(data_ingestion_artifact.raw_data_file_path))
+
+                data_validation_artifact = self.start_data_validation(data_ingestion_artifact, data_fingerprint)
+                data_transformation_artifact = self.start_data_transformation(data_ingestion_artifact, data_validation_artifact,
+                                                                              data_fingerprint)
+                model_trainer_artifact = self.start_model_trainer(data_transformation_artifact)
+                model_exporter_artifact = self.start_model_exporter(data_transformation_artifact, model_trainer_artifact)
+                model_evaluation_artifact = self.start_model_evaluation(data_transformation_artifact, model_exporter_artifact)
+                logger.info(f'Training pipeline finished: {model_exporter_artifact}, {model_evaluation_artifact}')
+
+                self.stage_cache.evict(current_artifact_dir=self.training_pipeline_config.artifact_dir)
+        except Exception as e:
+            raise CustomException(e)
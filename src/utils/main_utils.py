@@ -1,15 +1,20 @@
 import os
+from typing import TYPE_CHECKING
 
 import numpy as np
-import dill
-import yaml
-from pandas import DataFrame
 
 from src.exception import CustomException
 
+# yaml, dill, pandas and pyarrow are imported by the functions that need them, so that a
+# prediction worker, which only loads arrays and string tables, does not pay for importing them.
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
 
 def read_yaml_file(file_path: str) -> dict:
     try:
+        import yaml
+
         with open(file_path, 'rb') as yaml_file:
             return yaml.safe_load(yaml_file)
     except Exception as e:
@@ -18,10 +23,12 @@ def read_yaml_file(file_path: str) -> dict:
 
 def write_yaml_file(file_path: str, content: object, replace: bool=False) -> None:
     try:
+        import yaml
+
         if replace:
             if os.path.exists(file_path):
                 os.remove(file_path)
-        os.makedirs(os.path.dirname(file_path), exists_ok=True)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
         with open(file_path, 'w') as file:
             yaml.dump(content, file)
             
@@ -31,6 +38,8 @@ def write_yaml_file(file_path: str, content: object, replace: bool=False) -> Non
 
 def load_object(file_path: str) -> object:
     try:
+        import dill
+
         with open(file_path, 'rb') as file_obj:
             obj = dill.load(file_obj)
         return obj
@@ -39,8 +48,164 @@ def load_object(file_path: str) -> object:
     
 def save_object(file_path: str, obj: object) -> None:
     try:
+        import dill
+
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         with open(file_path, 'wb') as file_obj:
             dill.dump(obj, file_obj)
     except Exception as e:
-        raise CustomException(e)
\ No newline at end of file
+        raise CustomException(e)
+
+
+def save_numpy_array_data(file_path: str, array: np.ndarray) -> None:
+    """Saves a numpy array to a .npy file, creating the parent directory."""
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as file_obj:
+            np.save(file_obj, array)
+    except Exception as e:
+        raise CustomException(e)
+    
+    
+def load_numpy_array_data(file_path: str, mmap_mode: str=None) -> np.ndarray:
+    """Loads a numpy array from a .npy file.
+    
+    With mmap_mode='r' the file is memory mapped read-only instead of read into memory, so
+    loading is instant and processes opening the same file share its pages.
+    """
+    try:
+        return np.load(file_path, mmap_mode=mmap_mode)
+    except Exception as e:
+        raise CustomException(e)
+
+
+def save_string_table(file_path: str, values: list) -> None:
+    """Saves sorted strings as a fixed-width array of their UTF-8 bytes in a .npy file.
+
+    Unlike a pickle, the file holds no code, loads with allow_pickle=False and can be memory
+    mapped. UTF-8 bytes sort in code point order, so the table stays searchable with np.searchsorted.
+    """
+    try:
+        table = np.array([value.encode('utf-8') for value in values], dtype=np.bytes_)
+        if len(table) > 1 and not np.all(table[:-1] < table[1:]):
+            raise ValueError(f'String table values must be unique and sorted: {file_path}')
+        save_numpy_array_data(file_path, table)
+    except Exception as e:
+        raise CustomException(e)
+
+
+def load_string_table(file_path: str, mmap_mode: str='r') -> np.ndarray:
+    """Loads a table written by save_string_table as an array of UTF-8 bytes, memory mapped by default.
+
+    Use `table[i].decode('utf-8')`, or `np.char.decode(table, 'utf-8')` for a whole small table, to get
+    the strings back (astype(str) would decode them as ASCII).
+    """
+    try:
+        table = np.load(file_path, mmap_mode=mmap_mode, allow_pickle=False)
+        if table.dtype.kind != 'S':
+            raise ValueError(f'{file_path} is not a string table: dtype {table.dtype}')
+        return table
+    except Exception as e:
+        raise CustomException(e)
+
+
+def get_schema_dtypes(schema_config: dict) -> dict:
+    """Returns a {column: dtype} mapping from the `columns` list of schema.yaml."""
+    dtypes = {}
+    for column in schema_config['columns']:
+        dtypes.update(column)
+    return dtypes
+
+
+def write_feature_store(dataframe: 'DataFrame', file_path: str, file_format: str='parquet') -> None:
+    """Writes a DataFrame to the feature store.
+    
+    Parquet files are written through pyarrow, so categorical columns are stored
+    dictionary-encoded and come back as categoricals when read.
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        if file_format == 'parquet':
+            dataframe.to_parquet(file_path, engine='pyarrow', index=False)
+        elif file_format == 'csv':
+            dataframe.to_csv(file_path, index=False, header=True)
+        else:
+            raise ValueError(f'Unsupported feature store format: {file_format}')
+    except Exception as e:
+        raise CustomException(e)
+    
+
+def list_feature_store_partitions(path: str) -> list:
+    """Returns the data files of a feature store, in the order they were written.
+    
+    `path` can be a single file, or a directory of `part-<timestamp>.<format>` partitions.
+    """
+    if os.path.isfile(path):
+        return [path]
+    return sorted(os.path.join(path, file_name) for file_name in os.listdir(path)
+                  if file_name.startswith('part-') and file_name.endswith(('.parquet', '.csv')))
+    
+
+def iter_feature_store(file_path: str, chunk_size: int, columns: list=None):
+    """Yields a feature store file or partition directory as DataFrames of at most `chunk_size` rows.
+
+    Only one chunk is in memory at a time. Columns keep the dtypes they are stored with: parquet
+    dictionary columns come back as categoricals, csv columns are inferred per chunk.
+    """
+    try:
+        partitions = list_feature_store_partitions(file_path)
+        if len(partitions) == 0:
+            raise FileNotFoundError(f'No feature store partitions found at {file_path}')
+
+        for partition in partitions:
+            if partition.endswith('.parquet'):
+                import pyarrow.parquet as pq
+
+                parquet_file = pq.ParquetFile(partition, memory_map=True)
+                for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+                    yield batch.to_pandas()
+            else:
+                from pandas import read_csv
+
+                yield from read_csv(partition, usecols=columns, chunksize=chunk_size)
+    except Exception as e:
+        raise CustomException(e)
+
+
+def read_feature_store(file_path: str, columns: list=None, dtype: dict=None) -> 'DataFrame':
+    """Reads a feature store file or partition directory, inferring the format from the extension.
+    
+    Arguments:
+        file_path(str): Path of a .parquet/.csv file, or of a directory of partitions.
+        columns(list): Only these columns are read, if given.
+        dtype(dict): Column dtypes to apply, e.g. the categorical dtypes from schema.yaml.
+        
+    Returns:
+        DataFrame
+    """
+    try:
+        partitions = list_feature_store_partitions(file_path)
+        if len(partitions) == 0:
+            raise FileNotFoundError(f'No feature store partitions found at {file_path}')
+        
+        if partitions[0].endswith('.parquet'):
+            import pyarrow.parquet as pq
+
+            # Parquet keeps dictionary encoded columns as categoricals, and is memory mapped.
+            dataframe = pq.read_table(partitions if len(partitions) > 1 else partitions[0],
+                                      columns=columns, memory_map=True).to_pandas()
+            if dtype:
+                dataframe = dataframe.astype({col: typ for col, typ in dtype.items() if col in dataframe.columns})
+            return dataframe
+        
+        from pandas import read_csv, concat
+
+        dataframes = [read_csv(partition, usecols=columns, dtype=dtype) for partition in partitions]
+        if len(dataframes) == 1:
+            return dataframes[0]
+        dataframe = concat(dataframes, ignore_index=True)
+        if dtype:
+            dataframe = dataframe.astype({col: typ for col, typ in dtype.items() if col in dataframe.columns})
+        return dataframe
+    except Exception as e:
+        raise CustomException(e)
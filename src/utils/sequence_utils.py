@@ -0,0 +1,158 @@
+import numpy as np
+
+from src.exception import CustomException
+
+
+def get_sentence_lengths(sentence_offsets: np.ndarray) -> np.ndarray:
+    """Returns the number of tokens of every sentence from CSR offsets."""
+    return np.diff(sentence_offsets).astype(np.int32)
+
+
+def gather_sentences(values: np.ndarray, sentence_offsets: np.ndarray, sentence_indices: np.ndarray) -> tuple:
+    """Gathers the given sentences from a flat CSR array into a new, contiguous CSR array.
+
+    Only the gathered tokens are read, so `values` can be memory mapped.
+
+    Returns:
+        (values, sentence_offsets) of the gathered sentences, in the order of `sentence_indices`.
+    """
+    try:
+        starts = sentence_offsets[sentence_indices]
+        lengths = sentence_offsets[np.asarray(sentence_indices) + 1] - starts
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        positions = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths) + np.repeat(starts, lengths)
+        return np.asarray(values[positions]), offsets
+    except Exception as e:
+        raise CustomException(e)
+
+
+def pad_sentences(values: np.ndarray, sentence_offsets: np.ndarray, sentence_indices: np.ndarray,
+                  pad_value: int=0, maxlen: int=None) -> np.ndarray:
+    """Gathers the given sentences from a flat CSR array into a post-padded 2D array.
+
+    Arguments:
+        values(np.ndarray): Flat per-token array, e.g. token ids.
+        sentence_offsets(np.ndarray): Sentence i is values[offsets[i]:offsets[i+1]].
+        sentence_indices(np.ndarray): Sentences to gather, in output row order.
+        pad_value(int): Value of the padded positions.
+        maxlen(int): Width of the output. Defaults to the longest gathered sentence.
+
+    Returns:
+        np.ndarray of shape (len(sentence_indices), maxlen), dtype of `values`.
+    """
+    try:
+        starts = sentence_offsets[sentence_indices]
+        lengths = sentence_offsets[np.asarray(sentence_indices) + 1] - starts
+        width = int(lengths.max(initial=0)) if maxlen is None else maxlen
+        lengths = np.minimum(lengths, width)
+
+        padded = np.full((len(starts), width), pad_value, dtype=values.dtype)
+        rows = np.repeat(np.arange(len(starts)), lengths)
+        # Column of every gathered token inside its own sentence.
+        columns = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        padded[rows, columns] = values[np.repeat(starts, lengths) + columns]
+        return padded
+    except Exception as e:
+        raise CustomException(e)
+
+
+def get_bio_scheme(tag_vocab: list) -> tuple:
+    """Splits BIO tags ('B-geo', 'I-geo', 'O') into lookup arrays indexed by tag id.
+
+    Returns:
+        (is_inside, entity_type, entity_types): is_inside[t] is True for I- tags, entity_type[t]
+        is the index of the tag's type in entity_types, or -1 for tags outside entities.
+    """
+    entity_types = sorted({tag[2:] for tag in tag_vocab if tag[:2] in ('B-', 'I-')})
+    type_index = {entity_type: index for index, entity_type in enumerate(entity_types)}
+    is_inside = np.array([tag.startswith('I-') for tag in tag_vocab], dtype=bool)
+    entity_type = np.array([type_index.get(tag[2:], -1) if tag[:2] in ('B-', 'I-') else -1 for tag in tag_vocab],
+                           dtype=np.int32)
+    return is_inside, entity_type, entity_types
+
+
+def extract_entity_spans(tag_ids: np.ndarray, sentence_starts: np.ndarray, is_inside: np.ndarray,
+                         entity_type: np.ndarray) -> tuple:
+    """Extracts BIO entity spans from a flat tag sequence covering many sentences, without a Python loop.
+
+    A token continues the previous token's entity if it is an I- tag of the same type within the
+    same sentence; any other B- or I- tag starts a new entity (the conlleval convention).
+
+    Arguments:
+        tag_ids(np.ndarray): Flat tag ids of real (non padded) tokens.
+        sentence_starts(np.ndarray): True where a new sentence begins.
+        is_inside(np.ndarray), entity_type(np.ndarray): Lookup arrays from get_bio_scheme.
+
+    Returns:
+        (starts, ends, types): first and last token position and type index of every entity.
+    """
+    try:
+        types = entity_type[tag_ids]
+        continues = np.zeros(len(tag_ids), dtype=bool)
+        continues[1:] = is_inside[tag_ids[1:]] & (types[1:] == types[:-1]) & (types[1:] >= 0) & ~sentence_starts[1:]
+
+        in_entity = types >= 0
+        starts = np.flatnonzero(in_entity & ~continues)
+        ends = np.flatnonzero(in_entity & ~np.r_[continues[1:], False])
+        return starts, ends, types[starts]
+    except Exception as e:
+        raise CustomException(e)
+
+
+class BucketBatchSampler:
+    """Groups sentences into length buckets and batches each bucket separately.
+
+    A batch only needs padding up to its own longest sentence, which is at most the
+    upper bound of its bucket, instead of the longest sentence of the corpus.
+    """
+
+    def __init__(self, lengths: np.ndarray, sentence_indices: np.ndarray, batch_size: int,
+                 bucket_boundaries: list, shuffle: bool=True, seed: int=None):
+        """
+        Arguments:
+            lengths(np.ndarray): Length of every sentence of the corpus.
+            sentence_indices(np.ndarray): Sentences to sample from, e.g. the training split.
+            batch_size(int): Maximum number of sentences per batch.
+            bucket_boundaries(list): Sorted sentence lengths at which a new bucket starts.
+            shuffle(bool): Shuffle sentences within buckets and the batch order every epoch.
+            seed(int): Seed of the shuffling; epoch e uses seed + e.
+        """
+        self.lengths = lengths
+        self.sentence_indices = np.asarray(sentence_indices)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+
+        bucket_ids = np.digitize(lengths[self.sentence_indices], bucket_boundaries)
+        self.buckets = [self.sentence_indices[bucket_ids == bucket_id] for bucket_id in np.unique(bucket_ids)]
+
+    def __len__(self) -> int:
+        return sum(-(-len(bucket) // self.batch_size) for bucket in self.buckets)
+
+    def get_batches(self, epoch: int=0) -> list:
+        """Returns the sentence index arrays of every batch of one epoch."""
+        rng = np.random.default_rng(None if self.seed is None else self.seed + epoch)
+        batches = []
+        for bucket in self.buckets:
+            if self.shuffle:
+                bucket = rng.permutation(bucket)
+            batches.extend(np.array_split(bucket, -(-len(bucket) // self.batch_size)))
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        return batches
+
+    def get_padding_stats(self) -> dict:
+        """Compares the padding of bucketed batches with padding every sentence to the global max length.
+
+        Returns:
+            dict with the padded fraction of both layouts and the number of padded positions avoided.
+        """
+        lengths = self.lengths[self.sentence_indices]
+        n_tokens = int(lengths.sum())
+        global_positions = len(lengths) * int(lengths.max(initial=0))
+        bucketed_positions = sum(len(batch) * int(self.lengths[batch].max(initial=0)) for batch in self.get_batches())
+        return {
+            'global_padding_ratio': 1 - n_tokens / global_positions if global_positions else 0.0,
+            'bucketed_padding_ratio': 1 - n_tokens / bucketed_positions if bucketed_positions else 0.0,
+            'padded_positions_avoided': global_positions - bucketed_positions,
+        }
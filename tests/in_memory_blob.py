@@ -0,0 +1,157 @@
+import uuid
+import hashlib
+import threading
+from types import SimpleNamespace
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (ResourceNotFoundError, ResourceExistsError, ResourceModifiedError,
+                                   ServiceResponseError, HttpResponseError)
+
+
+def _invalid_range_error() -> HttpResponseError:
+    response = SimpleNamespace(status_code=416, reason='The range specified is invalid for the current size of the resource.',
+                               headers={}, request=None, content_type=None, text=lambda *args: '')
+    return HttpResponseError(message=response.reason, response=response)
+
+
+class InMemoryStorageStreamDownloader:
+    """Subset of azure's StorageStreamDownloader for one downloaded range."""
+
+    def __init__(self, data: bytes, properties):
+        self._data = data
+        self.size = len(data)
+        self.properties = properties
+
+    def readall(self) -> bytes:
+        return self._data
+
+    def readinto(self, stream) -> int:
+        stream.write(self._data)
+        return self.size
+
+
+class InMemoryBlobClient:
+    """Subset of azure's BlobClient: single shot and block uploads, ranged downloads and properties.
+
+    Downloads report their properties the way the SDK does for ranged requests, see download_blob.
+    """
+
+    def __init__(self, service, container_name: str, blob_name: str):
+        self._service = service
+        self.container_name = container_name
+        self.blob_name = blob_name
+
+    def _blob(self) -> dict:
+        blob = self._service._containers.get(self.container_name, {}).get(self.blob_name)
+        if blob is None:
+            raise ResourceNotFoundError(f'The specified blob {self.blob_name} does not exist.')
+        return blob
+
+    def _put(self, data: bytes, content_md5: bool=True) -> None:
+        with self._service._lock:
+            if self.container_name not in self._service._containers:
+                raise ResourceNotFoundError(f'The specified container {self.container_name} does not exist.')
+            self._service._containers[self.container_name][self.blob_name] = {
+                'data': data,
+                'etag': f'"{uuid.uuid4().hex}"',
+                'content_md5': hashlib.md5(data).digest() if content_md5 else None,
+            }
+
+    def upload_blob(self, data, overwrite: bool=False, **kwargs) -> dict:
+        self._service._request('upload_blob')
+        data = data.read() if hasattr(data, 'read') else bytes(data)
+        if not overwrite and self.exists():
+            raise ResourceExistsError(f'The specified blob {self.blob_name} already exists.')
+        self._put(data)
+        return {'etag': self._blob()['etag']}
+
+    def stage_block(self, block_id: str, data, **kwargs) -> None:
+        self._service._request('stage_block')
+        data = data.read() if hasattr(data, 'read') else bytes(data)
+        with self._service._lock:
+            self._service._staged_blocks.setdefault((self.container_name, self.blob_name), {})[block_id] = data
+
+    def commit_block_list(self, block_list: list, **kwargs) -> dict:
+        self._service._request('commit_block_list')
+        with self._service._lock:
+            staged = self._service._staged_blocks.pop((self.container_name, self.blob_name), {})
+        block_ids = [getattr(block, 'id', block) for block in block_list]
+        # Like the service, a committed block list has no content MD5 unless the client sets one.
+        self._put(b''.join(staged[block_id] for block_id in block_ids), content_md5=False)
+        return {'etag': self._blob()['etag']}
+
+    def download_blob(self, offset: int=None, length: int=None, etag: str=None, match_condition=None,
+                      **kwargs) -> InMemoryStorageStreamDownloader:
+        self._service._request('download_blob')
+        blob = self._blob()
+        if etag is not None and match_condition == MatchConditions.IfNotModified and etag != blob['etag']:
+            raise ResourceModifiedError('The condition specified using HTTP conditional header(s) is not met.')
+
+        # As in the SDK, `size` is the size of the downloaded range and the blob size is only in
+        # `content_range`; a range starting at or after the end of the blob (any range of an empty
+        # blob) is rejected by the service with a 416.
+        size = len(blob['data'])
+        start = offset or 0
+        if (offset is not None or length is not None) and start >= size:
+            raise _invalid_range_error()
+        end = size if length is None else min(start + length, size)
+        properties = self._properties(blob)
+        properties.size = end - start
+        properties.content_range = f'bytes {start}-{end - 1}/{size}'
+        properties.content_md5 = None
+        return InMemoryStorageStreamDownloader(blob['data'][start:end], properties)
+
+    def get_blob_properties(self, **kwargs):
+        self._service._request('get_blob_properties')
+        return self._properties(self._blob())
+
+    def exists(self, **kwargs) -> bool:
+        try:
+            self._blob()
+            return True
+        except ResourceNotFoundError:
+            return False
+
+    def _properties(self, blob: dict):
+        return SimpleNamespace(name=self.blob_name, container=self.container_name, size=len(blob['data']),
+                               etag=blob['etag'], content_settings=SimpleNamespace(content_md5=blob['content_md5']))
+
+
+class InMemoryBlobServiceClient:
+    """In-memory stand-in for `azure.storage.blob.BlobServiceClient`, to run blob transfers offline.
+
+    Assign an instance to `CreateBlobServiceClient.blob_service_client`, or pass it to
+    AzureBlobStorage directly. `fail_requests(n)` makes the next n blob requests raise
+    ServiceResponseError, as a dropped connection would, and `request_counts` records how many
+    requests of each kind were made, so retries and resumes can be checked.
+    """
+
+    def __init__(self):
+        self._containers = {}
+        self._staged_blocks = {}
+        self._lock = threading.Lock()
+        self._failures = 0
+        self.request_counts = {}
+
+    def fail_requests(self, n: int) -> None:
+        with self._lock:
+            self._failures = n
+
+    def _request(self, kind: str) -> None:
+        with self._lock:
+            self.request_counts[kind] = self.request_counts.get(kind, 0) + 1
+            if self._failures > 0:
+                self._failures -= 1
+                raise ServiceResponseError(f'Injected failure of {kind}')
+
+    def create_container(self, container_name: str, **kwargs) -> None:
+        with self._lock:
+            if container_name in self._containers:
+                raise ResourceExistsError(f'The specified container {container_name} already exists.')
+            self._containers[container_name] = {}
+
+    def get_blob_client(self, container: str, blob: str, **kwargs) -> InMemoryBlobClient:
+        return InMemoryBlobClient(self, container, blob)
+
+    def get_account_information(self, **kwargs) -> dict:
+        return {'sku_name': 'Standard_LRS', 'account_kind': 'StorageV2'}
@@ -0,0 +1,274 @@
+import threading
+from copy import deepcopy
+
+from bson import ObjectId
+
+
+class InMemoryCursor:
+    """Subset of pymongo's Cursor: sort, skip, limit, batch_size and iteration."""
+
+    def __init__(self, documents: list, projection: dict=None):
+        self._documents = documents
+        self._projection = projection
+        self._skip = 0
+        self._limit = 0
+        self._iterator = None
+
+    def sort(self, key_or_list, direction: int=1):
+        keys = [(key_or_list, direction)] if isinstance(key_or_list, str) else list(key_or_list)
+        for key, key_direction in reversed(keys):
+            self._documents.sort(key=lambda doc: _sort_key(doc.get(key)), reverse=key_direction < 0)
+        return self
+
+    def skip(self, skip: int):
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> dict:
+        # Like a pymongo Cursor this is its own iterator, so it can be consumed in several slices.
+        if self._iterator is None:
+            end = self._skip + self._limit if self._limit else None
+            self._iterator = iter(self._documents[self._skip:end])
+        return _project(next(self._iterator), self._projection)
+
+
+class InMemoryCollection:
+    """Thread safe, in-memory stand-in for a pymongo Collection.
+
+    Supports the filters used in this project: equality, $gt, $gte, $lt, $lte, $ne,
+    $in, $exists and $and.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._documents = []
+        self._lock = threading.Lock()
+
+    def _snapshot(self, filter: dict=None) -> list:
+        with self._lock:
+            documents = list(self._documents)
+        return [doc for doc in documents if _matches(doc, filter or {})]
+
+    def find(self, filter: dict=None, projection: dict=None, sort: list=None, skip: int=0, limit: int=0,
+             batch_size: int=0, **kwargs) -> InMemoryCursor:
+        cursor = InMemoryCursor(self._snapshot(filter), projection)
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    def find_one(self, filter: dict=None, projection: dict=None, sort: list=None, **kwargs):
+        for document in self.find(filter, projection=projection, sort=sort, limit=1):
+            return document
+        return None
+
+    def count_documents(self, filter: dict=None, **kwargs) -> int:
+        return len(self._snapshot(filter))
+
+    def estimated_document_count(self, **kwargs) -> int:
+        return len(self._documents)
+
+    def insert_one(self, document: dict, **kwargs):
+        self.insert_many([document])
+
+    def insert_many(self, documents: list, ordered: bool=True, **kwargs):
+        documents = [deepcopy(document) for document in documents]
+        for document in documents:
+            document.setdefault('_id', ObjectId())
+        with self._lock:
+            self._documents.extend(documents)
+
+    def create_index(self, keys, **kwargs) -> str:
+        return str(keys)
+
+    def drop(self) -> None:
+        with self._lock:
+            self._documents = []
+
+
+class InMemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, collection_name: str) -> InMemoryCollection:
+        with self._lock:
+            if collection_name not in self._collections:
+                self._collections[collection_name] = InMemoryCollection(collection_name)
+            return self._collections[collection_name]
+
+
+class InMemoryMongoClient:
+    """In-memory stand-in for `pymongo.MongoClient`, to run the data access layer without a cluster.
+
+    Assign an instance to `MongoDBClient.client` before the first `MongoDBClient()` is created;
+    every component then shares it exactly as it would share the pooled pymongo client.
+    """
+
+    def __init__(self):
+        self._databases = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, database_name: str) -> InMemoryDatabase:
+        with self._lock:
+            if database_name not in self._databases:
+                self._databases[database_name] = InMemoryDatabase(database_name)
+            return self._databases[database_name]
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryAsyncCursor:
+    """Asyncio view of an InMemoryCursor, iterated with `async for` or `await cursor.to_list()`."""
+
+    def __init__(self, cursor: InMemoryCursor):
+        self._cursor = cursor
+
+    def sort(self, key_or_list, direction: int=1):
+        self._cursor.sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int):
+        self._cursor.skip(skip)
+        return self
+
+    def limit(self, limit: int):
+        self._cursor.limit(limit)
+        return self
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length: int=None) -> list:
+        return list(self._cursor) if length is None else [document for document, _ in zip(self._cursor, range(length))]
+
+
+class InMemoryAsyncCollection:
+    """Asyncio stand-in for a pymongo AsyncCollection, over an InMemoryCollection."""
+
+    def __init__(self, collection: InMemoryCollection):
+        self.name = collection.name
+        self._collection = collection
+
+    def find(self, *args, **kwargs) -> InMemoryAsyncCursor:
+        return InMemoryAsyncCursor(self._collection.find(*args, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        return self._collection.find_one(*args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs) -> int:
+        return self._collection.count_documents(*args, **kwargs)
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return self._collection.estimated_document_count(**kwargs)
+
+    async def insert_one(self, document: dict, **kwargs):
+        return self._collection.insert_one(document, **kwargs)
+
+    async def insert_many(self, documents: list, ordered: bool=True, **kwargs):
+        return self._collection.insert_many(documents, ordered=ordered, **kwargs)
+
+    async def create_index(self, keys, **kwargs) -> str:
+        return self._collection.create_index(keys, **kwargs)
+
+    async def drop(self) -> None:
+        self._collection.drop()
+
+
+class InMemoryAsyncDatabase:
+    def __init__(self, database: InMemoryDatabase):
+        self.name = database.name
+        self._database = database
+
+    def __getitem__(self, collection_name: str) -> InMemoryAsyncCollection:
+        return InMemoryAsyncCollection(self._database[collection_name])
+
+
+class InMemoryAsyncMongoClient:
+    """In-memory stand-in for `pymongo.AsyncMongoClient`, to assign to `AsyncMongoDBClient.client`.
+
+    Pass the InMemoryMongoClient of the synchronous code to see the same data from both.
+    """
+
+    def __init__(self, client: InMemoryMongoClient=None):
+        self._client = client or InMemoryMongoClient()
+
+    def __getitem__(self, database_name: str) -> InMemoryAsyncDatabase:
+        return InMemoryAsyncDatabase(self._client[database_name])
+
+    async def close(self) -> None:
+        pass
+
+
+def _sort_key(value) -> tuple:
+    # Missing fields sort first, as in MongoDB.
+    return (0, '') if value is None else (1, value)
+
+
+def _project(document: dict, projection: dict=None) -> dict:
+    if not projection:
+        return dict(document)
+    included = [field for field, flag in projection.items() if flag and field != '_id']
+    if included or all(projection.values()):
+        projected = {field: document[field] for field in included if field in document}
+        if projection.get('_id', 1) and '_id' in document:
+            projected['_id'] = document['_id']
+        return projected
+    return {field: value for field, value in document.items() if projection.get(field, 1)}
+
+
+def _matches(document: dict, filter: dict) -> bool:
+    for field, condition in filter.items():
+        if field == '$and':
+            if not all(_matches(document, sub_filter) for sub_filter in condition):
+                return False
+            continue
+
+        value = document.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+
+        for operator, operand in condition.items():
+            if operator == '$exists':
+                matched = (field in document) == bool(operand)
+            elif operator == '$in':
+                matched = value in operand
+            elif operator == '$ne':
+                matched = value != operand
+            elif value is None:
+                matched = False
+            elif operator == '$gt':
+                matched = value > operand
+            elif operator == '$gte':
+                matched = value >= operand
+            elif operator == '$lt':
+                matched = value < operand
+            elif operator == '$lte':
+                matched = value <= operand
+            else:
+                raise NotImplementedError(f'Operator {operator} is not supported by InMemoryCollection')
+            if not matched:
+                return False
+    return True
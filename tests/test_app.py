@@ -0,0 +1,81 @@
+import asyncio
+import functools
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from src.pipline import prediction_pipeline
+from src.pipline.prediction_pipeline import MicroBatcher, LocalModelSource
+from src.constants import PREDICTION_MAX_REQUEST_TEXTS
+
+
+class StubEstimator:
+    """Tags capitalized tokens as B-geo and records the number of sentences of every forward pass."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, sentences: list) -> list:
+        self.batch_sizes.append(len(sentences))
+        return [['B-geo' if token[:1].isupper() else 'O' for token in sentence] for sentence in sentences]
+
+
+@pytest.fixture
+def estimator(monkeypatch, tmp_path):
+    """Serves the stub estimator through the app's own lifespan."""
+    estimator = StubEstimator()
+    monkeypatch.setattr(prediction_pipeline, 'load_estimator', lambda model_dir, backend: estimator)
+    monkeypatch.setattr(app_module, 'MODEL_SOURCE', 'local')
+    monkeypatch.setattr(app_module, 'LocalModelSource', lambda: LocalModelSource(str(tmp_path)))
+    monkeypatch.setattr(app_module, 'FEEDBACK_ENABLED', False)
+    return estimator
+
+
+def test_predict(estimator):
+    with TestClient(app_module.app) as client:
+        response = client.post('/predict', json={'text': 'Visited Paris.'})
+
+    assert response.status_code == 200
+    assert response.json() == {'entities': [{'token': 'Visited', 'tag': 'B-geo'}, {'token': 'Paris', 'tag': 'B-geo'},
+                                            {'token': '.', 'tag': 'O'}]}
+
+
+def test_concurrent_requests_share_a_forward_pass(estimator, monkeypatch):
+    monkeypatch.setattr(app_module, 'MicroBatcher', functools.partial(MicroBatcher, max_batch_size=8,
+                                                                      max_wait_ms=10_000))
+
+    async def send_requests() -> list:
+        async with app_module.lifespan(app_module.app):
+            transport = httpx.ASGITransport(app=app_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+                return await asyncio.gather(client.post('/predict/batch', json={'texts': ['in London', 'to Rome']}),
+                                            *[client.post('/predict', json={'text': f'text {i}'}) for i in range(6)])
+
+    responses = asyncio.run(send_requests())
+
+    assert [response.status_code for response in responses] == [200] * 7
+    assert responses[0].json()['entities'][1] == [{'token': 'to', 'tag': 'O'}, {'token': 'Rome', 'tag': 'B-geo'}]
+    assert [response.json()['entities'][0]['token'] for response in responses[1:]] == ['text'] * 6
+    # Eight texts fill one batch, so no request waits for the 10s time limit.
+    assert estimator.batch_sizes == [8]
+
+
+def test_batch_over_the_request_limit_is_rejected(estimator):
+    with TestClient(app_module.app) as client:
+        response = client.post('/predict/batch', json={'texts': ['a'] * (PREDICTION_MAX_REQUEST_TEXTS + 1)})
+        assert response.status_code == 413
+        assert estimator.batch_sizes == []
+
+        response = client.post('/predict/batch', json={'texts': ['a'] * PREDICTION_MAX_REQUEST_TEXTS})
+        assert response.status_code == 200
+        assert len(response.json()['entities']) == PREDICTION_MAX_REQUEST_TEXTS
+
+
+def test_requests_after_shutdown_get_503(estimator):
+    with TestClient(app_module.app, raise_server_exceptions=False) as client:
+        client.portal.call(app_module.app.state.batcher.stop)
+        response = client.post('/predict', json={'text': 'Paris'})
+
+    assert response.status_code == 503
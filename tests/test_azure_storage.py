@@ -0,0 +1,76 @@
+import os
+import hashlib
+
+import pytest
+
+from src.cloud_storage.azure_storage import AzureBlobStorage, get_blob_size
+from tests.in_memory_blob import InMemoryBlobServiceClient
+
+BLOCK_SIZE = 1024
+CONTAINER = 'models'
+
+
+@pytest.fixture
+def service():
+    service = InMemoryBlobServiceClient()
+    service.create_container(CONTAINER)
+    return service
+
+
+@pytest.fixture
+def storage(service):
+    return AzureBlobStorage(blob_service_client=service, block_size=BLOCK_SIZE, max_concurrency=3,
+                            retry_backoff_seconds=0)
+
+
+def put_blob(service, name: str, data: bytes) -> None:
+    service.get_blob_client(CONTAINER, name).upload_blob(data, overwrite=True)
+
+
+def read(file_path: str) -> bytes:
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+
+def test_ranged_download_reports_range_size_and_blob_size_like_the_sdk(service):
+    put_blob(service, 'model.keras', b'x' * (3 * BLOCK_SIZE + 10))
+    properties = service.get_blob_client(CONTAINER, 'model.keras').download_blob(offset=0, length=BLOCK_SIZE).properties
+    assert properties.size == BLOCK_SIZE
+    assert get_blob_size(properties) == 3 * BLOCK_SIZE + 10
+
+
+@pytest.mark.parametrize('size', [1, BLOCK_SIZE - 1, BLOCK_SIZE, BLOCK_SIZE + 1, 5 * BLOCK_SIZE, 7 * BLOCK_SIZE + 123])
+def test_download_file_writes_every_block(service, storage, tmp_path, size):
+    data = os.urandom(size)
+    put_blob(service, 'model.keras', data)
+    file_path = tmp_path / 'model.keras'
+    storage.download_file('model.keras', CONTAINER, str(file_path))
+    assert hashlib.md5(read(file_path)).digest() == hashlib.md5(data).digest()
+    assert service.request_counts['download_blob'] == -(-size // BLOCK_SIZE)
+
+
+def test_download_file_of_empty_blob(service, storage, tmp_path):
+    put_blob(service, 'empty.bin', b'')
+    file_path = tmp_path / 'empty.bin'
+    storage.download_file('empty.bin', CONTAINER, str(file_path))
+    assert read(file_path) == b''
+
+
+def test_download_file_retries_failed_blocks(service, storage, tmp_path):
+    data = os.urandom(4 * BLOCK_SIZE + 1)
+    put_blob(service, 'model.keras', data)
+    service.fail_requests(2)
+    file_path = tmp_path / 'model.keras'
+    storage.download_file('model.keras', CONTAINER, str(file_path))
+    assert read(file_path) == data
+
+
+def test_upload_then_download_round_trip(service, storage, tmp_path):
+    data = os.urandom(6 * BLOCK_SIZE + 5)
+    source = tmp_path / 'source.bin'
+    source.write_bytes(data)
+    storage.upload_file(str(source), 'artifact.bin', CONTAINER, remove=False)
+    assert service.request_counts['stage_block'] == 7
+    target = tmp_path / 'target.bin'
+    storage.download_file('artifact.bin', CONTAINER, str(target))
+    assert read(target) == data
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from src.exception import CustomException
+from src.cloud_storage.azure_storage import AzureBlobStorage
+from src.cloud_storage.model_cache import ModelCache
+from src.pipline.prediction_pipeline import BlobModelSource
+from tests.in_memory_blob import InMemoryBlobServiceClient
+
+CONTAINER = 'models'
+FILE_NAMES = ('token_vocab.npy', 'tag_vocab.npy', 'model.onnx')
+
+
+@pytest.fixture
+def service():
+    service = InMemoryBlobServiceClient()
+    service.create_container(CONTAINER)
+    return service
+
+
+def make_source(service, cache_dir) -> BlobModelSource:
+    """One serving worker; workers of a node share `cache_dir`."""
+    storage = AzureBlobStorage(blob_service_client=service, block_size=1024, max_retries=0, retry_backoff_seconds=0)
+    return BlobModelSource(container_name=CONTAINER, blob_dir='ner', file_names=FILE_NAMES,
+                           model_cache=ModelCache(storage=storage, cache_dir=str(cache_dir)))
+
+
+def write_bundle(model_dir, tag: str) -> str:
+    os.makedirs(model_dir, exist_ok=True)
+    for file_name in FILE_NAMES:
+        with open(os.path.join(model_dir, file_name), 'w') as file:
+            file.write(f'{file_name} {tag}')
+    return str(model_dir)
+
+
+def read_bundle(bundle_dir) -> dict:
+    contents = {}
+    for file_name in FILE_NAMES:
+        with open(os.path.join(bundle_dir, file_name)) as file:
+            contents[file_name] = file.read()
+    return contents
+
+
+def test_fetch_returns_the_published_bundle(service, tmp_path):
+    source = make_source(service, tmp_path / 'cache')
+    version = source.publish(write_bundle(tmp_path / 'v1', 'v1'))
+
+    assert source.get_version() == version
+    bundle_dir = source.fetch(version)
+    assert read_bundle(bundle_dir) == {file_name: f'{file_name} v1' for file_name in FILE_NAMES}
+    assert source.fetch(version) == bundle_dir
+
+
+def test_fetch_during_a_push_never_mixes_bundles(service, tmp_path):
+    source = make_source(service, tmp_path / 'cache')
+    old_version = source.publish(write_bundle(tmp_path / 'v1', 'v1'))
+    # A push has replaced the vocabularies, but not yet the model or the manifest.
+    new_dir = write_bundle(tmp_path / 'v2', 'v2')
+    for file_name in FILE_NAMES[:2]:
+        source.model_cache.storage.upload_file_to_blob(os.path.join(new_dir, file_name), f'ner/{file_name}',
+                                                       CONTAINER, remove=False)
+
+    with pytest.raises(CustomException):
+        source.fetch(old_version)
+    # Nothing was assembled: only lease files are left in the bundles directory.
+    assert all(os.path.isfile(os.path.join(source.bundles_dir, name)) for name in os.listdir(source.bundles_dir))
+
+    new_version = source.publish(new_dir)
+    assert read_bundle(source.fetch(new_version)) == {file_name: f'{file_name} v2' for file_name in FILE_NAMES}
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='bundles are never pruned without shared locks')
+def test_prune_keeps_bundles_other_workers_serve(service, tmp_path):
+    worker, other_worker = make_source(service, tmp_path / 'cache'), make_source(service, tmp_path / 'cache')
+    old_version = worker.publish(write_bundle(tmp_path / 'v1', 'v1'))
+    old_dir = other_worker.fetch(old_version)
+    assert worker.fetch(old_version) == old_dir
+
+    new_version = worker.publish(write_bundle(tmp_path / 'v2', 'v2'))
+    new_dir = worker.fetch(new_version)
+    worker.prune(new_dir)
+    # The other worker still serves the old bundle.
+    assert read_bundle(old_dir)['model.onnx'] == 'model.onnx v1'
+
+    assert other_worker.fetch(new_version) == new_dir
+    other_worker.prune(new_dir)
+    assert not os.path.exists(old_dir)
+    assert not os.path.exists(other_worker.get_lease_file_path(old_dir))
+    assert read_bundle(new_dir)['model.onnx'] == 'model.onnx v2'
@@ -0,0 +1,16 @@
+import sys
+import subprocess
+
+LAZY_CONSTANTS = ('ROOT_DIR', 'MODEL_DIR', 'LOG_FILENAME', 'MONGODB_URI')
+
+
+def test_lazy_constants_are_resolved_on_first_access():
+    # A fresh interpreter, since other tests have already resolved them in this one.
+    code = f"""
+import src.constants as constants
+import src.logger
+assert not [name for name in {LAZY_CONSTANTS!r} if name in vars(constants)]
+log_filename = constants.LOG_FILENAME
+assert log_filename.endswith('.log') and constants.LOG_FILENAME is log_filename
+"""
+    subprocess.run([sys.executable, '-c', code], check=True)
@@ -0,0 +1,118 @@
+import os
+import json
+
+import pytest
+
+from src.exception import CustomException
+from src.configuration.mongo_db_connection import MongoDBClient
+from src.components.data_ingestion import DataIngestion
+from src.entity.config_entity import DataIngestionConfig
+from src.utils.main_utils import read_feature_store, list_feature_store_partitions
+from src.constants import DATABASE_NAME
+from tests.in_memory_mongo import InMemoryMongoClient
+
+COLLECTION = 'ner'
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    client = InMemoryMongoClient()
+    monkeypatch.setattr(MongoDBClient, 'client', client)
+    return client[DATABASE_NAME][COLLECTION]
+
+
+@pytest.fixture
+def config(tmp_path):
+    feature_store_dir = str(tmp_path / 'feature_store')
+    # A cutoff in the future, so the documents inserted by the test are imported right away.
+    return DataIngestionConfig(feature_store_dir=feature_store_dir,
+                               watermark_file_path=os.path.join(feature_store_dir, 'watermark.json'),
+                               ingestion_mode='incremental', watermark_lag_seconds=-60, collection_name=COLLECTION,
+                               export_batch_size=10, export_workers=1)
+
+
+def insert_sentences(collection, first: int, n_sentences: int) -> None:
+    collection.insert_many([{'Sentence #': f'Sentence: {sentence}', 'Word': 'London', 'POS': 'NNP', 'Tag': 'B-geo'}
+                            for sentence in range(first, first + n_sentences)])
+
+
+def read_sentences(config) -> list:
+    return sorted(read_feature_store(config.feature_store_dir)['Sentence'].tolist())
+
+
+def expected_sentences(n_sentences: int) -> list:
+    return sorted(f'Sentence: {sentence}' for sentence in range(n_sentences))
+
+
+def test_incremental_runs_append_partitions(collection, config):
+    insert_sentences(collection, 0, 5)
+    assert len(DataIngestion(config).export_data_into_feature_store()) == 5
+    insert_sentences(collection, 5, 3)
+    data_ingestion = DataIngestion(config)
+    assert len(data_ingestion.export_data_into_feature_store()) == 3
+
+    assert data_ingestion.ingestion_mode == 'incremental'
+    assert len(list_feature_store_partitions(config.feature_store_dir)) == 2
+    assert read_sentences(config) == expected_sentences(8)
+
+
+def test_run_stopped_before_saving_the_watermark_is_redone(collection, config, monkeypatch):
+    insert_sentences(collection, 0, 5)
+    DataIngestion(config).export_data_into_feature_store()
+    with open(config.watermark_file_path) as file:
+        watermark = json.load(file)
+    insert_sentences(collection, 5, 3)
+
+    def crash(self, value, partition_file_path):
+        raise Crash()
+
+    with monkeypatch.context() as patch:
+        patch.setattr(DataIngestion, 'save_watermark', crash)
+        with pytest.raises(CustomException):
+            DataIngestion(config).export_data_into_feature_store()
+    # The partition was written, but is not read until it is committed.
+    assert read_sentences(config) == expected_sentences(5)
+    with open(config.watermark_file_path) as file:
+        assert json.load(file) == watermark
+
+    assert len(DataIngestion(config).export_data_into_feature_store()) == 3
+    assert read_sentences(config) == expected_sentences(8)
+    assert not [file_name for file_name in os.listdir(config.feature_store_dir) if file_name.endswith('.tmp')]
+
+
+def test_run_stopped_after_saving_the_watermark_is_finished(collection, config, monkeypatch):
+    insert_sentences(collection, 0, 5)
+    DataIngestion(config).export_data_into_feature_store()
+    insert_sentences(collection, 5, 3)
+
+    save_watermark = DataIngestion.save_watermark
+
+    def save_watermark_then_crash(self, value, partition_file_path):
+        save_watermark(self, value, partition_file_path)
+        raise Crash()
+
+    with monkeypatch.context() as patch:
+        patch.setattr(DataIngestion, 'save_watermark', save_watermark_then_crash)
+        with pytest.raises(CustomException):
+            DataIngestion(config).export_data_into_feature_store()
+
+    # The watermark committed the partition: the next run renames it into place and imports nothing.
+    assert len(DataIngestion(config).export_data_into_feature_store()) == 0
+    assert read_sentences(config) == expected_sentences(8)
+    assert len(list_feature_store_partitions(config.feature_store_dir)) == 2
+
+
+def test_full_refresh_replaces_the_partitions(collection, config):
+    insert_sentences(collection, 0, 5)
+    DataIngestion(config).export_data_into_feature_store()
+    insert_sentences(collection, 5, 3)
+
+    config.ingestion_mode = 'full'
+    assert len(DataIngestion(config).export_data_into_feature_store()) == 8
+
+    assert len(list_feature_store_partitions(config.feature_store_dir)) == 1
+    assert read_sentences(config) == expected_sentences(8)
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from src.components.data_transformation import DataTransformation
+from src.constants import UNK_TOKEN_ID, MAX_TOKEN_BYTES
+
+
+def test_encode_column_leaves_overlong_tokens_out_of_the_vocabulary():
+    long_token = 'x' * 10_000
+    words = pd.Series(['the', long_token, None, 'é' * (MAX_TOKEN_BYTES // 2), 'the', 'é' * MAX_TOKEN_BYTES],
+                      dtype='category', name='Word')
+
+    ids, vocab = DataTransformation.encode_column(words, offset=UNK_TOKEN_ID + 1, unknown_id=UNK_TOKEN_ID,
+                                                  max_bytes=MAX_TOKEN_BYTES)
+
+    assert vocab.to_list() == ['the', 'é' * (MAX_TOKEN_BYTES // 2)]
+    assert vocab.table.dtype.itemsize == MAX_TOKEN_BYTES
+    np.testing.assert_array_equal(ids, [2, UNK_TOKEN_ID, UNK_TOKEN_ID, 3, 2, UNK_TOKEN_ID])
+    # Prediction looks tokens up in the saved table and gets the ids training used.
+    np.testing.assert_array_equal(vocab.lookup(['the', long_token, 'é' * MAX_TOKEN_BYTES]),
+                                  [2, UNK_TOKEN_ID, UNK_TOKEN_ID])
@@ -0,0 +1,155 @@
+import math
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from src.exception import CustomException
+from src.configuration.mongo_db_connection import MongoDBClient
+from src.data_access.feedback_writer import FeedbackWriter
+from tests.in_memory_mongo import InMemoryMongoClient
+
+DATABASE = 'test'
+COLLECTION = 'feedback'
+
+
+class UniqueIdCollection:
+    """InMemoryCollection with MongoDB's unique `_id` index, whose writes can be made to fail.
+
+    `fail_after_write` attempts are applied but answered with a network error, as when the
+    connection drops before the acknowledgement; `fail_before_write` attempts are not applied.
+    """
+
+    def __init__(self, collection, fail_after_write: int=0, fail_before_write: int=0):
+        self.collection = collection
+        self.fail_after_write = fail_after_write
+        self.fail_before_write = fail_before_write
+        self.batches = []
+
+    def insert_many(self, documents: list, ordered: bool=True, **kwargs):
+        self.batches.append(list(documents))
+        if self.fail_before_write > 0:
+            self.fail_before_write -= 1
+            raise AutoReconnect('connection closed')
+        existing = {document['_id'] for document in self.collection.find({}, projection={'_id': 1})}
+        new = [document for document in documents if document['_id'] not in existing]
+        self.collection.insert_many(new)
+        if self.fail_after_write > 0:
+            self.fail_after_write -= 1
+            raise AutoReconnect('connection closed before the acknowledgement')
+        if len(new) < len(documents):
+            raise BulkWriteError({'writeErrors': [{'code': 11000, 'errmsg': 'E11000 duplicate key error'}] *
+                                                 (len(documents) - len(new)), 'nInserted': len(new)})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = InMemoryMongoClient()
+    monkeypatch.setattr(MongoDBClient, 'client', client)
+    return client
+
+
+def start_writer(client, fail_after_write: int=0, fail_before_write: int=0, **kwargs) -> FeedbackWriter:
+    kwargs = {'max_batch_size': 4, 'flush_interval_seconds': 60, 'retry_backoff_seconds': 0, **kwargs}
+    writer = FeedbackWriter(collection_name=COLLECTION, database_name=DATABASE, **kwargs)
+    writer.start()
+    writer._collection = UniqueIdCollection(client[DATABASE][COLLECTION], fail_after_write, fail_before_write)
+    return writer
+
+
+def sentence(n_tokens: int) -> tuple:
+    return [f'w{i}' for i in range(n_tokens)], ['O'] * n_tokens
+
+
+def split_sentences(documents: list) -> list:
+    sentences = []
+    for document in documents:
+        if isinstance(document['Sentence #'], str):
+            sentences.append([])
+        else:
+            assert math.isnan(document['Sentence #'])
+        sentences[-1].append(document)
+    return sentences
+
+
+def test_full_buffer_drops_sentences(client):
+    writer = FeedbackWriter(collection_name=COLLECTION, database_name=DATABASE, max_buffer_size=5)
+
+    assert writer.add(*sentence(3))
+    assert not writer.add(*sentence(3))
+    assert writer.add(*sentence(2))
+    assert not writer.add(*sentence(1), timeout=0.05)
+    assert writer.dropped == 4
+
+
+def test_sentence_longer_than_the_buffer_is_taken_when_it_is_empty(client):
+    writer = FeedbackWriter(collection_name=COLLECTION, database_name=DATABASE, max_buffer_size=5)
+
+    assert writer.add(*sentence(8))
+    assert writer.dropped == 0
+
+
+def test_sentences_are_never_split_across_batches(client):
+    writer = start_writer(client)
+    lengths = [3, 3, 2, 5, 1, 4, 2]
+    for n_tokens in lengths:
+        assert writer.add(*sentence(n_tokens))
+    assert writer.flush(timeout=5)
+    writer.stop()
+
+    batches = writer._collection.batches
+    # Only the first token of a sentence has a 'Sentence #' key.
+    assert all(isinstance(batch[0]['Sentence #'], str) for batch in batches)
+    batch_lengths = [[len(sentence_documents) for sentence_documents in split_sentences(batch)] for batch in batches]
+    assert [n_tokens for batch in batch_lengths for n_tokens in batch] == lengths
+    assert all(sum(batch) <= 4 or len(batch) == 1 for batch in batch_lengths)
+
+    documents = list(client[DATABASE][COLLECTION].find({}, sort=[('_id', 1)]))
+    assert [len(sentence_documents) for sentence_documents in split_sentences(documents)] == lengths
+    assert writer.written == sum(lengths)
+
+
+def test_retry_of_an_applied_write_counts_duplicate_keys_as_written(client):
+    writer = start_writer(client, fail_after_write=1, max_batch_size=10)
+    writer.add(*sentence(3))
+    writer.add(*sentence(4))
+    writer.stop()
+
+    # The retry sent the same _ids, and every one was a duplicate of the first attempt.
+    first, retry = writer._collection.batches
+    assert [document['_id'] for document in first] == [document['_id'] for document in retry]
+    assert writer.written == 7 and writer.failed == 0
+    assert client[DATABASE][COLLECTION].count_documents({}) == 7
+
+
+def test_failed_write_is_retried(client):
+    writer = start_writer(client, fail_before_write=2, max_retries=3)
+    writer.add(*sentence(3))
+    writer.stop()
+
+    assert len(writer._collection.batches) == 3
+    assert writer.written == 3 and writer.failed == 0
+
+
+def test_no_retry_starts_after_max_write_seconds(client):
+    writer = start_writer(client, fail_before_write=100, max_retries=100, retry_backoff_seconds=0.05,
+                          max_write_seconds=0.25)
+    writer.add(*sentence(3))
+    writer.stop()
+
+    # Backoffs of 0.05s and 0.1s, then 0.2s would start the fourth attempt after 0.35s.
+    assert len(writer._collection.batches) == 3
+    assert writer.written == 0 and writer.failed == 3
+    assert client[DATABASE][COLLECTION].count_documents({}) == 0
+
+
+def test_stop_flushes_the_buffer(client):
+    writer = start_writer(client, max_batch_size=100)
+    for n_tokens in [2, 3, 4]:
+        writer.add(*sentence(n_tokens))
+
+    writer.stop()
+
+    assert writer.written == 9
+    assert client[DATABASE][COLLECTION].count_documents({}) == 9
+    with pytest.raises(CustomException):
+        writer.add(*sentence(1))
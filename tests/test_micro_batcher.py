@@ -0,0 +1,113 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from src.pipline.prediction_pipeline import MicroBatcher, MicroBatcherStopped
+
+
+class StubPipeline:
+    """Records the texts of every forward pass; `release` can hold a pass until it is set."""
+
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def predict(self, texts: list) -> list:
+        self.batches.append(list(texts))
+        self.release.wait()
+        return [f'tagged {text}' for text in texts]
+
+
+async def run_batcher(test, pipeline: StubPipeline, **kwargs):
+    batcher = MicroBatcher(pipeline, **kwargs)
+    await batcher.start()
+    try:
+        return await test(batcher)
+    finally:
+        await batcher.stop()
+
+
+def test_requests_are_coalesced_up_to_the_batch_size():
+    pipeline = StubPipeline()
+
+    async def test(batcher):
+        start = time.monotonic()
+        results = await asyncio.gather(*[batcher.submit([f'text {i}']) for i in range(4)])
+        return results, time.monotonic() - start
+
+    results, elapsed = asyncio.run(run_batcher(test, pipeline, max_batch_size=4, max_wait_ms=10_000))
+
+    assert pipeline.batches == [[f'text {i}' for i in range(4)]]
+    assert results == [[f'tagged text {i}'] for i in range(4)]
+    # A full batch does not wait for max_wait_ms.
+    assert elapsed < 5
+
+
+def test_requests_are_coalesced_until_the_time_limit():
+    pipeline = StubPipeline()
+
+    async def test(batcher):
+        async def submit_later(delay: float, texts: list) -> list:
+            await asyncio.sleep(delay)
+            return await batcher.submit(texts)
+
+        start = time.monotonic()
+        results = await asyncio.gather(submit_later(0, ['a', 'b']), submit_later(0.05, ['c']))
+        elapsed = time.monotonic() - start
+        # Arrives after the first batch was sent, so goes in a batch of its own.
+        results.append(await batcher.submit(['d']))
+        return results, elapsed
+
+    results, elapsed = asyncio.run(run_batcher(test, pipeline, max_batch_size=64, max_wait_ms=300))
+
+    assert pipeline.batches == [['a', 'b', 'c'], ['d']]
+    assert results == [['tagged a', 'tagged b'], ['tagged c'], ['tagged d']]
+    assert elapsed >= 0.3
+
+
+def test_stop_resolves_every_pending_request():
+    pipeline = StubPipeline()
+    pipeline.release.clear()
+
+    async def test():
+        batcher = MicroBatcher(pipeline, max_batch_size=2, max_wait_ms=10_000)
+        await batcher.start()
+        running = [asyncio.ensure_future(batcher.submit([text])) for text in ('a', 'b')]
+        while not pipeline.batches:
+            await asyncio.sleep(0.01)
+        queued = [asyncio.ensure_future(batcher.submit([text])) for text in ('c', 'd', 'e')]
+        await asyncio.sleep(0.01)
+
+        # stop() waits for the running forward pass, which only finishes once released.
+        asyncio.get_running_loop().call_later(0.05, pipeline.release.set)
+        await asyncio.wait_for(batcher.stop(), timeout=5)
+        assert all(future.done() for future in running + queued)
+        with pytest.raises(MicroBatcherStopped):
+            await batcher.submit(['f'])
+        return await asyncio.gather(*running, *queued, return_exceptions=True)
+
+    results = asyncio.run(test())
+
+    assert results[:2] == [['tagged a'], ['tagged b']]
+    assert all(isinstance(result, MicroBatcherStopped) for result in results[2:])
+    assert pipeline.batches == [['a', 'b']]
+
+
+def test_stop_resolves_a_request_waiting_for_its_batch_to_fill():
+    pipeline = StubPipeline()
+
+    async def test():
+        batcher = MicroBatcher(pipeline, max_batch_size=64, max_wait_ms=10_000)
+        await batcher.start()
+        request = asyncio.ensure_future(batcher.submit(['a']))
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(batcher.stop(), timeout=5)
+        return await asyncio.gather(request, return_exceptions=True)
+
+    result, = asyncio.run(test())
+
+    assert isinstance(result, MicroBatcherStopped)
+    assert pipeline.batches == []
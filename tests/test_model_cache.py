@@ -0,0 +1,87 @@
+import os
+
+import pytest
+from azure.core.exceptions import ServiceResponseError
+
+from src.exception import CustomException
+from src.cloud_storage.azure_storage import AzureBlobStorage
+from src.cloud_storage.model_cache import ModelCache
+from tests.in_memory_blob import InMemoryBlobServiceClient, InMemoryBlobClient
+
+BLOCK_SIZE = 1024
+CONTAINER = 'models'
+BLOB = 'ner/model.keras'
+
+
+@pytest.fixture
+def service():
+    service = InMemoryBlobServiceClient()
+    service.create_container(CONTAINER)
+    return service
+
+
+@pytest.fixture
+def cache(service, tmp_path):
+    storage = AzureBlobStorage(blob_service_client=service, block_size=BLOCK_SIZE, max_retries=1,
+                               retry_backoff_seconds=0)
+    return ModelCache(storage=storage, cache_dir=str(tmp_path / 'cache'))
+
+
+def upload(service, tmp_path, data: bytes) -> None:
+    """Uploads through AzureBlobStorage: blobs over one block are block uploads, without a content MD5."""
+    source = tmp_path / 'source.keras'
+    source.write_bytes(data)
+    AzureBlobStorage(blob_service_client=service, block_size=BLOCK_SIZE).upload_file(str(source), BLOB, CONTAINER)
+
+
+def object_files(cache: ModelCache) -> list:
+    return sorted(os.listdir(cache.objects_dir)) if os.path.isdir(cache.objects_dir) else []
+
+
+def test_block_uploaded_blob_is_cached_whole_and_reused(service, cache, tmp_path):
+    data = os.urandom(3 * BLOCK_SIZE + 7)
+    upload(service, tmp_path, data)
+    assert service.get_blob_client(CONTAINER, BLOB).get_blob_properties().content_settings.content_md5 is None
+
+    object_path = cache.get(BLOB, CONTAINER)
+    with open(object_path, 'rb') as file:
+        assert file.read() == data
+    downloads = service.request_counts['download_blob']
+    assert cache.get(BLOB, CONTAINER) == object_path
+    assert service.request_counts['download_blob'] == downloads
+
+
+def test_failed_download_raises_and_caches_nothing(service, cache, tmp_path, monkeypatch):
+    upload(service, tmp_path, os.urandom(3 * BLOCK_SIZE))
+    download_blob = InMemoryBlobClient.download_blob
+
+    def fail_after_first_block(self, offset=None, **kwargs):
+        if offset:
+            raise ServiceResponseError('Connection dropped')
+        return download_blob(self, offset=offset, **kwargs)
+
+    monkeypatch.setattr(InMemoryBlobClient, 'download_blob', fail_after_first_block)
+    with pytest.raises(CustomException):
+        cache.get(BLOB, CONTAINER)
+    assert object_files(cache) == []
+
+
+def test_truncated_object_is_downloaded_again(service, cache, tmp_path):
+    data = os.urandom(4 * BLOCK_SIZE)
+    upload(service, tmp_path, data)
+    object_path = cache.get(BLOB, CONTAINER)
+    with open(object_path, 'r+b') as file:
+        file.truncate(BLOCK_SIZE)
+
+    assert cache.get(BLOB, CONTAINER) == object_path
+    with open(object_path, 'rb') as file:
+        assert file.read() == data
+
+
+def test_content_md5_mismatch_is_discarded(service, cache):
+    blob_client = service.get_blob_client(CONTAINER, BLOB)
+    blob_client.upload_blob(b'model weights', overwrite=True)
+    service._containers[CONTAINER][BLOB]['content_md5'] = b'\0' * 16
+    with pytest.raises(CustomException):
+        cache.get(BLOB, CONTAINER)
+    assert object_files(cache) == []
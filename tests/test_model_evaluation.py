@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from src.components.model_evaluation import ModelEvaluation
+
+TAG_VOCAB = ['B-geo', 'B-per', 'I-geo', 'I-per', 'O']
+# Two sentences, of 5 and 4 tokens. The prediction only differs at token 4: I-per instead of I-geo.
+Y_TRUE = 'B-per I-per O B-geo I-geo   I-geo O B-per I-per'
+Y_PRED = 'B-per I-per O B-geo I-per   I-geo O B-per I-per'
+SENTENCE_STARTS = np.array([True, False, False, False, False, True, False, False, False])
+
+
+def encode_tags(tags: str) -> np.ndarray:
+    return np.array([TAG_VOCAB.index(tag) for tag in tags.split()], dtype=np.int32)
+
+
+def test_evaluate_entities():
+    scores = ModelEvaluation.evaluate_entities(encode_tags(Y_TRUE), encode_tags(Y_PRED), SENTENCE_STARTS, TAG_VOCAB)
+
+    # True spans: per 0-1, geo 3-4, geo 5-5 (a stray I- tag opening the second sentence), per 7-8.
+    # Predicted spans: per 0-1, geo 3-3, per 4-4, geo 5-5, per 7-8; three match exactly.
+    assert scores['precision'] == pytest.approx(3 / 5)
+    assert scores['recall'] == pytest.approx(3 / 4)
+    assert scores['f1'] == pytest.approx(2 / 3)
+    assert scores['per_type']['geo'] == pytest.approx({'precision': 1 / 2, 'recall': 1 / 2, 'f1': 1 / 2, 'support': 2})
+    assert scores['per_type']['per'] == pytest.approx({'precision': 2 / 3, 'recall': 1.0, 'f1': 0.8, 'support': 2})
+
+
+def test_evaluate_entities_without_entities():
+    y = encode_tags('O O O')
+    scores = ModelEvaluation.evaluate_entities(y, y, np.array([True, False, True]), TAG_VOCAB)
+
+    assert (scores['precision'], scores['recall'], scores['f1']) == (0.0, 0.0, 0.0)
+    assert scores['per_type']['geo']['support'] == 0
+
+
+def test_evaluate_tags():
+    scores = ModelEvaluation.evaluate_tags(encode_tags(Y_TRUE), encode_tags(Y_PRED), TAG_VOCAB)
+
+    assert scores['accuracy'] == pytest.approx(8 / 9)
+    # The only off-diagonal cell of the confusion matrix is (I-geo, I-per).
+    assert scores['per_tag']['I-geo'] == pytest.approx({'precision': 1.0, 'recall': 1 / 2, 'f1': 2 / 3, 'support': 2})
+    assert scores['per_tag']['I-per'] == pytest.approx({'precision': 2 / 3, 'recall': 1.0, 'f1': 0.8, 'support': 2})
+    for tag, support in [('B-geo', 1), ('B-per', 2), ('O', 2)]:
+        assert scores['per_tag'][tag] == {'precision': 1.0, 'recall': 1.0, 'f1': 1.0, 'support': support}
+    # 'O' is left out of the macro average.
+    assert scores['macro_f1'] == pytest.approx((1 + 1 + 2 / 3 + 0.8) / 4)
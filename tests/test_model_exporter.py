@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('tf2onnx')
+pytest.importorskip('onnxruntime')
+
+from src.components.model_exporter import ModelExporter
+from src.components.model_trainer import ModelTrainer
+from src.entity.vocabulary import Vocabulary
+from src.entity.estimator import NERModel, OnnxNERModel
+from src.entity.config_entity import ModelTrainerConfig, ModelExporterConfig
+from src.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact
+from src.utils.main_utils import read_yaml_file, write_yaml_file, save_numpy_array_data, load_string_table
+from src.constants import (PARAMS_FILE_PATH, PAD_TOKEN_ID, UNK_TOKEN_ID, TOKEN_VOCAB_FILE_NAME, TAG_VOCAB_FILE_NAME,
+                           ONNX_MODEL_FILE_NAME, ONNX_QUANTIZED_MODEL_FILE_NAME)
+
+TOKENS = ['London', 'Paris', 'a', 'in', 'is', 'the', 'visited', 'Zoë']
+TAGS = ['B-geo', 'I-geo', 'O']
+
+
+@pytest.fixture(scope='module')
+def exported(tmp_path_factory):
+    """A tiny, untrained BiLSTM tagger exported through ModelExporter."""
+    tmp_path = tmp_path_factory.mktemp('exporter')
+    params = read_yaml_file(PARAMS_FILE_PATH)
+    params['model_trainer'].update(embedding_dim=8, lstm_units=8)
+    params['model_exporter'].update(quantize=False, parity_samples=16)
+    params_file_path = str(tmp_path / 'params.yaml')
+    write_yaml_file(params_file_path, params)
+
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(1, 15, size=20)
+    sentence_offsets = np.r_[0, np.cumsum(lengths)].astype(np.int64)
+    vocab_size = len(TOKENS) + UNK_TOKEN_ID + 1
+    paths = {name: str(tmp_path / f'{name}.npy') for name in ('token_ids', 'tag_ids', 'sentence_offsets',
+                                                              'sentence_lengths', 'indices')}
+    n_tokens = int(lengths.sum())
+    save_numpy_array_data(paths['token_ids'], rng.integers(UNK_TOKEN_ID, vocab_size, size=n_tokens).astype(np.int32))
+    save_numpy_array_data(paths['tag_ids'], rng.integers(0, len(TAGS), size=n_tokens).astype(np.int32))
+    save_numpy_array_data(paths['sentence_offsets'], sentence_offsets)
+    save_numpy_array_data(paths['sentence_lengths'], lengths.astype(np.int32))
+    save_numpy_array_data(paths['indices'], np.arange(len(lengths)))
+    token_vocab_file_path = str(tmp_path / TOKEN_VOCAB_FILE_NAME)
+    tag_vocab_file_path = str(tmp_path / TAG_VOCAB_FILE_NAME)
+    Vocabulary.from_values(TOKENS).save(token_vocab_file_path)
+    Vocabulary.from_values(TAGS).save(tag_vocab_file_path)
+    data_transformation_artifact = DataTransformationArtifact(
+        token_ids_file_path=paths['token_ids'], tag_ids_file_path=paths['tag_ids'],
+        sentence_offsets_file_path=paths['sentence_offsets'], sentence_lengths_file_path=paths['sentence_lengths'],
+        train_indices_file_path=paths['indices'], val_indices_file_path=paths['indices'],
+        test_indices_file_path=paths['indices'], token_vocab_file_path=token_vocab_file_path,
+        tag_vocab_file_path=tag_vocab_file_path, vocab_version='test')
+
+    model_trainer = ModelTrainer(data_transformation_artifact, ModelTrainerConfig(params_file_path=params_file_path))
+    model = model_trainer.get_bilstm_lstm_model(vocab_size=vocab_size, n_tags=len(TAGS))
+    trained_model_file_path = str(tmp_path / 'model.keras')
+    model.save(trained_model_file_path)
+    model_trainer_artifact = ModelTrainerArtifact(trained_model_file_path=trained_model_file_path, train_loss=0.0,
+                                                  val_loss=0.0, val_accuracy=0.0, bucketed_padding_ratio=0.0,
+                                                  global_padding_ratio=0.0, train_samples_per_second=0.0)
+
+    exported_model_dir = str(tmp_path / 'exported')
+    config = ModelExporterConfig(
+        model_exporter_dir=str(tmp_path), exported_model_dir=exported_model_dir,
+        onnx_model_file_path=os.path.join(exported_model_dir, ONNX_MODEL_FILE_NAME),
+        quantized_model_file_path=os.path.join(exported_model_dir, ONNX_QUANTIZED_MODEL_FILE_NAME),
+        params_file_path=params_file_path)
+    artifact = ModelExporter(data_transformation_artifact, model_trainer_artifact, config).initiate_model_exporter()
+    keras_model = NERModel(model, load_string_table(token_vocab_file_path), load_string_table(tag_vocab_file_path))
+    return artifact, keras_model, OnnxNERModel.from_model_dir(exported_model_dir)
+
+
+def test_exporter_reports_parity(exported):
+    artifact, _, _ = exported
+    assert artifact.max_abs_diff < 1e-4
+    assert artifact.tag_agreement == 1.0
+    assert artifact.quantized_model_file_path is None
+
+
+@pytest.mark.parametrize('batch_size, length', [(1, 1), (1, 9), (5, 17)])
+def test_onnx_outputs_match_keras(exported, batch_size, length):
+    _, keras_model, onnx_model = exported
+    token_ids = np.random.default_rng(length).integers(UNK_TOKEN_ID, len(keras_model.token_vocab),
+                                                       size=(batch_size, length)).astype(np.int32)
+
+    np.testing.assert_allclose(onnx_model.predict_proba(token_ids), keras_model.predict_proba(token_ids),
+                               rtol=1e-4, atol=1e-5)
+
+
+def test_onnx_outputs_match_keras_on_padded_batch(exported):
+    _, keras_model, onnx_model = exported
+    sentences = [['Zoë', 'visited', 'London'], ['Paris'], ['the', 'unseen', 'token', 'is', 'in', 'a', 'London', 'is']]
+    token_ids, lengths = keras_model.encode(sentences)
+    assert (token_ids == PAD_TOKEN_ID).any()
+
+    np.testing.assert_allclose(onnx_model.predict_proba(token_ids), keras_model.predict_proba(token_ids),
+                               rtol=1e-4, atol=1e-5)
+    assert onnx_model.predict(sentences) == keras_model.predict(sentences)
+    assert [len(tags) for tags in onnx_model.predict(sentences)] == lengths.tolist()
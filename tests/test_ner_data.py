@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.configuration.mongo_db_connection import MongoDBClient
+from src.data_access.ner_data import NerData
+from src.constants import DATABASE_NAME
+from tests.in_memory_mongo import InMemoryMongoClient
+
+COLLECTION = 'ner'
+
+
+def make_documents(n_sentences: int, seed: int=0) -> list:
+    """Documents shaped like the uploaded corpus: one per token, 'Sentence #' only on the first one."""
+    rng = np.random.default_rng(seed)
+    documents = []
+    for sentence in range(n_sentences):
+        for position in range(int(rng.integers(1, 12))):
+            documents.append({'Sentence #': f'Sentence: {sentence + 1}' if position == 0 else 'na',
+                              'Word': f'w{rng.integers(50)}', 'POS': 'NN', 'Tag': 'O' if rng.random() < 0.8 else 'B-geo'})
+    return documents
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = InMemoryMongoClient()
+    monkeypatch.setattr(MongoDBClient, 'client', client)
+    return client
+
+
+@pytest.fixture
+def ner_data(client):
+    client[DATABASE_NAME][COLLECTION].insert_many(make_documents(300))
+    return NerData()
+
+
+@pytest.mark.parametrize('num_partitions', [1, 2, 3, 7, 10_000])
+def test_range_boundaries_split_evenly(ner_data, num_partitions):
+    ids = sorted(document['_id'] for document in ner_data._get_collection(COLLECTION).find({}))
+    boundaries = ner_data.get_range_boundaries(COLLECTION, num_partitions)
+
+    step = -(-len(ids) // num_partitions)
+    assert boundaries == ids[step:step * (num_partitions - 1) + 1:step]
+    assert len(boundaries) == min(num_partitions, -(-len(ids) // step)) - 1
+
+
+def test_range_boundaries_of_empty_collection(client):
+    assert NerData().get_range_boundaries(COLLECTION, 4) == []
+
+
+@pytest.mark.parametrize('num_workers', [2, 3, 8])
+@pytest.mark.parametrize('batch_size', [7, 64, 100_000])
+def test_parallel_export_equals_sequential_export(ner_data, num_workers, batch_size):
+    sequential = ner_data.export_collection_as_DataFrame(COLLECTION, batch_size=batch_size)
+    parallel = ner_data.export_collection_as_DataFrame(COLLECTION, batch_size=batch_size, num_workers=num_workers)
+
+    assert len(sequential) == ner_data._get_collection(COLLECTION).count_documents({})
+    pd.testing.assert_frame_equal(parallel.astype(object), sequential.astype(object))
+    assert parallel['Sentence'].notna().sum() == 300
+    assert parallel['Sentence'].iloc[0] == 'Sentence: 1'
+
+
+def test_parallel_export_applies_query(ner_data):
+    collection = ner_data._get_collection(COLLECTION)
+    cutoff = sorted(document['_id'] for document in collection.find({}))[500]
+    query = {'_id': {'$lt': cutoff}}
+
+    sequential = ner_data.export_collection_as_DataFrame(COLLECTION, batch_size=50, query=query)
+    parallel = ner_data.export_collection_as_DataFrame(COLLECTION, batch_size=50, query=query, num_workers=4)
+
+    assert len(parallel) == 500
+    pd.testing.assert_frame_equal(parallel.astype(object), sequential.astype(object))
+
+
+def test_export_of_empty_collection(client):
+    assert NerData().export_collection_as_DataFrame(COLLECTION, batch_size=10, num_workers=4).empty
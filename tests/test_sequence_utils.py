@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from src.utils.sequence_utils import get_bio_scheme, extract_entity_spans
+
+TAG_VOCAB = ['B-geo', 'B-per', 'I-geo', 'I-per', 'O']
+
+
+def encode_tags(tags: str) -> np.ndarray:
+    return np.array([TAG_VOCAB.index(tag) for tag in tags.split()], dtype=np.int32)
+
+
+def test_get_bio_scheme():
+    is_inside, entity_type, entity_types = get_bio_scheme(TAG_VOCAB)
+
+    assert entity_types == ['geo', 'per']
+    np.testing.assert_array_equal(is_inside, [False, False, True, True, False])
+    np.testing.assert_array_equal(entity_type, [0, 1, 0, 1, -1])
+
+
+@pytest.mark.parametrize('tags, expected_spans', [
+    # The last entity runs to the end of the sentence, and the next sentence starts with its I- tag.
+    ('B-per I-per O B-geo I-geo | I-geo O B-per I-per', [(0, 1, 'per'), (3, 4, 'geo'), (5, 5, 'geo'), (7, 8, 'per')]),
+    # An I- tag without a preceding B- starts an entity, as does an I- tag of another type.
+    ('I-geo I-geo B-geo I-per O I-per', [(0, 1, 'geo'), (2, 2, 'geo'), (3, 3, 'per'), (5, 5, 'per')]),
+    ('B-geo B-geo | B-per', [(0, 0, 'geo'), (1, 1, 'geo'), (2, 2, 'per')]),
+    ('O O | O', []),
+])
+def test_extract_entity_spans(tags, expected_spans):
+    sentences = [sentence.split() for sentence in tags.split('|')]
+    tag_ids = encode_tags(' '.join(' '.join(sentence) for sentence in sentences))
+    sentence_starts = np.zeros(len(tag_ids), dtype=bool)
+    sentence_starts[np.cumsum([0] + [len(sentence) for sentence in sentences[:-1]])] = True
+    is_inside, entity_type, entity_types = get_bio_scheme(TAG_VOCAB)
+
+    starts, ends, types = extract_entity_spans(tag_ids, sentence_starts, is_inside, entity_type)
+
+    assert [(int(start), int(end), entity_types[index]) for start, end, index in zip(starts, ends, types)] == \
+        expected_spans
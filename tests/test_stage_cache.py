@@ -0,0 +1,39 @@
+import os
+from dataclasses import dataclass
+
+from src.pipline.stage_cache import StageCache
+
+
+@dataclass
+class Artifact:
+    file_path: str
+
+
+def make_run(artifact_root, name: str) -> str:
+    run_dir = os.path.join(artifact_root, name)
+    os.makedirs(run_dir)
+    with open(os.path.join(run_dir, 'data.bin'), 'wb') as file:
+        file.write(b'x' * 100)
+    return run_dir
+
+
+def test_evict_keeps_run_dirs_of_reused_artifacts(tmp_path):
+    artifact_root = str(tmp_path / 'artifact')
+    cache_file_path = str(tmp_path / 'stage_cache.json')
+    old_runs = [make_run(artifact_root, f'run-{i}') for i in range(3)]
+    previous = StageCache(cache_file_path, artifact_root, max_runs=10, max_size_bytes=10**9)
+    for stage, run_dir in zip(['validation', 'transformation', 'trainer'], old_runs):
+        previous.put(stage, 'fp', Artifact(os.path.join(run_dir, 'data.bin')), run_dir)
+
+    # The next run reuses the transformation of run-1 and writes into its own directory.
+    cache = StageCache(cache_file_path, artifact_root, max_runs=1, max_size_bytes=10**9)
+    assert cache.get('transformation', 'fp', Artifact) == Artifact(os.path.join(old_runs[1], 'data.bin'))
+    current_dir = make_run(artifact_root, 'run-3')
+    cache.put('trainer', 'fp-new', Artifact(os.path.join(current_dir, 'data.bin')), current_dir)
+
+    evicted = cache.evict(current_artifact_dir=current_dir)
+
+    assert sorted(evicted) == [old_runs[0], old_runs[2]]
+    assert os.path.isdir(old_runs[1]) and os.path.isdir(current_dir)
+    assert cache.get('transformation', 'fp', Artifact) is not None
+    assert cache.get('validation', 'fp', Artifact) is None
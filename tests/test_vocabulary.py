@@ -0,0 +1,67 @@
+import numpy as np
+
+from src.entity.vocabulary import Vocabulary
+from src.constants import PAD_TOKEN_ID, UNK_TOKEN_ID, MAX_TOKEN_BYTES
+
+OFFSET = UNK_TOKEN_ID + 1
+LONGEST_TOKEN = 'é' * (MAX_TOKEN_BYTES // 2)
+
+
+def token_vocabulary() -> Vocabulary:
+    return Vocabulary.from_values(['the', 'London', 'Zoë', '東京', LONGEST_TOKEN, 'the'], offset=OFFSET,
+                                  unknown_id=UNK_TOKEN_ID)
+
+
+def test_ids_start_after_the_reserved_ids():
+    vocab = token_vocabulary()
+
+    assert vocab.to_list() == ['London', 'Zoë', 'the', LONGEST_TOKEN, '東京']
+    assert len(vocab) == 5 + OFFSET
+    np.testing.assert_array_equal(vocab.lookup(vocab.to_list()), np.arange(OFFSET, OFFSET + 5))
+    assert PAD_TOKEN_ID not in vocab.lookup(vocab.to_list())
+    assert vocab.lookup(['London']).dtype == np.int32
+
+
+def test_missing_tokens_get_the_unknown_id():
+    vocab = token_vocabulary()
+
+    ids = vocab.lookup(['Paris', 'the', 'The', '', 'zzz', 'A', 'Zoe', 'Zoë'])
+
+    np.testing.assert_array_equal(ids, [UNK_TOKEN_ID, 4, UNK_TOKEN_ID, UNK_TOKEN_ID, UNK_TOKEN_ID, UNK_TOKEN_ID,
+                                        UNK_TOKEN_ID, 3])
+
+
+def test_non_ascii_tokens():
+    vocab = token_vocabulary()
+
+    np.testing.assert_array_equal(vocab.lookup(['東京', 'Zoë', '東', 'Zoëe']), [6, 3, UNK_TOKEN_ID, UNK_TOKEN_ID])
+
+
+def test_tokens_longer_than_max_token_bytes_are_unknown():
+    vocab = token_vocabulary()
+    assert len(LONGEST_TOKEN.encode('utf-8')) == MAX_TOKEN_BYTES
+
+    # The first MAX_TOKEN_BYTES bytes of the first two tokens are in the table, but not the tokens themselves.
+    ids = vocab.lookup([LONGEST_TOKEN + 'é', LONGEST_TOKEN + 'x', 'x' * 10_000, LONGEST_TOKEN])
+
+    np.testing.assert_array_equal(ids, [UNK_TOKEN_ID, UNK_TOKEN_ID, UNK_TOKEN_ID, 5])
+
+
+def test_empty_lookups():
+    vocab = token_vocabulary()
+    empty_vocab = Vocabulary(np.array([], dtype=np.bytes_), offset=OFFSET, unknown_id=UNK_TOKEN_ID)
+
+    assert vocab.lookup([]).shape == (0,)
+    np.testing.assert_array_equal(empty_vocab.lookup(['the', 'Zoë']), [UNK_TOKEN_ID, UNK_TOKEN_ID])
+
+
+def test_saved_vocabulary_gives_the_same_ids(tmp_path):
+    vocab = token_vocabulary()
+    file_path = str(tmp_path / 'token_vocab.npy')
+    vocab.save(file_path)
+
+    loaded = Vocabulary.load(file_path, offset=OFFSET, unknown_id=UNK_TOKEN_ID)
+
+    tokens = ['the', 'Zoë', '東京', 'Paris', LONGEST_TOKEN, LONGEST_TOKEN + 'é']
+    np.testing.assert_array_equal(loaded.lookup(tokens), vocab.lookup(tokens))
+    assert loaded.to_list() == vocab.to_list()